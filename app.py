@@ -10,9 +10,9 @@ db = SQLAlchemy()
 migrate = Migrate()
 login_manager = LoginManager()
 
-def create_app():
+def create_app(config_class=Config):
     app = Flask(__name__)
-    app.config.from_object(Config)
+    app.config.from_object(config_class)
     
     # Initialize extensions with app
     db.init_app(app)
@@ -24,11 +24,17 @@ def create_app():
     login_manager.login_message = 'Please log in to access this page.'
     login_manager.login_message_category = 'info'
     
-    # User loader function
+    # User loader function (served from a short-lived identity cache)
     @login_manager.user_loader
     def load_user(user_id):
-        from models.user import User
-        return User.query.get(int(user_id))
+        from utils import user_cache
+        return user_cache.load_user(int(user_id))
+    
+    # Presence history sampler (started with the first request)
+    @app.before_request
+    def start_presence_history():
+        from utils import presence_history
+        presence_history.get_sampler()
     
     # Import models
     from models.user import User
@@ -37,6 +43,11 @@ def create_app():
     from models.notification import Notification
     from models.message import Message
     from models.group import Group
+    from models.unread_counter import UnreadCounter
+    from models.group_read_state import GroupReadState
+    from models.attachment import Attachment
+    from models.conversation_watermark import ConversationWatermark
+    from models.presence_history import PresenceDay
     
     # Register blueprints
     from controllers.auth_controller_simple import auth_bp
@@ -61,7 +72,13 @@ def create_app():
     
     # Create tables
     with app.app_context():
+        from utils.message_compression import install_sql_functions
+        install_sql_functions(db.engine)
+        
         db.create_all()
+        
+        from utils.message_search import ensure_search_index
+        ensure_search_index()
     
     return app
 
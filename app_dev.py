@@ -3,10 +3,10 @@ from app import db, migrate, login_manager
 from config_dev import DevelopmentConfig
 import os
 
-def create_dev_app():
+def create_dev_app(config_class=DevelopmentConfig):
     """Create development app with lightweight configuration"""
     app = Flask(__name__)
-    app.config.from_object(DevelopmentConfig)
+    app.config.from_object(config_class)
     
     # Initialize extensions with app
     db.init_app(app)
@@ -54,9 +54,20 @@ def create_dev_app():
         from models.notification import Notification
         from models.message import Message
         from models.group import Group
+        from models.unread_counter import UnreadCounter
+        from models.group_read_state import GroupReadState
+        from models.attachment import Attachment
+        from models.conversation_watermark import ConversationWatermark
+        from models.presence_history import PresenceDay
+        
+        from utils.message_compression import install_sql_functions
+        install_sql_functions(db.engine)
         
         db.create_all()
         
+        from utils.message_search import ensure_search_index
+        ensure_search_index()
+        
         # Create default admin user if none exists
         admin_user = User.query.filter_by(is_admin=True).first()
         if not admin_user:
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Move old messages out of the primary database into the monthly archive files
+
+Usage: python archive_messages.py [older_than_days] [--vacuum]   (default MESSAGE_ARCHIVE_AFTER_DAYS)
+
+Safe to run repeatedly, e.g. nightly from cron. --vacuum returns the freed
+pages of the primary database to the filesystem afterwards.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from utils.message_archive import archive_messages, get_archive_root
+
+def run_archive(older_than_days=None, vacuum=False):
+    """Archive old messages and optionally VACUUM the primary database"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            result = archive_messages(older_than_days)
+            print(f"✅ Archived {result['archived']} messages into {get_archive_root()}")
+            for month in result['months']:
+                print(f"   📦 messages-{month}.db")
+            
+            if vacuum and result['archived']:
+                with db.engine.connect() as conn:
+                    conn.exec_driver_sql('VACUUM')
+                print("✅ Primary database vacuumed")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error archiving messages: {e}")
+            return False
+    
+    return True
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if arg != '--vacuum']
+    days = int(args[0]) if args else None
+    
+    print("📦 Archiving Old Messages")
+    print("=" * 50)
+    
+    success = run_archive(days, vacuum='--vacuum' in sys.argv)
+    
+    if success:
+        print("\n✅ Message archive completed successfully!")
+    else:
+        print("\n❌ Message archive failed!")
+        print("Please check the error messages above.")
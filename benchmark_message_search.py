@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Benchmark full-text message search against a LIKE scan
+
+Usage: python benchmark_message_search.py [message_count]   (default 1,000,000)
+
+Builds a throwaway SQLite database in a temp directory, so the real
+database is never touched.
+"""
+
+import sys
+import os
+import random
+import shutil
+import tempfile
+import time
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+
+USER_COUNT = 500
+GROUP_COUNT = 50
+QUERY_COUNT = 200
+LIKE_QUERY_COUNT = 5
+
+VOCABULARY_SIZE = 20000
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'sa', 'ti', 'vo', 'ze', 'pa', 'do', 'fi', 'gu', 'he', 'jo', 'bri']
+
+def build_vocabulary():
+    """Pseudo-words with Zipf-distributed frequencies, like natural chat text"""
+    words = []
+    for i in range(VOCABULARY_SIZE):
+        word, n = '', i + len(SYLLABLES)
+        while n:
+            n, digit = divmod(n, len(SYLLABLES))
+            word += SYLLABLES[digit]
+        words.append(word)
+
+    cumulative, total = [], 0.0
+    for rank in range(1, VOCABULARY_SIZE + 1):
+        total += 1.0 / rank
+        cumulative.append(total)
+    return words, cumulative
+
+WORDS, CUMULATIVE_WEIGHTS = build_vocabulary()
+
+# Queries use mid-frequency words: very common words are stop-word-like,
+# very rare ones return nothing
+QUERY_WORDS = WORDS[50:2000]
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def random_sentence(rng):
+    """Chat-like message of 4-20 words"""
+    return ' '.join(rng.choices(WORDS, cum_weights=CUMULATIVE_WEIGHTS, k=rng.randint(4, 20)))
+
+def seed_database(db, message_count, rng):
+    """Insert users, groups and messages with raw executemany batches"""
+    now = datetime.utcnow()
+
+    with db.engine.begin() as conn:
+        conn.exec_driver_sql(
+            'INSERT INTO users (id, username, email, password_hash, created_at, is_admin, is_active) '
+            'VALUES (?, ?, ?, ?, ?, 0, 1)',
+            [(i, f'user{i}', f'user{i}@example.com', 'x', now) for i in range(1, USER_COUNT + 1)]
+        )
+        conn.exec_driver_sql(
+            'INSERT INTO groups (id, name, created_by, created_at, is_active, group_type) '
+            'VALUES (?, ?, 1, ?, 1, ?)',
+            [(i, f'Group {i}', now, 'general') for i in range(1, GROUP_COUNT + 1)]
+        )
+        members = set()
+        for group_id in range(1, GROUP_COUNT + 1):
+            for user_id in rng.sample(range(1, USER_COUNT + 1), 25):
+                members.add((group_id, user_id))
+        conn.exec_driver_sql('INSERT INTO group_members (group_id, user_id) VALUES (?, ?)', list(members))
+
+    batch_size = 20000
+    start = now - timedelta(days=365)
+    for offset in range(0, message_count, batch_size):
+        rows = []
+        for i in range(offset, min(offset + batch_size, message_count)):
+            sender = rng.randint(1, USER_COUNT)
+            timestamp = start + timedelta(seconds=i * 30)
+            if rng.random() < 0.7:
+                recipient = rng.randint(1, USER_COUNT)
+                rows.append((sender, recipient, None, random_sentence(rng), timestamp, 1, 'text', 'direct'))
+            else:
+                rows.append((sender, None, rng.randint(1, GROUP_COUNT), random_sentence(rng), timestamp, 1, 'text', 'group'))
+
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql(
+                'INSERT INTO messages (sender_id, recipient_id, group_id, content, timestamp, is_read, message_type, chat_type) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+
+def run_benchmark(message_count):
+    """Seed a temp database and time search queries"""
+    temp_dir = tempfile.mkdtemp(prefix='message_search_bench_')
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(temp_dir, 'bench.db')}"
+
+    try:
+        from app import create_app, db
+        from utils.message_search import search_messages, rebuild_search_index
+
+        app = create_app(BenchmarkConfig)
+        rng = random.Random(42)
+
+        with app.app_context():
+            print(f"📥 Seeding {message_count:,} messages (search index maintained by triggers)...")
+            started = time.perf_counter()
+            seed_database(db, message_count, rng)
+            seed_seconds = time.perf_counter() - started
+            print(f"   {seed_seconds:.1f}s ({message_count / seed_seconds:,.0f} messages/s)")
+
+            print("🔨 Rebuilding search index...")
+            started = time.perf_counter()
+            rebuild_search_index()
+            print(f"   {time.perf_counter() - started:.1f}s")
+
+            print(f"🔍 Running {QUERY_COUNT} FTS searches...")
+            timings = []
+            hits = 0
+            for _ in range(QUERY_COUNT):
+                user_id = rng.randint(1, USER_COUNT)
+                query = ' '.join(rng.sample(QUERY_WORDS, rng.randint(1, 2)))
+                started = time.perf_counter()
+                results, _ = search_messages(user_id, query, page=1, per_page=20)
+                timings.append((time.perf_counter() - started) * 1000)
+                hits += len(results)
+
+            print(f"   p50 {percentile(timings, 50):.1f} ms, p95 {percentile(timings, 95):.1f} ms, "
+                  f"max {max(timings):.1f} ms, avg hits/page {hits / QUERY_COUNT:.1f}")
+
+            print(f"🐢 Running {LIKE_QUERY_COUNT} LIKE '%term%' scans for comparison...")
+            like_timings = []
+            for _ in range(LIKE_QUERY_COUNT):
+                user_id = rng.randint(1, USER_COUNT)
+                term = rng.choice(QUERY_WORDS)
+                started = time.perf_counter()
+                db.session.execute(db.text(
+                    "SELECT id FROM messages WHERE content LIKE :term AND ("
+                    "(chat_type = 'direct' AND (sender_id = :user_id OR recipient_id = :user_id)) OR "
+                    "(chat_type = 'group' AND group_id IN (SELECT group_id FROM group_members WHERE user_id = :user_id))"
+                    ") ORDER BY timestamp DESC LIMIT 20"
+                ), {'term': f'%{term}%', 'user_id': user_id}).all()
+                like_timings.append((time.perf_counter() - started) * 1000)
+
+            print(f"   p50 {percentile(like_timings, 50):.1f} ms, max {max(like_timings):.1f} ms")
+
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+
+    print("🚀 Message Search Benchmark")
+    print("=" * 50)
+    run_benchmark(count)
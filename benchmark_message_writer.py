@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Benchmark message sends with and without group commit
+
+Usage: python benchmark_message_writer.py [threads] [sends_per_thread]   (default 16 x 100)
+
+Each run uses a throwaway SQLite database in a temp directory and posts to
+/api/messages/send through the Flask test client from concurrent threads.
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import threading
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from config import Config
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def run(group_commit, thread_count, sends_per_thread):
+    """Time concurrent sends; returns (messages/s, latencies in ms, writer stats)"""
+    from app import create_app, db
+    from models.user import User
+
+    temp_dir = tempfile.mkdtemp(prefix='message_writer_bench_')
+
+    class BenchmarkConfig(Config):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(temp_dir, 'bench.db')}"
+        SQLALCHEMY_ENGINE_OPTIONS = {'pool_size': thread_count + 2, 'connect_args': {'timeout': 30}}
+        FACE_RECOGNITION_ENABLED = False
+        MESSAGE_GROUP_COMMIT = group_commit
+
+    try:
+        app = create_app(BenchmarkConfig)
+        with app.app_context():
+            users = [User(username=f'user{i}', email=f'user{i}@example.com', password_hash='x')
+                     for i in range(thread_count + 1)]
+            db.session.add_all(users)
+            db.session.commit()
+            user_ids = [user.id for user in users]
+
+        latencies = []
+        errors = []
+        lock = threading.Lock()
+
+        def sender(user_id):
+            client = app.test_client()
+            with client.session_transaction() as session:
+                session['_user_id'] = str(user_id)
+            for i in range(sends_per_thread):
+                started = time.perf_counter()
+                response = client.post('/api/messages/send',
+                                       json={'recipient_id': user_ids[0], 'content': f'Message {i}'})
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+                    if not response.get_json().get('success'):
+                        errors.append(response.get_json())
+
+        threads = [threading.Thread(target=sender, args=(user_id,)) for user_id in user_ids[1:]]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if errors:
+            print(f"   ⚠️  {len(errors)} failed sends, e.g. {errors[0]}")
+
+        writer = app.extensions.get('message_writer')
+        stats = dict(writer.stats) if writer else None
+
+        with app.app_context():
+            db.engine.dispose()
+        return len(latencies) / elapsed, latencies, stats
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    thread_count = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    sends_per_thread = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+    print("🚀 Message Send Benchmark")
+    print("=" * 50)
+    print(f"{thread_count} threads x {sends_per_thread} sends")
+
+    for group_commit in (False, True):
+        label = 'group commit' if group_commit else 'commit per send'
+        rate, latencies, stats = run(group_commit, thread_count, sends_per_thread)
+        print(f"\n📨 {label}")
+        print(f"   {rate:,.0f} messages/s, p50 {percentile(latencies, 50):.1f} ms, "
+              f"p95 {percentile(latencies, 95):.1f} ms, max {max(latencies):.1f} ms")
+        if stats:
+            print(f"   {stats['messages']} messages in {stats['batches']} transactions "
+                  f"({stats['messages'] / max(stats['batches'], 1):.1f} per commit)")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Benchmark for the online-users and status-count queries
+
+Usage:
+    python benchmark_online_users.py [--users 10000] [--online 0.1] [--repeat 50]
+
+Seeds users into an in-memory database with a realistic spread of last
+activity times (a fraction active within the offline threshold, the rest
+idle for hours or days) and times, per call:
+
+  legacy counts   the four count() queries get_dashboard_stats used to run
+  status counts   User.get_status_counts, one GROUP BY over User.status_expression
+  legacy listing  loading every user and filtering on the is_online property
+  online users    User.get_online_users, a range scan on ix_users_last_activity
+
+and prints the query plan of the online-users query, so a missing index
+shows up as a full table scan.
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+
+def time_call(function, repeat):
+    """(median ms, result) over repeat calls"""
+    samples = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], result
+
+def seed_users(db, User, count, online_fraction, rng):
+    """Insert count users in bulk; returns how many were seeded as active"""
+    now = datetime.utcnow()
+    rows = []
+    active = 0
+    for i in range(count):
+        if rng.random() < online_fraction:
+            last_activity = now - timedelta(seconds=rng.uniform(0, 240))
+            current_status = rng.choice(['online', 'online', 'online', 'break'])
+            active += 1
+        else:
+            last_activity = now - timedelta(hours=rng.uniform(1, 24 * 30))
+            current_status = rng.choice(['offline', 'offline', 'online'])
+        rows.append({
+            'username': f'bench{i}',
+            'email': f'bench{i}@example.com',
+            'password_hash': 'pbkdf2:sha256:1000$bench$0',
+            'is_admin': False,
+            'is_active': True,
+            'created_at': now,
+            'last_activity': last_activity,
+            'current_status': current_status,
+            'status': current_status,
+            'department': rng.choice(['ENGINEERING', 'MARKETING', 'SALES', 'HR', 'FINANCE'])
+        })
+    db.session.execute(User.__table__.insert(), rows)
+    db.session.commit()
+    return active
+
+def run_benchmark(users, online_fraction, repeat, seed):
+    from app import create_app, db
+    from config_dev import TestingConfig
+    from models.user import User
+
+    app = create_app(TestingConfig)
+    with app.app_context():
+        active = seed_users(db, User, users, online_fraction, random.Random(seed))
+        print(f"🌱 Seeded {users} users ({active} active in the last 5 minutes)")
+
+        def legacy_counts():
+            return {
+                'online': User.query.filter_by(current_status='online').count(),
+                'break': User.query.filter_by(current_status='break').count(),
+                'offline': User.query.filter_by(current_status='offline').count(),
+                'total': User.query.count()
+            }
+
+        def legacy_listing():
+            result = [user for user in User.query.all() if user.is_online]
+            db.session.expunge_all()
+            return result
+
+        results = {}
+        for name, function in (('legacy counts', legacy_counts),
+                               ('status counts', User.get_status_counts),
+                               ('legacy listing', legacy_listing),
+                               ('online users', User.get_online_users)):
+            results[name] = time_call(function, repeat if 'listing' not in name else max(1, repeat // 10))
+
+        print()
+        print(f"{'query':<16} {'median ms':>10}  result")
+        for name, (ms, result) in results.items():
+            summary = len(result) if isinstance(result, list) else result
+            print(f"{name:<16} {ms:>10.2f}  {summary}")
+
+        now = datetime.utcnow()
+        query = db.session.query(User.id).filter(User.last_activity > now - timedelta(minutes=5))
+        statement = query.statement.compile(db.engine, compile_kwargs={'literal_binds': True})
+        plan = db.session.execute(db.text(f'EXPLAIN QUERY PLAN {statement}')).all()
+        print()
+        print("📋 Online users query plan:")
+        for row in plan:
+            print(f"   {row[-1]}")
+
+        db.drop_all()
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Benchmark the online-users and status-count queries')
+    parser.add_argument('--users', type=int, default=10000, help='users to seed')
+    parser.add_argument('--online', type=float, default=0.1, help='fraction of users active recently')
+    parser.add_argument('--repeat', type=int, default=50, help='timed calls per query')
+    parser.add_argument('--seed', type=int, default=1, help='random seed')
+    args = parser.parse_args()
+
+    print("🚀 Online Users Benchmark")
+    print("=" * 50)
+    run_benchmark(args.users, args.online, args.repeat, args.seed)
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Rewrite stored message bodies under the current MESSAGE_COMPRESSION settings
+
+Usage: python compress_messages.py [--vacuum]
+
+Compresses existing long bodies once MESSAGE_COMPRESSION is turned on, or
+writes them back as plain text after it is turned off. --vacuum compacts
+the database file afterwards so the freed pages are returned to disk.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from utils.message_compression import compress_existing_messages, get_codec
+
+def compress_messages(vacuum=False):
+    """Rewrite message bodies and optionally VACUUM"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            print(f"Codec: {get_codec() or 'none (decompressing)'}")
+            rewritten, saved = compress_existing_messages()
+            print(f"✅ Rewrote {rewritten} messages ({saved:,} bytes saved)")
+            
+            if vacuum and rewritten:
+                with db.engine.connect() as conn:
+                    conn.exec_driver_sql('VACUUM')
+                print("✅ Database vacuumed")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error compressing messages: {e}")
+            return False
+    
+    return True
+
+if __name__ == "__main__":
+    print("🗜️  Compressing Message Bodies")
+    print("=" * 50)
+    
+    success = compress_messages(vacuum='--vacuum' in sys.argv[1:])
+    
+    if success:
+        print("\n✅ Message compression completed successfully!")
+    else:
+        print("\n❌ Message compression failed!")
+        print("Please check the error messages above.")
@@ -30,3 +30,53 @@ class Config:
     TASK_COMPLETION_WEIGHT = 0.4
     ACTIVITY_WEIGHT = 0.3
     PUNCTUALITY_WEIGHT = 0.3
+    
+    # Bulk deletion settings
+    BULK_DELETE_CHUNK_SIZE = 1000  # Rows per DELETE statement/transaction
+    BULK_DELETE_BACKGROUND_THRESHOLD = 10000  # Larger deletes run as a background job
+    BACKGROUND_JOB_WORKERS = 2
+    
+    # Department chat settings
+    CHANNEL_MESSAGE_NOTIFICATIONS = True  # Also notify channel members (bulk insert on a background job)
+    
+    # Message attachment settings
+    ATTACHMENT_FOLDER = None  # Defaults to <instance>/attachments, outside static/
+    ATTACHMENT_MAX_SIZE = None  # Defaults to MAX_CONTENT_LENGTH
+    ATTACHMENT_CHUNK_SIZE = 64 * 1024  # Bytes read from the upload stream at a time
+    
+    # Message group commit settings
+    MESSAGE_GROUP_COMMIT = False  # Queue sends and commit them in batches
+    MESSAGE_GROUP_COMMIT_INTERVAL_MS = 5  # Longest a send waits for others to join its batch
+    MESSAGE_GROUP_COMMIT_MAX_BATCH = 100  # Sends per transaction
+    MESSAGE_GROUP_COMMIT_TIMEOUT = 10  # Seconds a send may stay queued before it is withdrawn unsent
+    
+    # Message archive settings
+    MESSAGE_ARCHIVE_AFTER_DAYS = 180  # Messages older than this move to the monthly archive files
+    MESSAGE_ARCHIVE_FOLDER = None  # Defaults to <instance>/message_archive
+    MESSAGE_ARCHIVE_BATCH_SIZE = 1000  # Messages moved per archive/delete transaction
+    
+    # Conversation list cache settings
+    CONVERSATION_CACHE_SIZE = 1000  # Users whose conversation list is kept in memory (0 disables)
+    
+    # Message compression settings
+    MESSAGE_COMPRESSION = None  # 'zlib' or 'zstd' (needs zstandard) to store long bodies compressed
+    MESSAGE_COMPRESSION_THRESHOLD = 1024  # Bytes; shorter bodies stay plain text
+    RESPONSE_COMPRESSION = True  # gzip/br for message and conversation responses
+    RESPONSE_COMPRESSION_MIN_SIZE = 1024  # Bytes; smaller responses are sent as-is
+    
+    # Presence settings
+    PRESENCE_FLUSH_INTERVAL = 30  # Seconds between batched last_activity writes (0: only on explicit flush)
+    PRESENCE_OFFLINE_AFTER = 300  # Seconds without activity before a user is swept offline
+    PRESENCE_BREAK_AFTER = 900  # Seconds without activity before an online user counts as on break
+    ADMIN_STATUS_SNAPSHOT_TTL = 15  # Seconds the admin dashboard's status snapshot is shared
+    STATUS_FEED_HISTORY = 1000  # Status changes kept for ?since= deltas; older clients get a full list
+    DEPARTMENT_STATS_RECONCILE_INTERVAL = 300  # Seconds between full rebuilds of the department counters
+    PRESENCE_HISTORY_INTERVAL = 300  # Seconds per presence history bucket (must divide a day)
+    PRESENCE_HISTORY_SAMPLING = True  # Sample presence history from a background thread (one worker only)
+    
+    # Break settings
+    BREAK_AUTO_END = True  # End timed breaks server-side when their duration is up
+    
+    # User loader cache settings
+    USER_CACHE_TTL = 30  # Seconds a loaded user is reused by login_manager.user_loader (0 disables)
+    USER_CACHE_SIZE = 5000  # Users kept in the loader cache
@@ -25,6 +25,21 @@ class DevelopmentConfig(Config):
     # Disable CSRF for API testing (enable in production)
     WTF_CSRF_ENABLED = False
 
+class TestingConfig(Config):
+    """Testing configuration with an isolated in-memory database"""
+    TESTING = True
+    
+    FACE_RECOGNITION_ENABLED = False
+    
+    # Never touch the real database from tests
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
+    
+    # Tests flush presence explicitly instead of from a background thread
+    PRESENCE_FLUSH_INTERVAL = 0
+    PRESENCE_HISTORY_SAMPLING = False
+    
+    WTF_CSRF_ENABLED = False
+
 class ProductionConfig(Config):
     """Production configuration with full security"""
     DEBUG = False
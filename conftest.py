@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the test scripts
+
+The test_*.py scripts also run on their own (python test_x.py), so these
+are plain functions imported from here rather than pytest fixtures.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from sqlalchemy import event
+from app import create_app
+from config_dev import TestingConfig
+
+def make_app(**config):
+    """Create an app on TestingConfig with per-test config overrides"""
+    return create_app(type('TestConfig', (TestingConfig,), config))
+
+def login(client, user_id):
+    """Log a test client in as user_id"""
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+        session['_fresh'] = True
+
+def read_event(stream):
+    """Next non-empty chunk of a streamed response"""
+    for chunk in stream:
+        chunk = chunk.decode() if isinstance(chunk, bytes) else chunk
+        if chunk.strip():
+            return chunk
+
+class StatementRecorder(list):
+    """SQL statements sent to an engine, until stop() or the end of a with block"""
+
+    def __init__(self, engine):
+        super().__init__()
+        self.engine = engine
+        event.listen(engine, 'before_cursor_execute', self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, *args):
+        self.append(statement)
+
+    def stop(self):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
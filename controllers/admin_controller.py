@@ -3,7 +3,10 @@ from flask_login import login_required, current_user
 from models.user import User
 from models.notification import Notification
 from models.log import Log
+from models.message import Message
 from app import db
+from utils import department_stats, presence_history, status_snapshot, user_cache
+from utils.compact_responses import compressible
 from datetime import datetime, timedelta
 from functools import wraps
 
@@ -79,74 +82,19 @@ def users():
 @admin_required
 def dashboard():
     """3D Admin dashboard page with employee status visualization"""
-    from datetime import datetime, timedelta
-    
-    # Get all users
-    users = User.query.filter_by(is_admin=False).all()
-    
-    # Categorize users by status
-    user_status_data = []
-    departments = ['ENGINEERING', 'MARKETING', 'SALES', 'HR', 'FINANCE']
-    
-    for i, user in enumerate(users):
-        # Determine user status based on online status and activity
-        if user.is_online:
-            # Check if user is on break (no activity in last 15 minutes but still online)
-            if user.last_activity and datetime.utcnow() - user.last_activity > timedelta(minutes=15):
-                status = 'break'
-                status_color = 'blue'
-            else:
-                status = 'online'
-                status_color = 'green'
-        else:
-            status = 'offline'
-            status_color = 'red'
-        
-        # Use user's actual department or assign cyclically for demo
-        department = user.department or departments[i % len(departments)]
-        
-        user_data = {
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'status': status,
-            'status_color': status_color,
-            'department': department,
-            'last_activity': user.last_activity.isoformat() if user.last_activity else None,
-            'last_login': user.last_login.isoformat() if user.last_login else None,
-            'position': {
-                'x': (i % 4) * 250 + 100,  # Grid positioning
-                'y': (i // 4) * 200 + 100,
-                'z': 0
-            }
-        }
-        user_status_data.append(user_data)
-    
-    # Get department statistics
-    dept_stats = {}
-    for dept in departments:
-        dept_users = [u for u in user_status_data if u['department'] == dept]
-        dept_stats[dept] = {
-            'total': len(dept_users),
-            'online': len([u for u in dept_users if u['status'] == 'online']),
-            'break': len([u for u in dept_users if u['status'] == 'break']),
-            'offline': len([u for u in dept_users if u['status'] == 'offline'])
-        }
-    
-    # Overall statistics
-    total_users = len(users)
-    online_users = len([u for u in user_status_data if u['status'] == 'online'])
-    break_users = len([u for u in user_status_data if u['status'] == 'break'])
-    offline_users = len([u for u in user_status_data if u['status'] == 'offline'])
+    snapshot = status_snapshot.get_snapshot()
+    stats = snapshot['stats']
     
     return render_template('admin/dashboard.html', 
-                          user_status_data=user_status_data,
-                          dept_stats=dept_stats,
-                          total_users=total_users,
-                          online_users=online_users,
-                          break_users=break_users,
-                          offline_users=offline_users,
-                          departments=departments)
+                          user_status_data=snapshot['users'],
+                          dept_stats=snapshot['departments'],
+                          total_users=stats['total'],
+                          online_users=stats['online'],
+                          break_users=stats['break'],
+                          offline_users=stats['offline'],
+                          departments=list(snapshot['departments']),
+                          status_seq=snapshot['seq'],
+                          status_epoch=snapshot['epoch'])
 
 @admin_bp.route('/notifications')
 @login_required
@@ -161,88 +109,95 @@ def notifications():
 @admin_required
 def get_online_users():
     """API endpoint to get online users"""
-    online_users = User.query.filter_by(is_online=True).all()
     users_data = []
     
-    for user in online_users:
+    for user in User.get_online_users():
         users_data.append({
             'id': user.id,
             'username': user.username,
-            'last_active': user.last_active.isoformat() if user.last_active else None,
-            'status': 'online'
+            'last_active': user.last_activity.isoformat() if user.last_activity else None,
+            'status': user.status
         })
     
-    return jsonify({'users': users_data})
+    return jsonify({'users': users_data, 'stats': User.get_status_counts()})
 
 @admin_bp.route('/api/user-status')
 @login_required
 @admin_required
 def get_user_status():
     """API endpoint to get real-time user status for 3D dashboard"""
-    from datetime import datetime, timedelta
+    return jsonify(status_snapshot.get_snapshot())
+
+@admin_bp.route('/api/department-stats')
+@login_required
+@admin_required
+def get_department_stats():
+    """Online/break/offline counts per department from the maintained counters"""
+    return jsonify({
+        'success': True,
+        'departments': department_stats.get_department_stats()
+    })
+
+@admin_bp.route('/api/presence-heatmap')
+@login_required
+@admin_required
+@compressible
+def get_presence_heatmap():
+    """Online/break counts per department and time bucket over ?start=&end= (YYYY-MM-DD, UTC)
+
+    With ?user_id= the user's own status per bucket instead.
+    """
+    try:
+        end_day = presence_history.parse_day(request.args.get('end'))
+        start_day = presence_history.parse_day(request.args.get('start'), end_day)
+        user_id = request.args.get('user_id', type=int)
+        
+        if user_id is not None:
+            history = presence_history.get_user_history(user_id, start_day, end_day)
+        else:
+            history = presence_history.get_heatmap(start_day, end_day, request.args.get('department'))
+    except ValueError as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
     
-    users = User.query.filter_by(is_admin=False).all()
-    departments = ['ENGINEERING', 'MARKETING', 'SALES', 'HR', 'FINANCE']
+    return jsonify({'success': True, **history})
+
+@admin_bp.route('/api/user-status/feed')
+@login_required
+@admin_required
+def get_user_status_feed():
+    """Users whose status changed since ?since=<seq> (full list on first load or after a gap)"""
+    from utils import status_feed
     
-    user_status_data = []
+    since = request.args.get('since', type=int)
+    epoch = request.args.get('epoch')
+    return jsonify(status_feed.get_changes(since, epoch))
+
+@admin_bp.route('/api/user-status/stream')
+@login_required
+@admin_required
+def user_status_stream():
+    """Server-Sent Events stream of status deltas"""
+    from flask import Response, current_app
+    from utils import status_feed
     
-    for i, user in enumerate(users):
-        # Determine user status based on online status and activity
-        if user.is_online:
-            # Check if user is on break (no activity in last 15 minutes but still online)
-            if user.last_activity and datetime.utcnow() - user.last_activity > timedelta(minutes=15):
-                status = 'break'
-                status_color = 'blue'
-            else:
-                status = 'online'
-                status_color = 'green'
-        else:
-            status = 'offline'
-            status_color = 'red'
-        
-        # Assign department cyclically for demo
-        department = departments[i % len(departments)]
-        
-        user_data = {
-            'id': user.id,
-            'username': user.username,
-            'email': user.email,
-            'status': status,
-            'status_color': status_color,
-            'department': department,
-            'last_activity': user.last_activity.isoformat() if user.last_activity else None,
-            'last_login': user.last_login.isoformat() if user.last_login else None
-        }
-        user_status_data.append(user_data)
-    
-    # Calculate statistics
-    total_users = len(users)
-    online_users = len([u for u in user_status_data if u['status'] == 'online'])
-    break_users = len([u for u in user_status_data if u['status'] == 'break'])
-    offline_users = len([u for u in user_status_data if u['status'] == 'offline'])
-    
-    # Department statistics
-    dept_stats = {}
-    for dept in departments:
-        dept_users = [u for u in user_status_data if u['department'] == dept]
-        dept_stats[dept] = {
-            'total': len(dept_users),
-            'online': len([u for u in dept_users if u['status'] == 'online']),
-            'break': len([u for u in dept_users if u['status'] == 'break']),
-            'offline': len([u for u in dept_users if u['status'] == 'offline'])
-        }
+    since = request.args.get('since', type=int)
+    epoch = request.args.get('epoch')
     
-    return jsonify({
-        'users': user_status_data,
-        'stats': {
-            'total': total_users,
-            'online': online_users,
-            'break': break_users,
-            'offline': offline_users
-        },
-        'departments': dept_stats,
-        'timestamp': datetime.utcnow().isoformat()
-    })
+    # A reconnecting EventSource resumes from the last event it received
+    last_event_id = request.headers.get('Last-Event-ID', '')
+    if ':' in last_event_id:
+        epoch, _, seq = last_event_id.partition(':')
+        since = int(seq) if seq.isdigit() else None
+    
+    app = current_app._get_current_object()
+    
+    # The stream can run for hours; don't hold a database connection for it
+    db.session.remove()
+    
+    response = Response(status_feed.event_stream(app, since, epoch), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @admin_bp.route('/departments')
 @login_required
@@ -336,6 +291,7 @@ def assign_department():
     user = User.query.get_or_404(user_id)
     user.department = department
     db.session.commit()
+    status_snapshot.invalidate()
     
     return jsonify({
         'success': True,
@@ -382,16 +338,7 @@ def send_message_api():
     
     user = User.query.get_or_404(user_id)
     
-    # Create notification
-    notification = Notification(
-        user_id=user_id,
-        title='Message from Admin',
-        message=message,
-        type='message',
-        icon='envelope'
-    )
-    db.session.add(notification)
-    db.session.commit()
+    Message.send_direct_message(current_user.id, user.id, message)
     
     return jsonify({
         'success': True,
@@ -403,26 +350,64 @@ def send_message_api():
 @admin_required
 def get_messages():
     """Get recent messages for live updates"""
-    messages = Notification.query.filter_by(type='message').order_by(
-        Notification.created_at.desc()
-    ).limit(10).all()
+    # Latest direct messages sent to any admin
+    admin_ids = db.session.query(User.id).filter(User.is_admin == True)
+    stmt = Message.serialized_select().where(
+        Message.recipient_id.in_(admin_ids.scalar_subquery()) &
+        (Message.chat_type == 'direct')
+    ).order_by(Message.id.desc()).limit(10)
     
     message_data = []
-    for msg in messages:
+    for row in db.session.execute(stmt):
         message_data.append({
-            'id': msg.id,
-            'title': msg.title,
-            'message': msg.message,
-            'user_id': msg.user_id,
-            'username': msg.user.username if msg.user else 'Unknown',
-            'created_at': msg.created_at.isoformat(),
-            'is_read': msg.is_read
+            'id': row.id,
+            'title': f'Message from {row.sender_name}',
+            'message': row.content,
+            'user_id': row.sender_id,
+            'username': row.sender_name or 'Unknown',
+            'created_at': row.timestamp.isoformat(),
+            'is_read': Message.row_is_read(row)
         })
     
     return jsonify({
         'success': True,
         'messages': message_data
     })
+
+@admin_bp.route('/api/messages/archive', methods=['POST'])
+@login_required
+@admin_required
+def archive_messages():
+    """Move old messages into the monthly archive files on a background job"""
+    from utils.message_archive import archive_messages as run_archive
+    from utils.background_jobs import submit_job
+    
+    data = request.get_json(silent=True) or {}
+    job_id = submit_job(
+        'archive_messages', run_archive, data.get('older_than_days'), user_id=current_user.id
+    )
+    
+    return jsonify({
+        'success': True,
+        'message': 'Archiving old messages in the background',
+        'job_id': job_id
+    }), 202
+
+@admin_bp.route('/api/cache-stats')
+@login_required
+@admin_required
+def cache_stats():
+    """Hit rates of the in-memory caches"""
+    from utils import conversation_cache
+    
+    return jsonify({
+        'success': True,
+        'conversation_cache': conversation_cache.get_stats(),
+        'status_snapshot': status_snapshot.get_stats(),
+        'department_stats': department_stats.get_stats(),
+        'user_cache': user_cache.get_stats()
+    })
+
 @admin_bp.route('/api/broadcast-notification', methods=['POST'])
 @login_required
 @admin_required
@@ -541,42 +526,25 @@ def get_admin_messages(user_id):
     try:
         messages = []
         
-        # Get messages sent to the user from admin
-        sent_to_user = Notification.query.filter(
-            Notification.user_id == user_id,
-            Notification.type == 'message',
-            Notification.title.like('Message from %')
-        ).all()
+        # Admins share one inbox: every direct message between any admin and the user
+        admin_ids = [admin_id for (admin_id,) in db.session.query(User.id).filter(User.is_admin == True).all()]
+        stmt = Message.serialized_select().where(
+            (Message.chat_type == 'direct') & (
+                (Message.sender_id.in_(admin_ids) & (Message.recipient_id == user_id)) |
+                ((Message.sender_id == user_id) & Message.recipient_id.in_(admin_ids))
+            )
+        ).order_by(Message.id.asc())
         
-        for msg in sent_to_user:
+        for row in db.session.execute(stmt):
+            is_admin = row.sender_id != user_id
             messages.append({
-                'id': msg.id,
-                'content': msg.message,
-                'sender_name': 'Admin',
-                'is_admin': True,
-                'created_at': msg.created_at.isoformat()
+                'id': row.id,
+                'content': row.content,
+                'sender_name': 'Admin' if is_admin else row.sender_name,
+                'is_admin': is_admin,
+                'created_at': row.timestamp.isoformat()
             })
         
-        # Get messages sent by the user to admin
-        user = User.query.get(user_id)
-        if user:
-            sent_by_user = Notification.query.filter(
-                Notification.type == 'message',
-                Notification.title == f'Message from {user.username}'
-            ).all()
-            
-            for msg in sent_by_user:
-                messages.append({
-                    'id': msg.id,
-                    'content': msg.message,
-                    'sender_name': user.username,
-                    'is_admin': False,
-                    'created_at': msg.created_at.isoformat()
-                })
-        
-        # Sort messages by timestamp
-        messages.sort(key=lambda x: x['created_at'])
-        
         return jsonify({
             'success': True,
             'messages': messages
@@ -602,16 +570,7 @@ def send_message_by_username():
         if not user:
             return jsonify({'success': False, 'message': 'User not found'})
         
-        # Create notification for the user
-        notification = Notification(
-            user_id=user.id,
-            title=f'Message from Admin',
-            message=message,
-            type='message',
-            icon='envelope'
-        )
-        db.session.add(notification)
-        db.session.commit()
+        Message.send_direct_message(current_user.id, user.id, message)
         
         return jsonify({
             'success': True,
@@ -640,24 +599,37 @@ def delete_user(user_id):
         
         username = user.username
         
-        # Delete related records first
-        Notification.query.filter_by(user_id=user_id).delete()
-        Log.query.filter_by(user_id=user_id).delete()
+        from utils import bulk_delete
+        from utils.background_jobs import submit_job
         
-        # Delete face encodings if they exist
-        try:
-            from models.face_encoding import FaceEncoding
-            FaceEncoding.query.filter_by(user_id=user_id).delete()
-        except:
-            pass  # Face encoding model might not exist
+        row_count = (
+            db.session.query(db.func.count(Log.id)).filter(Log.user_id == user_id).scalar() +
+            db.session.query(db.func.count(Message.id)).filter(
+                (Message.sender_id == user_id) | (Message.recipient_id == user_id)
+            ).scalar()
+        )
         
-        # Delete the user
-        db.session.delete(user)
-        db.session.commit()
+        # Users with a long history are deleted by a background job
+        background = request.args.get('background', '').lower() == 'true'
+        if bulk_delete.should_run_in_background(row_count, force=background):
+            # Block logins right away while the history is removed
+            user.is_active = False
+            db.session.commit()
+            
+            job_id = submit_job('delete_user', bulk_delete.delete_user_data, user_id, user_id=current_user.id)
+            return jsonify({
+                'success': True,
+                'message': f'Deleting user {username} in the background',
+                'job_id': job_id
+            }), 202
+        
+        # Delete the user and related records in chunks
+        deleted = bulk_delete.delete_user_data(user_id)
         
         return jsonify({
             'success': True,
-            'message': f'User {username} deleted successfully'
+            'message': f'User {username} deleted successfully',
+            'deleted': deleted
         })
         
     except Exception as e:
@@ -3,8 +3,13 @@ from flask_login import login_required, current_user
 from models.user import User
 from models.message import Message
 from models.face_encoding import FaceEncoding
+from models.unread_counter import UnreadCounter
+from models.group_read_state import GroupReadState
+from models.conversation_watermark import ConversationWatermark
+from utils import bulk_delete, conversation_cache, message_writer, presence
+from utils.compact_responses import compressible, records_payload
+from utils.background_jobs import submit_job, get_job
 from app import db
-from datetime import datetime
 import base64
 
 api_bp = Blueprint('api', __name__, url_prefix='/api')
@@ -23,6 +28,9 @@ def get_users():
             # Get regular users
             users = User.query.filter_by(is_admin=False).filter(User.id != current_user.id).all()
         
+        # Unread counts for every listed user in one primary-key read
+        unread_counts = UnreadCounter.get_counts(current_user.id, 'direct')
+        
         user_list = []
         for user in users:
             # Get face image if available
@@ -32,8 +40,8 @@ def get_users():
                 # Use the stored face image
                 face_image = face_encoding.encoding
             
-            # Get unread message count
-            unread_count = Message.get_unread_count(user.id)
+            # Get unread message count for the conversation with this user
+            unread_count = unread_counts.get(user.id, 0)
             
             user_data = {
                 'id': user.id,
@@ -60,6 +68,7 @@ def get_users():
 
 @api_bp.route('/messages/<int:user_id>', methods=['GET'])
 @login_required
+@compressible
 def get_messages(user_id):
     """Get messages between current user and specified user"""
     try:
@@ -71,22 +80,59 @@ def get_messages(user_id):
                 'message': 'User not found'
             }), 404
         
-        # Get messages between users
-        messages_query = Message.get_conversation(current_user.id, user_id)
+        # Get messages between users, newest first; ?before=<id> pages back into history
+        before_id = request.args.get('before', type=int)
+        limit = min(request.args.get('limit', 50, type=int), 200)
         messages = []
         
-        for msg in reversed(messages_query):
-            msg_dict = msg.to_dict()
+        for msg_dict in Message.get_conversation_history(current_user.id, user_id, before_id, limit):
             # Determine if message was sent by current user
-            msg_dict['is_sent'] = (msg.sender_id == current_user.id)
+            msg_dict['is_sent'] = (msg_dict['sender_id'] == current_user.id)
             messages.append(msg_dict)
         
         # Mark messages as read
-        Message.mark_conversation_read(current_user.id, user_id)
+        if not before_id:
+            Message.mark_conversation_read(current_user.id, user_id)
         
         return jsonify({
             'success': True,
-            'messages': messages
+            **records_payload('messages', messages),
+            'next_before': messages[-1]['id'] if len(messages) == limit else None,
+            # How far the other user has received/read the current user's messages
+            'receipt': ConversationWatermark.get_receipt(user_id, current_user.id)
+        })
+        
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@api_bp.route('/messages/search', methods=['GET'])
+@login_required
+def search_messages():
+    """Full-text search over the messages the current user can see"""
+    try:
+        from utils.message_search import search_messages as run_search
+        
+        query = request.args.get('q', '').strip()
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        
+        if not query:
+            return jsonify({
+                'success': False,
+                'message': 'Search query is required'
+            }), 400
+        
+        results, has_more = run_search(current_user.id, query, page=page, per_page=per_page)
+        
+        return jsonify({
+            'success': True,
+            'query': query,
+            'page': page,
+            'has_more': has_more,
+            'results': results
         })
         
     except Exception as e:
@@ -111,6 +157,12 @@ def send_message():
         recipient_id = data.get('recipient_id')
         content = data.get('content')
         
+        attachment, error = load_message_attachment(data.get('attachment_id'))
+        if error:
+            return error
+        if attachment and not content:
+            content = attachment.filename
+        
         if not recipient_id or not content:
             return jsonify({
                 'success': False,
@@ -126,16 +178,7 @@ def send_message():
             }), 404
         
         # Create message
-        message = Message(
-            sender_id=current_user.id,
-            recipient_id=recipient_id,
-            content=content.strip(),
-            message_type='text',
-            chat_type='direct'
-        )
-        
-        db.session.add(message)
-        db.session.commit()
+        message = message_writer.send_direct_message(current_user.id, recipient.id, content.strip(), attachment=attachment)
         
         return jsonify({
             'success': True,
@@ -146,10 +189,17 @@ def send_message():
                 'sender_name': current_user.username,
                 'content': message.content,
                 'timestamp': message.timestamp.isoformat(),
+                'message_type': message.message_type,
+                'attachment': attachment.to_dict() if attachment else None,
                 'is_sent': True
             }
         })
         
+    except message_writer.MessageNotSent as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
     except Exception as e:
         return jsonify({
             'success': False,
@@ -177,17 +227,13 @@ def update_user_status():
                 'message': 'Invalid status'
             }), 400
         
-        # Update user status
-        current_user.current_status = new_status
-        current_user.status = new_status
-        current_user.last_activity = datetime.utcnow()
-        
-        if new_status == 'online':
-            current_user.is_online = True
-        elif new_status == 'offline':
-            current_user.is_online = False
-        
-        db.session.commit()
+        # Activity goes to the presence registry; only a changed status is written now
+        presence.touch(current_user.id)
+        if current_user.current_status != new_status or current_user.status != new_status:
+            current_user.current_status = new_status
+            current_user.status = new_status
+            db.session.commit()
+        presence.set_status(current_user.id, new_status)
         
         return jsonify({
             'success': True,
@@ -206,20 +252,17 @@ def update_user_status():
 def get_dashboard_stats():
     """Get dashboard statistics"""
     try:
-        # Get user counts by status
-        online_users = User.query.filter_by(current_status='online').count()
-        break_users = User.query.filter_by(current_status='break').count()
-        offline_users = User.query.filter_by(current_status='offline').count()
-        total_users = User.query.count()
+        # Get user counts by status (one aggregate query)
+        counts = User.get_status_counts()
         
         # Get recent activity (placeholder)
         recent_logins = 0
         
         stats = {
-            'online_users': online_users,
-            'break_users': break_users,
-            'offline_users': offline_users,
-            'total_users': total_users,
+            'online_users': counts['online'],
+            'break_users': counts['break'],
+            'offline_users': counts['offline'],
+            'total_users': counts['total'],
             'recent_logins': recent_logins
         }
         
@@ -296,26 +339,14 @@ def get_all_users():
 def get_unread_notifications():
     """Get unread message count for current user"""
     try:
-        # Get unread direct messages
-        unread_direct = Message.query.filter_by(
-            recipient_id=current_user.id,
-            is_read=False,
-            chat_type='direct'
-        ).count()
-        
-        # Get unread group messages
-        from models.group import Group
-        user_groups = Group.get_user_groups(current_user.id)
-        unread_group = 0
+        # Read maintained counters and group cursors instead of scanning messages
+        unread_direct = UnreadCounter.get_totals(current_user.id)['direct']
+        unread_group = sum(GroupReadState.get_unread_counts(current_user.id).values())
         
-        for group in user_groups:
-            group_unread = Message.query.filter(
-                Message.group_id == group.id,
-                Message.sender_id != current_user.id,
-                Message.is_read == False,
-                Message.chat_type == 'group'
-            ).count()
-            unread_group += group_unread
+        # The client now knows about these messages: advance delivery receipts
+        if unread_direct:
+            ConversationWatermark.mark_delivered(current_user.id)
+            db.session.commit()
         
         return jsonify({
             'success': True,
@@ -332,12 +363,17 @@ def get_unread_notifications():
 
 @api_bp.route('/conversations', methods=['GET'])
 @login_required
+@compressible
 def get_conversations():
     """Get all conversations for current user"""
     try:
         conversation_type = request.args.get('type', 'users')
         
-        all_conversations = Message.get_user_conversations(current_user.id)
+        all_conversations = conversation_cache.get_user_conversations(current_user.id)
+        
+        if any(c.get('type') == 'direct' and c.get('unread_count') for c in all_conversations):
+            ConversationWatermark.mark_delivered(current_user.id)
+            db.session.commit()
         
         # Filter by type
         conversations = []
@@ -350,7 +386,7 @@ def get_conversations():
         
         return jsonify({
             'success': True,
-            'conversations': conversations
+            **records_payload('conversations', conversations)
         })
         
     except Exception as e:
@@ -414,7 +450,7 @@ def create_group():
         return jsonify({
             'success': True,
             'message': 'Group created successfully',
-            'group': group.to_dict()
+            'group': Group.get_with_members(group.id).to_dict()
         })
         
     except Exception as e:
@@ -426,6 +462,7 @@ def create_group():
 
 @api_bp.route('/groups/<int:group_id>/messages', methods=['GET'])
 @login_required
+@compressible
 def get_group_messages(group_id):
     """Get messages for a group"""
     try:
@@ -445,13 +482,21 @@ def get_group_messages(group_id):
                 'message': 'You are not a member of this group'
             }), 403
         
-        # Get group messages
-        messages_query = Message.get_group_messages(group_id)
-        messages = [msg.to_dict() for msg in reversed(messages_query)]
+        # Get group messages (newest first); ?before=<id> pages back into history
+        before_id = request.args.get('before', type=int)
+        limit = min(request.args.get('limit', 50, type=int), 200)
+        newest_first = Message.get_group_history(group_id, before_id, limit)
+        messages = list(reversed(newest_first))
+        
+        # Opening the group moves the user's read cursor to the newest message
+        if newest_first and not before_id:
+            GroupReadState.mark_read(current_user.id, group_id, newest_first[0]['id'])
+            db.session.commit()
         
         return jsonify({
             'success': True,
-            'messages': messages
+            **records_payload('messages', messages),
+            'next_before': newest_first[-1]['id'] if len(newest_first) == limit else None
         })
         
     except Exception as e:
@@ -480,6 +525,10 @@ def delete_message(message_id):
                 'message': 'You can only delete your own messages'
             }), 403
         
+        if message.chat_type == 'direct' and not message.has_been_read and message.recipient_id:
+            UnreadCounter.decrement(message.recipient_id, 'direct', message.sender_id)
+        
+        conversation_cache.message_deleted(message)
         db.session.delete(message)
         db.session.commit()
         
@@ -500,20 +549,28 @@ def delete_message(message_id):
 def delete_conversation(user_id):
     """Delete entire conversation with a user"""
     try:
-        # Delete all messages between current user and target user
-        messages = Message.query.filter(
-            ((Message.sender_id == current_user.id) & (Message.recipient_id == user_id)) |
-            ((Message.sender_id == user_id) & (Message.recipient_id == current_user.id))
-        ).all()
-        
-        for message in messages:
-            db.session.delete(message)
+        message_count = bulk_delete.count_conversation_messages(current_user.id, user_id)
+        
+        # Very long histories are deleted by a background job
+        background = request.args.get('background', '').lower() == 'true'
+        if bulk_delete.should_run_in_background(message_count, force=background):
+            job_id = submit_job(
+                'delete_conversation', bulk_delete.delete_conversation,
+                current_user.id, user_id, user_id=current_user.id
+            )
+            return jsonify({
+                'success': True,
+                'message': f'Deleting conversation in the background ({message_count} messages)',
+                'job_id': job_id
+            }), 202
         
-        db.session.commit()
+        # Delete all messages between current user and target user
+        deleted = bulk_delete.delete_conversation(current_user.id, user_id)
         
         return jsonify({
             'success': True,
-            'message': f'Conversation deleted successfully ({len(messages)} messages removed)'
+            'message': f'Conversation deleted successfully ({deleted["messages"]} messages removed)',
+            'deleted': deleted
         })
         
     except Exception as e:
@@ -545,18 +602,34 @@ def delete_group(group_id):
                 'message': 'Only group creator or admin can delete the group'
             }), 403
         
-        # Delete all group messages first
-        group_messages = Message.query.filter_by(group_id=group_id).all()
-        for message in group_messages:
-            db.session.delete(message)
+        group_name = group.name
+        message_count = bulk_delete.count_group_messages(group_id)
         
-        # Delete the group
-        db.session.delete(group)
-        db.session.commit()
+        # Very long histories are deleted by a background job
+        background = request.args.get('background', '').lower() == 'true'
+        if bulk_delete.should_run_in_background(message_count, force=background):
+            # Hide the group right away while its history is removed
+            group.is_active = False
+            conversation_cache.group_removed(group_id)
+            db.session.commit()
+            
+            job_id = submit_job(
+                'delete_group', bulk_delete.delete_group,
+                group_id, user_id=current_user.id
+            )
+            return jsonify({
+                'success': True,
+                'message': f'Deleting group "{group_name}" in the background ({message_count} messages)',
+                'job_id': job_id
+            }), 202
+        
+        # Delete the group with its messages, members and read cursors
+        deleted = bulk_delete.delete_group(group_id)
         
         return jsonify({
             'success': True,
-            'message': f'Group "{group.name}" deleted successfully'
+            'message': f'Group "{group_name}" deleted successfully ({deleted["messages"]} messages removed)',
+            'deleted': deleted
         })
         
     except Exception as e:
@@ -584,6 +657,12 @@ def send_group_message():
         group_id = data.get('group_id')
         content = data.get('content')
         
+        attachment, error = load_message_attachment(data.get('attachment_id'))
+        if error:
+            return error
+        if attachment and not content:
+            content = attachment.filename
+        
         if not group_id or not content:
             return jsonify({
                 'success': False,
@@ -606,7 +685,7 @@ def send_group_message():
             }), 403
         
         # Send message
-        message = Message.send_group_message(current_user.id, group_id, content.strip())
+        message = message_writer.send_group_message(current_user.id, group_id, content.strip(), attachment=attachment)
         
         return jsonify({
             'success': True,
@@ -617,13 +696,248 @@ def send_group_message():
                 'sender_name': current_user.username,
                 'content': message.content,
                 'timestamp': message.timestamp.isoformat(),
+                'message_type': message.message_type,
+                'attachment': attachment.to_dict() if attachment else None,
                 'is_sent': True
             }
         })
         
+    except message_writer.MessageNotSent as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 503
     except Exception as e:
         db.session.rollback()
         return jsonify({
             'success': False,
             'message': f'Failed to send message: {str(e)}'
-        }), 500
\ No newline at end of file
+        }), 500
+
+def get_signal_recipients(chat_type, chat_id):
+    """Users who should see the current user's typing/viewing signal in a chat, or None if not allowed"""
+    from models.group import Group, group_members
+    
+    if chat_type == 'direct':
+        if chat_id == current_user.id or not User.query.get(chat_id):
+            return None
+        return [chat_id]
+    
+    group = Group.query.get(chat_id)
+    if not group or not group.is_active:
+        return None
+    
+    if group.group_type == 'department':
+        if not Group.can_access_channel(current_user, group.department):
+            return None
+        stmt = Group.channel_member_ids(group.department, exclude_user_id=current_user.id)
+        return [row[0] for row in db.session.execute(stmt)]
+    
+    member_ids = [row[0] for row in db.session.query(group_members.c.user_id).filter(
+        group_members.c.group_id == chat_id
+    )]
+    if current_user.id not in member_ids:
+        return None
+    return [user_id for user_id in member_ids if user_id != current_user.id]
+
+@api_bp.route('/signals', methods=['POST'])
+@login_required
+def publish_signal():
+    """Publish an ephemeral typing/viewing signal; kept in memory only, never written to the database"""
+    from utils import ephemeral_signals
+    
+    data = request.get_json(silent=True) or {}
+    kind = data.get('type')
+    chat_type = data.get('chat_type')
+    chat_id = data.get('chat_id')
+    
+    if kind not in ephemeral_signals.SIGNAL_TTLS or chat_type not in ('direct', 'group') or not isinstance(chat_id, int):
+        return jsonify({
+            'success': False,
+            'message': 'type (typing/viewing), chat_type (direct/group) and chat_id are required'
+        }), 400
+    
+    recipients = get_signal_recipients(chat_type, chat_id)
+    if recipients is None:
+        return jsonify({
+            'success': False,
+            'message': 'Chat not found'
+        }), 404
+    
+    ephemeral_signals.publish(
+        kind, current_user.id, current_user.username, chat_type, chat_id, recipients,
+        active=bool(data.get('active', True))
+    )
+    
+    return jsonify({
+        'success': True,
+        'ttl': ephemeral_signals.SIGNAL_TTLS[kind]
+    })
+
+@api_bp.route('/signals/stream', methods=['GET'])
+@login_required
+def signal_stream():
+    """Server-Sent Events stream of typing/viewing signals addressed to the current user"""
+    from flask import Response
+    from utils import ephemeral_signals
+    
+    user_id = current_user.id
+    # The stream and its close callback run outside the app context
+    signals = ephemeral_signals.get_registry()
+    events, stream = signals.open_stream(user_id)
+    
+    # The stream can run for hours; don't hold a database connection for it
+    db.session.remove()
+    
+    response = Response(stream, mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    # Also unsubscribe if the client goes away before the stream starts
+    response.call_on_close(lambda: signals.unsubscribe(user_id, events))
+    return response
+
+@api_bp.route('/jobs/<job_id>', methods=['GET'])
+@login_required
+def get_job_status(job_id):
+    """Get the status of a background job started by the current user"""
+    job = get_job(job_id)
+    
+    if not job or (job['user_id'] != current_user.id and not current_user.is_admin):
+        return jsonify({
+            'success': False,
+            'message': 'Job not found'
+        }), 404
+    
+    return jsonify({
+        'success': True,
+        'job': job
+    })
+
+def load_message_attachment(attachment_id):
+    """Resolve an attachment_id sent with a message; returns (attachment, error_response)"""
+    from models.attachment import Attachment
+    
+    if not attachment_id:
+        return None, None
+    
+    attachment = Attachment.query.get(attachment_id)
+    if not attachment or attachment.uploaded_by != current_user.id:
+        return None, (jsonify({
+            'success': False,
+            'message': 'Attachment not found'
+        }), 404)
+    
+    return attachment, None
+
+@api_bp.route('/attachments', methods=['POST'])
+@login_required
+def upload_attachment():
+    """Upload a message attachment
+
+    Accepts a raw request body (filename in the X-Filename header or
+    ?filename=) or a multipart form with a 'file' field. The body is streamed
+    to disk in chunks rather than read into memory.
+    """
+    from utils.attachment_storage import store_upload, AttachmentTooLarge
+    from werkzeug.utils import secure_filename
+    
+    try:
+        if request.mimetype == 'multipart/form-data':
+            upload = request.files.get('file')
+            if not upload:
+                return jsonify({
+                    'success': False,
+                    'message': 'No file provided'
+                }), 400
+            stream, filename, content_type = upload.stream, upload.filename, upload.mimetype
+        else:
+            stream = request.stream
+            filename = request.headers.get('X-Filename') or request.args.get('filename', '')
+            content_type = request.mimetype
+        
+        filename = secure_filename(filename or '') or 'attachment'
+        attachment, deduplicated = store_upload(stream, filename, content_type, current_user.id)
+        
+        return jsonify({
+            'success': True,
+            'attachment': attachment.to_dict(),
+            'deduplicated': deduplicated
+        }), 201
+        
+    except AttachmentTooLarge as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 413
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({
+            'success': False,
+            'message': f'Upload failed: {str(e)}'
+        }), 500
+
+def get_accessible_attachment(attachment_id):
+    """Load an attachment the current user may download, or None"""
+    from models.attachment import Attachment
+    
+    attachment = Attachment.query.get(attachment_id)
+    if not attachment or not Attachment.can_access(current_user, attachment):
+        return None
+    return attachment
+
+@api_bp.route('/attachments/<int:attachment_id>', methods=['GET'])
+@login_required
+def download_attachment(attachment_id):
+    """Download an attachment; supports Range requests and conditional GET"""
+    from flask import send_file
+    from utils.attachment_storage import blob_path
+    
+    attachment = get_accessible_attachment(attachment_id)
+    if not attachment:
+        return jsonify({
+            'success': False,
+            'message': 'Attachment not found'
+        }), 404
+    
+    # Blobs are content-addressed, so the hash is a strong ETag and never changes.
+    # Only sniffed raster images are shown inline; everything else downloads.
+    response = send_file(
+        blob_path(attachment.sha256),
+        mimetype=attachment.content_type,
+        as_attachment=not attachment.is_image,
+        download_name=attachment.filename,
+        conditional=True,
+        etag=attachment.sha256,
+        last_modified=attachment.created_at,
+        max_age=31536000
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+@api_bp.route('/attachments/<int:attachment_id>/thumbnail', methods=['GET'])
+@login_required
+def download_attachment_thumbnail(attachment_id):
+    """Download an image attachment's thumbnail once the background job has made it"""
+    from flask import send_file
+    from utils.attachment_storage import thumbnail_path
+    
+    attachment = get_accessible_attachment(attachment_id)
+    if not attachment or not attachment.thumbnail_ready:
+        return jsonify({
+            'success': False,
+            'message': 'Thumbnail not available'
+        }), 404
+    
+    response = send_file(
+        thumbnail_path(attachment.sha256),
+        mimetype='image/jpeg',
+        conditional=True,
+        etag=f'{attachment.sha256}-thumb',
+        max_age=31536000
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
@@ -4,6 +4,7 @@ from models.user import User
 from models.log import Log
 from models.face_encoding import FaceEncoding
 from app import db
+from utils import presence
 from datetime import datetime
 import os
 
@@ -185,6 +186,7 @@ def login():
             user.status = 'online'
             user.is_online = True
             db.session.commit()
+            presence.set_status(user.id, 'online', user.last_activity)
             
             # Log the login
             log = Log(
@@ -231,6 +233,7 @@ def logout():
     db.session.add(log)
     db.session.commit()
     
+    presence.set_status(current_user.id, 'offline')
     logout_user()
     flash('You have been logged out successfully', 'success')
     return redirect(url_for('auth_dev.login'))
@@ -240,10 +243,12 @@ def logout():
 def update_activity():
     """Update user activity timestamp"""
     try:
-        current_user.last_activity = datetime.utcnow()
+        # Heartbeats stay in memory; only a status change is written right away
+        presence.touch(current_user.id)
         if current_user.current_status == 'offline':
             current_user.current_status = 'online'
-        db.session.commit()
+            db.session.commit()
+            presence.set_status(current_user.id, 'online')
         return jsonify({'success': True})
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
\ No newline at end of file
@@ -3,9 +3,12 @@ from flask_login import login_required, current_user
 from models.notification import Notification
 from models.log import Log
 from models.user import User
+from models.message import Message
+from models.conversation_watermark import ConversationWatermark
 from app import db
+from utils import break_scheduler, dashboard_state, presence
+from utils.compact_responses import compressible
 from datetime import datetime, date, timedelta
-import json
 
 dashboard_bp = Blueprint('dashboard', __name__)
 
@@ -68,49 +71,7 @@ def mark_notification_read(notification_id):
 def get_activity_data():
     """Get activity data for charts"""
     days = request.args.get('days', 7, type=int)
-    end_date = date.today()
-    start_date = end_date - timedelta(days=days)
-    
-    # Get daily work hours
-    logs = Log.query.filter(
-        Log.user_id == current_user.id,
-        Log.action.in_(['login', 'logout']),
-        Log.timestamp >= start_date
-    ).order_by(Log.timestamp).all()
-    
-    # Calculate daily work hours
-    daily_hours = {}
-    login_time = None
-    
-    for log in logs:
-        log_date = log.timestamp.date()
-        if log_date not in daily_hours:
-            daily_hours[log_date] = 0
-        
-        if log.action == 'login':
-            login_time = log.timestamp
-        elif log.action == 'logout' and login_time:
-            hours = (log.timestamp - login_time).total_seconds() / 3600
-            daily_hours[log_date] += hours
-            login_time = None
-    
-    # If still logged in today
-    if login_time and login_time.date() == date.today():
-        hours = (datetime.utcnow() - login_time).total_seconds() / 3600
-        daily_hours[date.today()] = daily_hours.get(date.today(), 0) + hours
-    
-    # Format data for chart
-    chart_data = []
-    for i in range(days):
-        chart_date = end_date - timedelta(days=i)
-        chart_data.append({
-            'date': chart_date.strftime('%Y-%m-%d'),
-            'hours': round(daily_hours.get(chart_date, 0), 2)
-        })
-    
-    chart_data.reverse()
-    
-    return jsonify(chart_data)
+    return jsonify(dashboard_state.get_activity_data(current_user.id, days))
 
 @dashboard_bp.route('/settings')
 @login_required
@@ -262,16 +223,11 @@ def send_admin_message():
         if not admin_users:
             return jsonify({'success': False, 'message': 'No admin users found'})
         
-        # Create notifications for each admin
+        # Send a direct message to each admin
         for admin in admin_users:
-            notification = Notification(
-                user_id=admin.id,
-                title=f"Message from {current_user.username}",
-                message=f"Subject: {subject}<br>Message: {content}",
-                type='message',
-                icon='envelope'
+            Message.add_direct_message(
+                current_user.id, admin.id, f"Subject: {subject}<br>Message: {content}"
             )
-            db.session.add(notification)
         
         # Log the message
         log = Log(
@@ -389,26 +345,7 @@ def send_user_message():
         if not target_user:
             return jsonify({'success': False, 'message': 'Target user not found'})
         
-        # Create notification for the target user
-        notification = Notification(
-            user_id=target_user_id,
-            title=f'Message from {current_user.username}',
-            message=message,
-            type='message',
-            icon='envelope'
-        )
-        db.session.add(notification)
-        
-        # Log the message
-        log = Log(
-            user_id=current_user.id,
-            action='send_user_message',
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent'),
-            details={'target_user_id': target_user_id, 'message': message}
-        )
-        db.session.add(log)
-        db.session.commit()
+        Message.send_direct_message(current_user.id, target_user.id, message)
         
         return jsonify({
             'success': True,
@@ -424,26 +361,21 @@ def send_user_message():
 def get_user_messages():
     """Get messages for the current user"""
     try:
-        # Get notifications that are messages for this user
-        messages = Notification.query.filter(
-            Notification.user_id == current_user.id,
-            Notification.type == 'message'
-        ).order_by(Notification.created_at.desc()).limit(20).all()
+        # Latest direct messages received by this user
+        stmt = Message.serialized_select().where(
+            (Message.recipient_id == current_user.id) &
+            (Message.chat_type == 'direct')
+        ).order_by(Message.id.desc()).limit(20)
         
         messages_data = []
-        for msg in messages:
-            # Try to extract sender info from the title
-            sender_username = None
-            if 'Message from ' in msg.title:
-                sender_username = msg.title.replace('Message from ', '')
-            
+        for row in db.session.execute(stmt):
             messages_data.append({
-                'id': msg.id,
-                'title': msg.title,
-                'message': msg.message,
-                'sender_username': sender_username,
-                'created_at': msg.created_at.isoformat(),
-                'is_read': msg.is_read
+                'id': row.id,
+                'title': f'Message from {row.sender_name}',
+                'message': row.content,
+                'sender_username': row.sender_name,
+                'created_at': row.timestamp.isoformat(),
+                'is_read': Message.row_is_read(row)
             })
         
         return jsonify({
@@ -467,79 +399,47 @@ def get_chats():
         chat_type = request.args.get('type', 'private')
         
         if chat_type == 'private':
-            # Get private chats (recent message exchanges)
-            chats = []
-            
-            # Get users who have sent messages to current user
-            sent_to_me = db.session.query(Notification.user_id, User.username, User.email)\
-                .join(User, User.id == Notification.user_id)\
-                .filter(Notification.type == 'message')\
-                .filter(Notification.title.like(f'Message from %'))\
-                .distinct().all()
+            # Get private chats from the latest message per conversation
+            from models.unread_counter import UnreadCounter
+            unread_counts = UnreadCounter.get_counts(current_user.id, 'direct')
             
-            # Get users current user has sent messages to
-            sent_by_me = db.session.query(Log.details, User.username, User.email)\
-                .join(User, User.id == Log.user_id)\
-                .filter(Log.action == 'send_user_message')\
-                .filter(Log.user_id == current_user.id)\
-                .distinct().all()
-            
-            # Combine and create chat list
-            user_chats = {}
-            
-            for user_id, username, email in sent_to_me:
-                if user_id != current_user.id:
-                    user_chats[user_id] = {
-                        'id': f'private_{user_id}',
-                        'name': username,
-                        'type': 'private',
-                        'lastMessage': 'Recent message...',
-                        'lastMessageTime': '',
-                        'unreadCount': 0
-                    }
+            chats = []
+            for summary in Message.get_direct_conversation_summaries(current_user.id):
+                chats.append({
+                    'id': f'private_{summary["other_user_id"]}',
+                    'name': summary['name'],
+                    'type': 'private',
+                    'lastMessage': summary['last_message'],
+                    'lastMessageTime': summary['timestamp'].isoformat(),
+                    'unreadCount': unread_counts.get(summary['other_user_id'], 0)
+                })
             
-            for log_details, username, email in sent_by_me:
-                try:
-                    details = json.loads(log_details) if isinstance(log_details, str) else log_details
-                    target_user_id = details.get('target_user_id')
-                    if target_user_id and target_user_id != current_user.id:
-                        user_chats[target_user_id] = {
-                            'id': f'private_{target_user_id}',
-                            'name': User.query.get(target_user_id).username,
-                            'type': 'private',
-                            'lastMessage': 'Recent message...',
-                            'lastMessageTime': '',
-                            'unreadCount': 0
-                        }
-                except:
-                    pass
+        else:  # group chats
+            # Department channels: one group row each, membership by department
+            from models.group import Group, COMPANY_CHANNEL
+            from models.group_read_state import GroupReadState
             
-            chats = list(user_chats.values())
+            channel_keys = Group.get_channel_keys(current_user)
+            channels = {channel.department: channel for channel in Group.query.filter(
+                Group.group_type == 'department',
+                Group.department.in_(channel_keys)
+            ).all()}
+            channel_ids = [channel.id for channel in channels.values()]
+            latest = Message.get_latest_group_messages(channel_ids)
+            unread_counts = GroupReadState.get_unread_counts_for_groups(current_user.id, channel_ids)
             
-        else:  # group chats
-            # For now, create department-based groups
-            departments = ['ENGINEERING', 'MARKETING', 'SALES', 'HR', 'FINANCE']
             chats = []
-            
-            for dept in departments:
+            for key in channel_keys:
+                channel = channels.get(key)
+                last = latest.get(channel.id) if channel else None
                 chats.append({
-                    'id': f'group_{dept.lower()}',
-                    'name': f'{dept} Team',
+                    'id': 'group_general' if key == COMPANY_CHANNEL else f'group_{key.lower()}',
+                    'name': Group.channel_name(key),
                     'type': 'group',
-                    'lastMessage': 'Group conversation...',
-                    'lastMessageTime': '',
-                    'unreadCount': 0
+                    'lastMessage': last.content if last else 'No messages yet',
+                    'lastMessageTime': last.timestamp.isoformat() if last else '',
+                    'unreadCount': unread_counts.get(channel.id, 0) if channel else 0
                 })
-            
-            # Add general chat
-            chats.insert(0, {
-                'id': 'group_general',
-                'name': 'General Chat',
-                'type': 'group',
-                'lastMessage': 'Welcome to general chat!',
-                'lastMessageTime': '',
-                'unreadCount': 0
-            })
         
         return jsonify({
             'success': True,
@@ -571,61 +471,47 @@ def get_chat_messages(chat_id):
             }
             
             # Get messages between current user and other user
-            # Messages sent to current user from other user
-            received_messages = Notification.query.filter(
-                Notification.user_id == current_user.id,
-                Notification.type == 'message',
-                Notification.title == f'Message from {other_user.username}'
-            ).all()
-            
-            for msg in received_messages:
+            for msg in Message.get_conversation_dicts(current_user.id, user_id):
                 messages.append({
-                    'id': msg.id,
-                    'sender_id': user_id,
-                    'sender_name': other_user.username,
-                    'content': msg.message,
-                    'created_at': msg.created_at.isoformat()
+                    'id': msg['id'],
+                    'sender_id': msg['sender_id'],
+                    'sender_name': msg['sender_name'],
+                    'content': msg['content'],
+                    'created_at': msg['timestamp']
                 })
             
-            # Messages sent by current user to other user (from logs)
-            sent_logs = Log.query.filter(
-                Log.user_id == current_user.id,
-                Log.action == 'send_user_message'
-            ).all()
-            
-            for log in sent_logs:
-                try:
-                    details = json.loads(log.details) if isinstance(log.details, str) else log.details
-                    if details.get('target_user_id') == user_id:
-                        messages.append({
-                            'id': f'sent_{log.id}',
-                            'sender_id': current_user.id,
-                            'sender_name': current_user.username,
-                            'content': details.get('message', ''),
-                            'created_at': log.timestamp.isoformat()
-                        })
-                except:
-                    pass
+            Message.mark_conversation_read(current_user.id, user_id)
             
         elif chat_id.startswith('group_'):
-            # Group chat
-            group_name = chat_id.replace('group_', '').replace('_', ' ').title()
+            # Department channel
+            from models.group import Group
+            from models.group_read_state import GroupReadState
             
+            department = Group.channel_key(chat_id.replace('group_', ''))
+            if not Group.can_access_channel(current_user, department):
+                return jsonify({'success': False, 'message': 'Access denied'})
+            
+            group_name = Group.channel_name(department)
             chat_info = {
                 'name': group_name,
                 'subtitle': f'Group chat - {group_name}'
             }
             
-            # For demo purposes, create some sample group messages
-            messages = [
-                {
-                    'id': 'group_1',
-                    'sender_id': 999,
-                    'sender_name': 'System',
-                    'content': f'Welcome to {group_name} chat!',
-                    'created_at': datetime.utcnow().isoformat()
-                }
-            ]
+            channel = Group.get_department_channel(department)
+            if channel:
+                page = Message.get_group_message_dicts(channel.id)
+                for msg in page:
+                    messages.append({
+                        'id': msg['id'],
+                        'sender_id': msg['sender_id'],
+                        'sender_name': msg['sender_name'],
+                        'content': msg['content'],
+                        'created_at': msg['timestamp']
+                    })
+                
+                if page:
+                    GroupReadState.mark_read(current_user.id, channel.id, page[0]['id'])
+                    db.session.commit()
         
         # Sort messages by timestamp
         messages.sort(key=lambda x: x['created_at'])
@@ -659,51 +545,33 @@ def send_chat_message():
             if not target_user:
                 return jsonify({'success': False, 'message': 'User not found'})
             
-            # Create notification for target user
-            notification = Notification(
-                user_id=user_id,
-                title=f'Message from {current_user.username}',
-                message=content,
-                type='message',
-                icon='envelope'
-            )
-            db.session.add(notification)
-            
-            # Log the message
-            log = Log(
-                user_id=current_user.id,
-                action='send_user_message',
-                ip_address=request.remote_addr,
-                user_agent=request.headers.get('User-Agent'),
-                details={'target_user_id': user_id, 'message': content}
-            )
-            db.session.add(log)
+            Message.send_direct_message(current_user.id, user_id, content)
             
         elif chat_id.startswith('group_'):
-            # Group message - broadcast to all users in group
+            # Department channel: one message row, readers resolved by department
+            from flask import current_app
+            from models.group import Group
+            
             group_type = chat_id.replace('group_', '')
+            department = Group.channel_key(group_type)
+            if not Group.can_access_channel(current_user, department):
+                return jsonify({'success': False, 'message': 'Access denied'})
             
-            if group_type == 'general':
-                # Send to all users
-                target_users = User.query.filter(User.id != current_user.id).all()
-            else:
-                # Send to users in specific department
-                department = group_type.upper()
-                target_users = User.query.filter(
-                    User.department == department,
-                    User.id != current_user.id
-                ).all()
+            channel = Group.get_or_create_department_channel(department, current_user.id)
+            Message.send_group_message(current_user.id, channel.id, content)
             
-            # Create notifications for all target users
-            for user in target_users:
-                notification = Notification(
-                    user_id=user.id,
-                    title=f'Group Message - {group_type.title()}',
-                    message=f'{current_user.username}: {content}',
+            if current_app.config.get('CHANNEL_MESSAGE_NOTIFICATIONS', True):
+                from utils.background_jobs import submit_job
+                submit_job(
+                    'channel_notifications',
+                    Notification.create_for_users,
+                    Group.channel_member_ids(department, exclude_user_id=current_user.id),
+                    f'Group Message - {group_type.title()}',
+                    f'{current_user.username}: {content}',
                     type='message',
-                    icon='users'
+                    icon='users',
+                    user_id=current_user.id
                 )
-                db.session.add(notification)
         
         db.session.commit()
         
@@ -770,6 +638,7 @@ def start_break():
         
         # Update user status to break
         current_user.status = 'break'
+        current_user.current_status = 'break'
         current_user.break_start_time = datetime.utcnow()
         current_user.break_duration = duration
         current_user.break_reason = reason
@@ -788,6 +657,12 @@ def start_break():
         )
         db.session.add(log)
         db.session.commit()
+        presence.set_status(current_user.id, 'break')
+        
+        # The scheduler ends the break when its time is up
+        break_scheduler.get_scheduler().started(
+            current_user.id, current_user.break_start_time, duration, reason
+        )
         
         return jsonify({
             'success': True,
@@ -808,35 +683,15 @@ def end_break():
             return jsonify({'success': False, 'message': 'No active break found'})
         
         # Calculate break duration
+        break_start_time = current_user.break_start_time
         break_end_time = datetime.utcnow()
-        actual_duration = (break_end_time - current_user.break_start_time).total_seconds() / 60
-        
-        # Update user status back to online
-        current_user.status = 'online'
-        current_user.last_activity = break_end_time
+        actual_duration = (break_end_time - break_start_time).total_seconds() / 60
         
-        # Log the break end
-        log = Log(
-            user_id=current_user.id,
-            action='end_break',
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent'),
-            details={
-                'start_time': current_user.break_start_time.isoformat(),
-                'end_time': break_end_time.isoformat(),
-                'planned_duration': getattr(current_user, 'break_duration', 0),
-                'actual_duration': round(actual_duration, 2),
-                'reason': getattr(current_user, 'break_reason', '')
-            }
-        )
-        db.session.add(log)
-        
-        # Clear break data
-        current_user.break_start_time = None
-        current_user.break_duration = None
-        current_user.break_reason = None
-        
-        db.session.commit()
+        # Back online, break fields cleared and end_break logged
+        if not break_scheduler.end_break(current_user.id, break_start_time, break_end_time,
+                                         ip_address=request.remote_addr,
+                                         user_agent=request.headers.get('User-Agent')):
+            return jsonify({'success': False, 'message': 'No active break found'})
         
         return jsonify({
             'success': True,
@@ -851,30 +706,80 @@ def end_break():
 @dashboard_bp.route('/api/break-status')
 @login_required
 def get_break_status():
-    """Get current break status"""
+    """Get current break status (served from the break scheduler's memory)"""
     try:
-        is_on_break = (
-            hasattr(current_user, 'break_start_time') and 
-            current_user.break_start_time is not None and
-            current_user.status == 'break'
-        )
+        active = break_scheduler.get_break(current_user.id, current_user)
         
         result = {
             'success': True,
-            'isOnBreak': is_on_break
+            'isOnBreak': active is not None
         }
         
-        if is_on_break:
+        if active:
             result.update({
-                'breakStartTime': current_user.break_start_time.isoformat(),
-                'plannedDuration': getattr(current_user, 'break_duration', 0),
-                'reason': getattr(current_user, 'break_reason', '')
+                'breakStartTime': active['start'].isoformat(),
+                'plannedDuration': active['duration'] or 0,
+                'reason': active['reason'] or '',
+                'breakEndTime': active['ends_at'].isoformat() if active['ends_at'] else None,
+                'remainingSeconds': active['remaining']
             })
         
         return jsonify(result)
         
     except Exception as e:
         return jsonify({'success': False, 'message': str(e)})
+
+@dashboard_bp.route('/api/bootstrap')
+@login_required
+@compressible
+def bootstrap():
+    """Everything the dashboard shows on load, plus the version to send to /api/tick"""
+    try:
+        user_id = current_user.id  # Read before the commit below expires current_user
+        days = request.args.get('days', 7, type=int)
+        sections = dashboard_state.get_sections(user_id, current_user)
+        
+        # The client now knows about these messages: advance delivery receipts
+        if sections['unread']['unread_direct']:
+            ConversationWatermark.mark_delivered(user_id)
+            db.session.commit()
+        
+        return jsonify({
+            'success': True,
+            'version': dashboard_state.get_version(sections),
+            'now': datetime.utcnow().isoformat(),
+            'activity': dashboard_state.get_activity_data(user_id, days),
+            **sections
+        })
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
+@dashboard_bp.route('/api/tick')
+@login_required
+def tick():
+    """The dashboard sections that changed since ?version= (all of them without one)"""
+    try:
+        sections = dashboard_state.get_sections(current_user.id, current_user)
+        changed = dashboard_state.changed_sections(sections, request.args.get('version'))
+        
+        if 'unread' in changed and sections['unread']['unread_direct']:
+            ConversationWatermark.mark_delivered(current_user.id)
+            db.session.commit()
+        
+        result = {
+            'success': True,
+            'version': dashboard_state.get_version(sections),
+            'now': datetime.utcnow().isoformat()
+        }
+        result.update((name, sections[name]) for name in changed)
+        return jsonify(result)
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'success': False, 'message': str(e)}), 500
+
 @dashboard_bp.route('/send_user_message_by_username', methods=['POST'])
 @login_required
 def send_user_message_by_username():
@@ -892,26 +797,8 @@ def send_user_message_by_username():
         if not target_user:
             return jsonify({'success': False, 'message': 'User not found'})
         
-        # Create notification for target user
-        notification = Notification(
-            user_id=target_user.id,
-            title=f'{subject} - From {current_user.username}',
-            message=message,
-            type='message',
-            icon='envelope'
-        )
-        db.session.add(notification)
-        
-        # Log the message
-        log = Log(
-            user_id=current_user.id,
-            action='send_user_message_by_username',
-            ip_address=request.remote_addr,
-            user_agent=request.headers.get('User-Agent'),
-            details={'target_username': username, 'subject': subject, 'message': message}
-        )
-        db.session.add(log)
-        db.session.commit()
+        content = message if subject == 'Message' else f'{subject}: {message}'
+        Message.send_direct_message(current_user.id, target_user.id, content)
         
         return jsonify({
             'success': True,
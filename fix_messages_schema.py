@@ -1,11 +1,17 @@
 #!/usr/bin/env python3
 """
 Fix Messages Schema - Make recipient_id nullable for group messages
+
+The search index triggers on messages call message_text(), so the plain
+sqlite3 connection registers it first. The index itself is dropped along
+with the old table; the app recreates and re-indexes it on its next start.
 """
 
 import sqlite3
 import os
 from datetime import datetime
+from utils.message_compression import register_sql_functions
+from utils.message_search import FTS_TABLE, FTS_SOURCE, FTS_TRIGGERS
 
 def fix_messages_schema():
     """Fix the messages table to allow NULL recipient_id for group messages"""
@@ -19,6 +25,7 @@ def fix_messages_schema():
     try:
         # Connect to database
         conn = sqlite3.connect(db_path)
+        register_sql_functions(conn)
         cursor = conn.cursor()
         
         print("🔧 Fixing messages table schema...")
@@ -55,6 +62,12 @@ def fix_messages_schema():
             FROM messages
         """)
         
+        # Drop the search index, which depends on the old table
+        for trigger in FTS_TRIGGERS:
+            cursor.execute(f"DROP TRIGGER IF EXISTS {trigger}")
+        cursor.execute(f"DROP VIEW IF EXISTS {FTS_SOURCE}")
+        cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        
         # Drop old table and rename new one
         cursor.execute("DROP TABLE messages")
         cursor.execute("ALTER TABLE messages_new RENAME TO messages")
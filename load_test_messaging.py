@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+"""
+Load test for the messaging API
+
+Usage:
+    python load_test_messaging.py [--users 20] [--groups 4] [--threads 8] [--duration 20]
+                                  [--mix send=15,group_send=5,poll=30,conversations=25,unread=25]
+                                  [--url http://127.0.0.1:5000] [--json results.json]
+
+Seeds users and groups, logs every virtual user in through the development
+auth blueprint (auth_controller_dev) and drives a weighted mix of sends,
+conversation polls, conversation-list and unread-count calls from
+concurrent threads, then reports throughput and latency percentiles per
+endpoint.
+
+By default the app runs in-process (create_dev_app on a throwaway SQLite
+file, driven through the Flask test client), which also reports SQL
+statements per request and the time spent waiting on SQLite locks. With
+--url the harness drives an already running development server over HTTP
+instead; users are then registered through /auth/register and only the
+client-side numbers are available. DevelopmentConfig's in-memory database
+shares one connection between threads, so give that server a file database
+(SQLALCHEMY_DATABASE_URI) before putting concurrent load on it.
+"""
+
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_MIX = 'send=15,group_send=5,poll=30,conversations=25,unread=25'
+PASSWORD = 'loadtest123'
+LOCK_RETRY_LIMIT = 30  # Seconds a statement may wait for a lock, like sqlite3's default timeout
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def parse_mix(mix):
+    """'send=15,poll=30' -> {'send': 15.0, 'poll': 30.0}"""
+    weights = {}
+    for part in mix.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in ACTIONS:
+            raise ValueError(f'Unknown action {name!r}; choose from {", ".join(ACTIONS)}')
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+class Metrics:
+    """Per-endpoint latencies, errors, SQL statement counts and lock waits"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.latencies = {}
+        self.errors = {}
+        self.statements = {}
+        self.lock_wait = {}
+        self.lock_waits = 0
+
+    @property
+    def endpoint(self):
+        return getattr(self.local, 'endpoint', '(background)')
+
+    def record(self, endpoint, elapsed_ms, ok):
+        with self.lock:
+            self.latencies.setdefault(endpoint, []).append(elapsed_ms)
+            if not ok:
+                self.errors[endpoint] = self.errors.get(endpoint, 0) + 1
+
+    def count_statement(self, *args):
+        endpoint = self.endpoint
+        with self.lock:
+            self.statements[endpoint] = self.statements.get(endpoint, 0) + 1
+
+    def add_lock_wait(self, seconds):
+        endpoint = self.endpoint
+        with self.lock:
+            self.lock_wait[endpoint] = self.lock_wait.get(endpoint, 0.0) + seconds
+            self.lock_waits += 1
+
+def timed_connection_class(metrics):
+    """sqlite3 connection class that times lock waits itself
+
+    The connection is opened with timeout=0, so a locked database raises
+    right away instead of waiting inside SQLite's busy handler; the cursor
+    then sleeps and retries like the busy handler would, adding the time to
+    metrics. Statements that hit SQLITE_BUSY haven't run, so retrying them
+    is safe.
+    """
+    def retry(call):
+        started = None
+        delay = 0.001
+        while True:
+            try:
+                result = call()
+            except sqlite3.OperationalError as e:
+                if 'locked' not in str(e) and 'busy' not in str(e):
+                    raise
+                now = time.perf_counter()
+                started = started or now
+                if now - started > LOCK_RETRY_LIMIT:
+                    raise
+                time.sleep(delay)
+                delay = min(delay * 2, 0.02)
+                continue
+            if started:
+                metrics.add_lock_wait(time.perf_counter() - started)
+            return result
+
+    class TimedCursor(sqlite3.Cursor):
+        def execute(self, *args):
+            return retry(lambda: sqlite3.Cursor.execute(self, *args))
+
+        def executemany(self, *args):
+            return retry(lambda: sqlite3.Cursor.executemany(self, *args))
+
+    class TimedConnection(sqlite3.Connection):
+        def cursor(self, factory=TimedCursor):
+            return sqlite3.Connection.cursor(self, factory)
+
+        def execute(self, *args):
+            return self.cursor().execute(*args)
+
+        def commit(self):
+            return retry(lambda: sqlite3.Connection.commit(self))
+
+    return TimedConnection
+
+class TestClientTransport:
+    """One logged-in virtual user on the Flask test client"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json_body=None, form=None):
+        response = self.client.open(path, method=method, json=json_body, data=form)
+        return response.status_code, response.headers.get('Location'), response.get_json(silent=True)
+
+class HttpTransport:
+    """One logged-in virtual user talking to a running server"""
+
+    class _NoRedirect(urllib.request.HTTPRedirectHandler):
+        def redirect_request(self, *args, **kwargs):
+            return None
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), self._NoRedirect
+        )
+
+    def request(self, method, path, json_body=None, form=None):
+        data, headers = None, {}
+        if json_body is not None:
+            data, headers = json.dumps(json_body).encode('utf-8'), {'Content-Type': 'application/json'}
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode('utf-8')
+            headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+
+        request = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            response = self.opener.open(request, timeout=60)
+        except urllib.error.HTTPError as e:
+            response = e
+        body = response.read()
+        try:
+            payload = json.loads(body) if body else None
+        except ValueError:
+            payload = None
+        return response.status, response.headers.get('Location'), payload
+
+def login(transport, username):
+    """Log in through the development auth blueprint; it redirects to the dashboard on success"""
+    status, location, _ = transport.request('POST', '/auth/login', form={'username': username, 'password': PASSWORD})
+    if status != 302 or 'login' in (location or ''):
+        raise RuntimeError(f'Login failed for {username}')
+
+# Each action returns (endpoint label, method, path, json body)
+def _send(user, rng):
+    return ('POST /api/messages/send', 'POST', '/api/messages/send',
+            {'recipient_id': rng.choice(user['partners']), 'content': f'Load test {rng.random():.6f}'})
+
+def _group_send(user, rng):
+    if not user['groups']:
+        return _send(user, rng)
+    return ('POST /api/groups/send', 'POST', '/api/groups/send',
+            {'group_id': rng.choice(user['groups']), 'content': f'Load test {rng.random():.6f}'})
+
+def _poll(user, rng):
+    return ('GET /api/messages/<id>', 'GET', f'/api/messages/{rng.choice(user["partners"])}?limit=50', None)
+
+def _conversations(user, rng):
+    return ('GET /api/conversations', 'GET', '/api/conversations?type=all', None)
+
+def _unread(user, rng):
+    return ('GET /api/notifications/unread', 'GET', '/api/notifications/unread', None)
+
+ACTIONS = {
+    'send': _send,
+    'group_send': _group_send,
+    'poll': _poll,
+    'conversations': _conversations,
+    'unread': _unread
+}
+
+def seed_in_process(app, prefix, user_count, group_count, rng):
+    """Insert users and groups directly; returns [{'id', 'username'}], [[member ids]]"""
+    from werkzeug.security import generate_password_hash
+    from app import db
+    from models.user import User
+    from models.group import Group
+
+    # A cheap hash keeps seeding and logins fast; the login path itself is unchanged
+    password_hash = generate_password_hash(PASSWORD, method='pbkdf2:sha256:1000')
+    with app.app_context():
+        users = [User(username=f'{prefix}{i}', email=f'{prefix}{i}@example.com', password_hash=password_hash)
+                 for i in range(user_count)]
+        db.session.add_all(users)
+        db.session.flush()
+
+        memberships = []
+        for g in range(group_count):
+            members = rng.sample(users, min(len(users), max(3, len(users) // 3)))
+            group = Group(name=f'{prefix}group{g}', created_by=members[0].id)
+            db.session.add(group)
+            db.session.flush()
+            for member in members:
+                group.add_member(member)
+            memberships.append((group.id, [member.id for member in members]))
+        db.session.commit()
+
+        return [{'id': user.id, 'username': user.username} for user in users], memberships
+
+def seed_over_http(base_url, prefix, user_count, group_count, rng):
+    """Register users through the dev blueprint and create groups through the API"""
+    for i in range(user_count):
+        transport = HttpTransport(base_url)
+        status, location, _ = transport.request('POST', '/auth/register', form={
+            'username': f'{prefix}{i}', 'email': f'{prefix}{i}@example.com', 'password': PASSWORD
+        })
+        if status != 302 or 'register' in (location or ''):
+            raise RuntimeError(f'Registration failed for {prefix}{i}')
+
+    transport = HttpTransport(base_url)
+    login(transport, f'{prefix}0')
+    _, _, data = transport.request('GET', '/api/users/all')
+    ids = {user['username']: user['id'] for user in data['users']}
+    users = [{'id': ids.get(f'{prefix}{i}'), 'username': f'{prefix}{i}'} for i in range(user_count)]
+
+    # /api/users/all leaves out the caller; find user 0 from a group it creates
+    memberships = []
+    for g in range(group_count):
+        others = rng.sample(users[1:], min(len(users) - 1, max(2, len(users) // 3)))
+        _, _, data = transport.request('POST', '/api/groups/create', json_body={
+            'name': f'{prefix}group{g}', 'member_ids': [user['id'] for user in others]
+        })
+        group = data['group']
+        memberships.append((group['id'], [member['id'] for member in group['members']]))
+        if users[0]['id'] is None:
+            users[0]['id'] = group['created_by']
+    return users, memberships
+
+def run(args):
+    """Seed, log in and drive the mix; returns the results dictionary"""
+    weights = parse_mix(args.mix)
+    actions, action_weights = list(weights), list(weights.values())
+    rng = random.Random(args.seed)
+    prefix = f'load{int(time.time())}_'
+    metrics = Metrics()
+    temp_dir = None
+
+    if args.url:
+        users, memberships = seed_over_http(args.url, prefix, args.users, args.groups, rng)
+        make_transport = lambda: HttpTransport(args.url)
+    else:
+        from sqlalchemy import event
+        from app import db
+        from app_dev import create_dev_app
+        from config_dev import DevelopmentConfig
+
+        temp_dir = tempfile.mkdtemp(prefix='load_test_')
+
+        class LoadTestConfig(DevelopmentConfig):
+            DEBUG = False
+            PROPAGATE_EXCEPTIONS = False
+            SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(temp_dir, 'load.db')}"
+            SQLALCHEMY_ENGINE_OPTIONS = {
+                'pool_size': args.threads + 2,
+                'connect_args': {'timeout': 0, 'factory': timed_connection_class(metrics)}
+            }
+            MESSAGE_GROUP_COMMIT = args.group_commit
+
+        app = create_dev_app(LoadTestConfig)
+        users, memberships = seed_in_process(app, prefix, args.users, args.groups, rng)
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', metrics.count_statement)
+        make_transport = lambda: TestClientTransport(app)
+
+    groups_by_user = {}
+    for group_id, member_ids in memberships:
+        for member_id in member_ids:
+            groups_by_user.setdefault(member_id, []).append(group_id)
+
+    # Virtual users, round-robin over the seeded accounts
+    sessions = []
+    for i in range(args.threads):
+        user = users[i % len(users)]
+        transport = make_transport()
+        login(transport, user['username'])
+        sessions.append((transport, {
+            'partners': [other['id'] for other in users if other['id'] != user['id']],
+            'groups': groups_by_user.get(user['id'], [])
+        }))
+
+    # Setup queries aren't part of the measurement
+    metrics.statements.clear()
+    metrics.lock_wait.clear()
+    metrics.lock_waits = 0
+
+    deadline = time.perf_counter() + args.duration
+
+    def worker(index, transport, user):
+        worker_rng = random.Random(args.seed * 1000 + index)
+        metrics.local.endpoint = '(idle)'
+        while time.perf_counter() < deadline:
+            action = worker_rng.choices(actions, action_weights)[0]
+            endpoint, method, path, body = ACTIONS[action](user, worker_rng)
+            metrics.local.endpoint = endpoint
+            started = time.perf_counter()
+            try:
+                status, _, payload = transport.request(method, path, json_body=body)
+                ok = status < 400 and (payload or {}).get('success', True)
+            except Exception:
+                ok = False
+            metrics.record(endpoint, (time.perf_counter() - started) * 1000, ok)
+            metrics.local.endpoint = '(idle)'
+
+    threads = [threading.Thread(target=worker, args=(i, transport, user))
+               for i, (transport, user) in enumerate(sessions)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    try:
+        return summarize(metrics, elapsed, in_process=not args.url)
+    finally:
+        if temp_dir:
+            with app.app_context():
+                db.engine.dispose()
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+def summarize(metrics, elapsed, in_process):
+    """Results dictionary: totals plus one row per endpoint"""
+    endpoints = {}
+    for endpoint, latencies in sorted(metrics.latencies.items()):
+        row = {
+            'requests': len(latencies),
+            'errors': metrics.errors.get(endpoint, 0),
+            'per_second': round(len(latencies) / elapsed, 1),
+            'p50_ms': round(percentile(latencies, 50), 2),
+            'p95_ms': round(percentile(latencies, 95), 2),
+            'p99_ms': round(percentile(latencies, 99), 2),
+            'max_ms': round(max(latencies), 2)
+        }
+        if in_process:
+            row['sql_per_request'] = round(metrics.statements.get(endpoint, 0) / len(latencies), 2)
+            row['lock_wait_ms'] = round(metrics.lock_wait.get(endpoint, 0.0) * 1000, 1)
+        endpoints[endpoint] = row
+
+    total = sum(row['requests'] for row in endpoints.values())
+    results = {
+        'elapsed_s': round(elapsed, 2),
+        'requests': total,
+        'errors': sum(row['errors'] for row in endpoints.values()),
+        'per_second': round(total / elapsed, 1) if elapsed else 0,
+        'endpoints': endpoints
+    }
+    if in_process:
+        results['lock_wait_ms'] = round(sum(metrics.lock_wait.values()) * 1000, 1)
+        results['lock_waits'] = metrics.lock_waits
+        results['background_statements'] = metrics.statements.get('(background)', 0)
+    return results
+
+def print_results(results):
+    print(f"\n📊 {results['requests']:,} requests in {results['elapsed_s']} s "
+          f"= {results['per_second']:,.1f} req/s ({results['errors']} errors)")
+
+    in_process = 'lock_wait_ms' in results
+    header = f"{'endpoint':32} {'reqs':>7} {'err':>5} {'req/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}"
+    if in_process:
+        header += f" {'sql/req':>8} {'lock ms':>9}"
+    print(header)
+    print('-' * len(header))
+    for endpoint, row in results['endpoints'].items():
+        line = (f"{endpoint:32} {row['requests']:>7} {row['errors']:>5} {row['per_second']:>8.1f} "
+                f"{row['p50_ms']:>8.1f} {row['p95_ms']:>8.1f} {row['p99_ms']:>8.1f} {row['max_ms']:>8.1f}")
+        if in_process:
+            line += f" {row['sql_per_request']:>8.2f} {row['lock_wait_ms']:>9.1f}"
+        print(line)
+
+    if in_process:
+        print(f"\n🔒 SQLite lock waits: {results['lock_waits']} totalling {results['lock_wait_ms']:,.1f} ms")
+    else:
+        print("\nℹ️  SQL counts and lock waits are only measured in-process (without --url)")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Load test the messaging API')
+    parser.add_argument('--users', type=int, default=20, help='users to seed')
+    parser.add_argument('--groups', type=int, default=4, help='groups to seed')
+    parser.add_argument('--threads', type=int, default=8, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=20, help='seconds to drive load')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'action weights (default {DEFAULT_MIX})')
+    parser.add_argument('--seed', type=int, default=1, help='random seed')
+    parser.add_argument('--group-commit', action='store_true', help='enable MESSAGE_GROUP_COMMIT in-process')
+    parser.add_argument('--url', help='drive a running development server instead of the test client')
+    parser.add_argument('--json', help='also write the results to this file')
+    args = parser.parse_args()
+
+    if args.users < 2:
+        parser.error('--users must be at least 2')
+
+    print("🚀 Messaging Load Test")
+    print("=" * 50)
+    print(f"{args.users} users, {args.groups} groups, {args.threads} threads, {args.duration:g} s, "
+          f"{'server ' + args.url if args.url else 'in-process test client'}")
+
+    results = run(args)
+    print_results(results)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"\n💾 Results written to {args.json}")
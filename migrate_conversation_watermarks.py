@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Migration script to add delivered/read watermarks for direct conversations
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+
+def migrate_conversation_watermarks():
+    """Create conversation_watermarks and seed it from the legacy is_read flags"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            db.create_all()
+            print("✅ conversation_watermarks table created")
+            
+            # Everything up to the newest message already flagged read counts
+            # as read (and delivered) under the watermark model
+            result = db.session.execute(db.text('''
+                INSERT OR IGNORE INTO conversation_watermarks
+                    (user_id, other_user_id, delivered_message_id, delivered_at, read_message_id, read_at)
+                SELECT recipient_id, sender_id, MAX(id), MAX(timestamp), MAX(id), MAX(timestamp)
+                FROM messages
+                WHERE chat_type = 'direct' AND recipient_id IS NOT NULL AND is_read = 1
+                GROUP BY recipient_id, sender_id
+            '''))
+            db.session.commit()
+            print(f"✅ Seeded {result.rowcount} watermarks from existing messages")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error migrating conversation watermarks: {e}")
+            return False
+    
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Adding Conversation Watermarks")
+    print("=" * 50)
+    
+    success = migrate_conversation_watermarks()
+    
+    if success:
+        print("\n✅ Conversation watermark migration completed successfully!")
+    else:
+        print("\n❌ Conversation watermark migration failed!")
+        print("Please check the error messages above.")
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Migration script to add department channels to the groups table
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+
+def migrate_department_channels():
+    """Add groups.department and its unique index"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            with db.engine.connect() as conn:
+                columns = [row[1] for row in conn.execute(db.text('PRAGMA table_info(groups)'))]
+                
+                if 'department' not in columns:
+                    conn.execute(db.text('ALTER TABLE groups ADD COLUMN department VARCHAR(50)'))
+                    print("✅ Added department column to groups")
+                else:
+                    print("✅ groups.department already exists")
+                
+                conn.execute(db.text(
+                    'CREATE UNIQUE INDEX IF NOT EXISTS ix_groups_department ON groups (department)'
+                ))
+                conn.commit()
+            print("✅ Index ix_groups_department created on groups")
+            
+        except Exception as e:
+            print(f"❌ Error migrating department channels: {e}")
+            return False
+    
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Adding Department Channels")
+    print("=" * 50)
+    
+    success = migrate_department_channels()
+    
+    if success:
+        print("\n✅ Department channel migration completed successfully!")
+        print("   Channels are created on the first message sent to them")
+    else:
+        print("\n❌ Department channel migration failed!")
+        print("Please check the error messages above.")
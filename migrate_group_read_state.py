@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Migration script to add per-member group read cursors
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+
+def migrate_group_read_state(app=None):
+    """Create group_read_state, index messages by (group_id, id) and seed cursors"""
+    app = app or create_app()
+    
+    with app.app_context():
+        try:
+            db.create_all()
+            print("✅ group_read_state table created")
+            
+            with db.engine.connect() as conn:
+                conn.execute(db.text(
+                    'CREATE INDEX IF NOT EXISTS ix_messages_group_id_id ON messages (group_id, id)'
+                ))
+                conn.commit()
+            print("✅ Index ix_messages_group_id_id created on messages")
+            
+            # Group messages never had a read flag, so start every member's
+            # cursor at the group's newest message; otherwise members would
+            # see the whole group history as unread after the upgrade
+            result = db.session.execute(db.text('''
+                INSERT OR IGNORE INTO group_read_state (group_id, user_id, last_read_message_id, updated_at)
+                SELECT gm.group_id, gm.user_id, MAX(m.id), CURRENT_TIMESTAMP
+                FROM group_members gm
+                JOIN messages m ON m.group_id = gm.group_id
+                GROUP BY gm.group_id, gm.user_id
+            '''))
+            db.session.commit()
+            print(f"✅ Seeded {result.rowcount} read cursors from existing messages")
+            
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error migrating group read state: {e}")
+            return False
+    
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Adding Group Read Cursors")
+    print("=" * 50)
+    
+    success = migrate_group_read_state()
+    
+    if success:
+        print("\n✅ Group read state migration completed successfully!")
+    else:
+        print("\n❌ Group read state migration failed!")
+        print("Please check the error messages above.")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Migration script to move legacy Notification/Log based chat into the messages table
+
+Older versions stored a private chat message as a 'Message from <user>'
+notification for the recipient plus a send_user_message log row for the
+sender. This script turns each of those into one Message row, carrying over
+the original timestamp and read flag, and removes the chat notifications.
+Log rows are kept as the audit trail.
+"""
+
+import sys
+import os
+import json
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from models.user import User
+from models.log import Log
+from models.notification import Notification
+from models.message import Message
+
+def load_details(log):
+    """Log.details may be stored as a dict or a JSON string"""
+    if isinstance(log.details, str):
+        try:
+            return json.loads(log.details)
+        except ValueError:
+            return {}
+    return log.details or {}
+
+def take_notification(pending, user_id, title, message):
+    """Pop the oldest unmigrated notification matching a legacy send"""
+    matches = pending.get((user_id, title, message))
+    if matches:
+        return matches.pop(0)
+    return None
+
+def add_message(sender_id, recipient_id, content, timestamp, is_read):
+    """Insert a migrated message unless an identical one already exists"""
+    exists = db.session.query(Message.id).filter_by(
+        sender_id=sender_id,
+        recipient_id=recipient_id,
+        content=content,
+        timestamp=timestamp,
+        chat_type='direct'
+    ).first()
+    if exists:
+        return False
+
+    db.session.add(Message(
+        sender_id=sender_id,
+        recipient_id=recipient_id,
+        content=content,
+        timestamp=timestamp,
+        is_read=bool(is_read),
+        chat_type='direct',
+        message_type='text'
+    ))
+    return True
+
+def migrate_legacy_chat():
+    """Move legacy chat notifications and logs into messages"""
+    app = create_app()
+
+    with app.app_context():
+        try:
+            users_by_id = {user.id: user for user in User.query.all()}
+            users_by_name = {user.username: user for user in users_by_id.values()}
+            admins = sorted((user for user in users_by_id.values() if user.is_admin), key=lambda u: u.id)
+
+            # Index chat notifications by (recipient, title, text), oldest first
+            pending = {}
+            chat_notifications = Notification.query.filter(
+                Notification.type == 'message',
+                ~Notification.title.like('Group Message - %')
+            ).order_by(Notification.created_at.asc()).all()
+            for notification in chat_notifications:
+                key = (notification.user_id, notification.title, notification.message)
+                pending.setdefault(key, []).append(notification)
+
+            migrated = 0
+            consumed = []
+
+            # 1. Sends recorded in the sender's logs
+            logs = Log.query.filter(
+                Log.action.in_(['send_user_message', 'send_user_message_by_username', 'send_admin_message'])
+            ).order_by(Log.timestamp.asc()).all()
+
+            for log in logs:
+                sender = users_by_id.get(log.user_id)
+                details = load_details(log)
+                if not sender:
+                    continue
+
+                deliveries = []  # (recipient, notification title, notification text, message content)
+                if log.action == 'send_user_message':
+                    recipient = users_by_id.get(details.get('target_user_id'))
+                    text = details.get('message', '')
+                    if recipient:
+                        deliveries.append((recipient, f'Message from {sender.username}', text, text))
+                elif log.action == 'send_user_message_by_username':
+                    recipient = users_by_name.get(details.get('target_username'))
+                    subject = details.get('subject', 'Message')
+                    text = details.get('message', '')
+                    content = text if subject == 'Message' else f'{subject}: {text}'
+                    if recipient:
+                        deliveries.append((recipient, f'{subject} - From {sender.username}', text, content))
+                else:
+                    text = f"Subject: {details.get('subject')}<br>Message: {details.get('content')}"
+                    for admin in admins:
+                        deliveries.append((admin, f'Message from {sender.username}', text, text))
+
+                for recipient, title, text, content in deliveries:
+                    notification = take_notification(pending, recipient.id, title, text)
+                    is_read = notification.is_read if notification else True
+                    if notification:
+                        consumed.append(notification)
+                    if add_message(sender.id, recipient.id, content, log.timestamp, is_read):
+                        migrated += 1
+
+            # 2. Notifications without a sender log (sent by admins)
+            for (user_id, title, text), notifications in pending.items():
+                if not title.startswith('Message from '):
+                    continue
+
+                sender_name = title[len('Message from '):]
+                if sender_name == 'Admin':
+                    sender = admins[0] if admins else None
+                else:
+                    sender = users_by_name.get(sender_name)
+                if not sender or user_id not in users_by_id:
+                    continue
+
+                for notification in notifications:
+                    consumed.append(notification)
+                    if add_message(sender.id, user_id, text, notification.created_at, notification.is_read):
+                        migrated += 1
+
+            # The messages table is now the only copy of the chat history
+            consumed_ids = [notification.id for notification in consumed]
+            for start in range(0, len(consumed_ids), 500):
+                Notification.query.filter(
+                    Notification.id.in_(consumed_ids[start:start + 500])
+                ).delete(synchronize_session=False)
+
+            db.session.commit()
+            print(f"✅ Migrated {migrated} legacy chat messages")
+            print(f"✅ Removed {len(consumed_ids)} chat notifications")
+
+            # Unread counters must reflect the migrated messages
+            from models.unread_counter import UnreadCounter
+            UnreadCounter.rebuild()
+            print("✅ Unread counters rebuilt")
+
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error migrating legacy chat: {e}")
+            return False
+
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Moving Legacy Chat into Messages")
+    print("=" * 50)
+
+    success = migrate_legacy_chat()
+
+    if success:
+        print("\n✅ Legacy chat migration completed successfully!")
+        print("   Remember to run migrate_message_indexes.py on existing databases")
+    else:
+        print("\n❌ Legacy chat migration failed!")
+        print("Please check the error messages above.")
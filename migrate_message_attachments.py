@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Migration script to add message attachments
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+
+def migrate_message_attachments():
+    """Create the attachments table and add messages.attachment_id"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            db.create_all()
+            print("✅ attachments table created")
+            
+            with db.engine.connect() as conn:
+                columns = [row[1] for row in conn.execute(db.text('PRAGMA table_info(messages)'))]
+                
+                if 'attachment_id' not in columns:
+                    conn.execute(db.text(
+                        'ALTER TABLE messages ADD COLUMN attachment_id INTEGER REFERENCES attachments (id)'
+                    ))
+                    conn.commit()
+                    print("✅ Added attachment_id column to messages")
+                else:
+                    print("✅ messages.attachment_id already exists")
+            
+        except Exception as e:
+            print(f"❌ Error migrating message attachments: {e}")
+            return False
+    
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Adding Message Attachments")
+    print("=" * 50)
+    
+    success = migrate_message_attachments()
+    
+    if success:
+        print("\n✅ Message attachment migration completed successfully!")
+    else:
+        print("\n❌ Message attachment migration failed!")
+        print("Please check the error messages above.")
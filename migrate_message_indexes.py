@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Migration script to create the messages table indexes on existing databases
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from models.message import Message
+
+def migrate_message_indexes():
+    """Create any index declared on Message that the database is missing"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            for index in Message.__table__.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+                print(f"✅ Index '{index.name}' verified on messages")
+        except Exception as e:
+            print(f"❌ Error creating message indexes: {e}")
+            return False
+    
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Indexing Messages Table")
+    print("=" * 50)
+    
+    success = migrate_message_indexes()
+    
+    if success:
+        print("\n✅ Message index migration completed successfully!")
+    else:
+        print("\n❌ Message index migration failed!")
+        print("Please check the error messages above.")
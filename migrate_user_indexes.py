@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Migration script to create the users table indexes on existing databases
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from models.user import User
+
+def migrate_user_indexes():
+    """Create any index declared on User that the database is missing"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            for index in User.__table__.indexes:
+                index.create(bind=db.engine, checkfirst=True)
+                print(f"✅ Index '{index.name}' verified on users")
+        except Exception as e:
+            print(f"❌ Error creating user indexes: {e}")
+            return False
+    
+    return True
+
+if __name__ == "__main__":
+    print("🚀 Indexing Users Table")
+    print("=" * 50)
+    
+    success = migrate_user_indexes()
+    
+    if success:
+        print("\n✅ User index migration completed successfully!")
+    else:
+        print("\n❌ User index migration failed!")
+        print("Please check the error messages above.")
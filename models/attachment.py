@@ -0,0 +1,72 @@
+from app import db
+from datetime import datetime
+
+# Raster formats the server recognises by content; only these are shown inline
+IMAGE_TYPES = ('image/png', 'image/jpeg', 'image/gif', 'image/webp')
+
+class Attachment(db.Model):
+    """An uploaded file; the bytes live on disk in a content-addressed blob shared by equal uploads"""
+    __tablename__ = 'attachments'
+
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)  # Blob key on disk
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(100), nullable=False, default='application/octet-stream')
+    size = db.Column(db.Integer, nullable=False)
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    thumbnail_ready = db.Column(db.Boolean, default=False, nullable=False)
+
+    # Relationships
+    uploader = db.relationship('User', backref='attachments')
+
+    def __repr__(self):
+        return f'<Attachment {self.id}: {self.filename} ({self.sha256[:12]})>'
+
+    @property
+    def is_image(self):
+        """Images get a thumbnail, are sent as message_type 'image' and are served inline"""
+        return self.content_type in IMAGE_TYPES
+
+    def to_dict(self):
+        """Convert attachment to dictionary"""
+        return Attachment.serialize(
+            self.id, self.filename, self.content_type, self.size, self.thumbnail_ready
+        )
+
+    @staticmethod
+    def serialize(attachment_id, filename, content_type, size, thumbnail_ready):
+        """Attachment dictionary from plain column values (shared with Message.row_to_dict)"""
+        return {
+            'id': attachment_id,
+            'filename': filename,
+            'content_type': content_type,
+            'size': size,
+            'url': f'/api/attachments/{attachment_id}',
+            'thumbnail_url': f'/api/attachments/{attachment_id}/thumbnail' if thumbnail_ready else None
+        }
+
+    @staticmethod
+    def can_access(user, attachment):
+        """Uploaders and anyone who can read a message carrying the attachment may download it"""
+        from models.message import Message
+        from models.group import Group, group_members, COMPANY_CHANNEL
+
+        if user.is_admin or attachment.uploaded_by == user.id:
+            return True
+
+        member_groups = db.select(group_members.c.group_id).where(group_members.c.user_id == user.id)
+        channels = db.select(Group.id).where(
+            Group.group_type == 'department',
+            Group.department.in_([COMPANY_CHANNEL, user.department])
+        )
+
+        return db.session.query(
+            Message.query.filter(
+                Message.attachment_id == attachment.id,
+                (Message.sender_id == user.id) |
+                (Message.recipient_id == user.id) |
+                Message.group_id.in_(member_groups) |
+                Message.group_id.in_(channels)
+            ).exists()
+        ).scalar()
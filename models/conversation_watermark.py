@@ -0,0 +1,136 @@
+from app import db
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+class ConversationWatermark(db.Model):
+    """How far a user has received and read a direct conversation
+
+    One row per (reader, other participant). A direct message from
+    other_user_id to user_id is delivered/read once its id is at or below
+    the matching watermark, so marking a conversation read is one upsert no
+    matter how many messages it covers.
+    """
+    __tablename__ = 'conversation_watermarks'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    other_user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    delivered_message_id = db.Column(db.Integer, default=0, nullable=False)
+    delivered_at = db.Column(db.DateTime)
+    read_message_id = db.Column(db.Integer, default=0, nullable=False)
+    read_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return (f'<ConversationWatermark User {self.user_id} <- {self.other_user_id}: '
+                f'delivered {self.delivered_message_id}, read {self.read_message_id}>')
+
+    def to_dict(self):
+        """Convert watermark to dictionary"""
+        return ConversationWatermark.serialize(self)
+
+    @staticmethod
+    def serialize(watermark):
+        """Receipt dictionary for a watermark, or the empty receipt for None"""
+        if watermark is None:
+            return {
+                'delivered_message_id': 0,
+                'delivered_at': None,
+                'read_message_id': 0,
+                'read_at': None
+            }
+        return {
+            'delivered_message_id': watermark.delivered_message_id,
+            'delivered_at': watermark.delivered_at.isoformat() if watermark.delivered_at else None,
+            'read_message_id': watermark.read_message_id,
+            'read_at': watermark.read_at.isoformat() if watermark.read_at else None
+        }
+
+    @staticmethod
+    def mark_read(user_id, other_user_id, message_id):
+        """Move the read (and delivered) watermark forward to message_id with one upsert"""
+        table = ConversationWatermark.__table__
+        now = datetime.utcnow()
+        stmt = sqlite_insert(table).values(
+            user_id=user_id,
+            other_user_id=other_user_id,
+            delivered_message_id=message_id,
+            delivered_at=now,
+            read_message_id=message_id,
+            read_at=now
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'other_user_id'],
+            set_={
+                'read_message_id': stmt.excluded.read_message_id,
+                'read_at': stmt.excluded.read_at,
+                'delivered_message_id': db.func.max(
+                    table.c.delivered_message_id, stmt.excluded.delivered_message_id
+                ),
+                'delivered_at': db.case(
+                    (table.c.delivered_message_id < stmt.excluded.delivered_message_id, stmt.excluded.delivered_at),
+                    else_=table.c.delivered_at
+                )
+            },
+            where=table.c.read_message_id < stmt.excluded.read_message_id
+        )
+        db.session.execute(stmt)
+
+    @staticmethod
+    def mark_delivered(user_id):
+        """Advance the delivered watermark of every conversation with unread messages for user_id
+
+        Called when the user's client fetches their inbox state. One
+        INSERT ... SELECT, which only touches rows that actually move forward.
+        """
+        from models.message import Message
+        from models.unread_counter import UnreadCounter
+
+        table = ConversationWatermark.__table__
+        unread_senders = db.select(UnreadCounter.conversation_id).where(
+            (UnreadCounter.user_id == user_id) &
+            (UnreadCounter.chat_type == 'direct') &
+            (UnreadCounter.count > 0)
+        )
+        latest = db.select(
+            db.literal(user_id),
+            Message.sender_id,
+            db.func.max(Message.id),
+            db.literal(datetime.utcnow())
+        ).where(
+            (Message.recipient_id == user_id) &
+            (Message.chat_type == 'direct') &
+            Message.sender_id.in_(unread_senders)
+        ).group_by(Message.sender_id)
+
+        stmt = sqlite_insert(table).from_select(
+            ['user_id', 'other_user_id', 'delivered_message_id', 'delivered_at'], latest
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'other_user_id'],
+            set_={
+                'delivered_message_id': stmt.excluded.delivered_message_id,
+                'delivered_at': stmt.excluded.delivered_at
+            },
+            where=table.c.delivered_message_id < stmt.excluded.delivered_message_id
+        )
+        return db.session.execute(stmt).rowcount
+
+    @staticmethod
+    def get_receipt(reader_id, other_user_id):
+        """How far reader_id has received/read the messages other_user_id sent them"""
+        watermark = ConversationWatermark.query.get((reader_id, other_user_id))
+        return ConversationWatermark.serialize(watermark)
+
+    @staticmethod
+    def delete_conversation(user_id, other_user_id):
+        """Drop both sides' watermarks for a deleted conversation"""
+        ConversationWatermark.query.filter(
+            ((ConversationWatermark.user_id == user_id) & (ConversationWatermark.other_user_id == other_user_id)) |
+            ((ConversationWatermark.user_id == other_user_id) & (ConversationWatermark.other_user_id == user_id))
+        ).delete(synchronize_session=False)
+
+    @staticmethod
+    def delete_user(user_id):
+        """Drop every watermark involving a deleted user"""
+        ConversationWatermark.query.filter(
+            (ConversationWatermark.user_id == user_id) | (ConversationWatermark.other_user_id == user_id)
+        ).delete(synchronize_session=False)
@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+from sqlalchemy.orm import joinedload, selectinload
 
 # Association table for group members
 group_members = db.Table('group_members',
@@ -7,6 +8,12 @@ group_members = db.Table('group_members',
     db.Column('user_id', db.Integer, db.ForeignKey('users.id'), primary_key=True)
 )
 
+# Department channel key for the company-wide chat
+COMPANY_CHANNEL = 'ALL'
+
+# Department channels offered in the chat list
+DEPARTMENT_CHANNELS = ['ENGINEERING', 'MARKETING', 'SALES', 'HR', 'FINANCE']
+
 class Group(db.Model):
     """Group model for group messaging"""
     __tablename__ = 'groups'
@@ -18,11 +25,17 @@ class Group(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     is_active = db.Column(db.Boolean, default=True, nullable=False)
     group_type = db.Column(db.String(20), default='general', nullable=False)  # general, department, project
+    department = db.Column(db.String(50), nullable=True)  # Department channels only; COMPANY_CHANNEL for everyone
     
     # Relationships
     creator = db.relationship('User', foreign_keys=[created_by], backref='created_groups')
     members = db.relationship('User', secondary=group_members, backref='groups')
     
+    __table_args__ = (
+        # One channel per department; regular groups leave department NULL
+        db.Index('ix_groups_department', 'department', unique=True),
+    )
+    
     def __repr__(self):
         return f'<Group {self.name}>'
     
@@ -43,15 +56,21 @@ class Group(db.Model):
     
     def add_member(self, user):
         """Add a user to the group"""
+        from utils import conversation_cache
+        
         if user not in self.members:
             self.members.append(user)
+            conversation_cache.invalidate_user(user.id)
             return True
         return False
     
     def remove_member(self, user):
         """Remove a user from the group"""
+        from utils import conversation_cache
+        
         if user in self.members:
             self.members.remove(user)
+            conversation_cache.invalidate_user(user.id)
             return True
         return False
     
@@ -59,6 +78,19 @@ class Group(db.Model):
         """Check if user is a member of the group"""
         return user in self.members
     
+    @staticmethod
+    def with_relations(query):
+        """Eager-load the creator and members so to_dict issues no extra queries per group"""
+        return query.options(
+            joinedload(Group.creator),
+            selectinload(Group.members)
+        )
+    
+    @staticmethod
+    def get_with_members(group_id):
+        """Load a group ready for to_dict"""
+        return Group.with_relations(Group.query).filter_by(id=group_id).first()
+    
     @staticmethod
     def get_user_groups(user_id):
         """Get all groups a user belongs to"""
@@ -66,4 +98,72 @@ class Group(db.Model):
         user = User.query.get(user_id)
         if user:
             return user.groups
-        return []
\ No newline at end of file
+        return []
+    
+    @staticmethod
+    def channel_key(chat_key):
+        """Map a dashboard chat key ('general', 'engineering') to a department channel key"""
+        return COMPANY_CHANNEL if chat_key == 'general' else chat_key.upper()
+    
+    @staticmethod
+    def channel_name(department):
+        """Display name of a department channel"""
+        return 'General Chat' if department == COMPANY_CHANNEL else f'{department} Team'
+    
+    @staticmethod
+    def get_channel_keys(user):
+        """Department channels a user can read and post in"""
+        if user.is_admin:
+            return [COMPANY_CHANNEL] + DEPARTMENT_CHANNELS
+        
+        keys = [COMPANY_CHANNEL]
+        if user.department and user.department not in ('GENERAL', COMPANY_CHANNEL):
+            keys.append(user.department)
+        return keys
+    
+    @staticmethod
+    def can_access_channel(user, department):
+        """Channel membership is resolved from the user's department, not group_members"""
+        return user.is_admin or department == COMPANY_CHANNEL or department == user.department
+    
+    @staticmethod
+    def get_department_channel(department):
+        """Get the channel group for a department key, or None if nobody has posted yet"""
+        return Group.query.filter_by(group_type='department', department=department).first()
+    
+    @staticmethod
+    def get_or_create_department_channel(department, created_by):
+        """Get the channel group for a department key, creating it on first use"""
+        from sqlalchemy.exc import IntegrityError
+        
+        channel = Group.get_department_channel(department)
+        if channel:
+            return channel
+        
+        channel = Group(
+            name=Group.channel_name(department),
+            description=f'{Group.channel_name(department)} channel',
+            created_by=created_by,
+            group_type='department',
+            department=department
+        )
+        db.session.add(channel)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another request created it first
+            db.session.rollback()
+            return Group.get_department_channel(department)
+        return channel
+    
+    @staticmethod
+    def channel_member_ids(department, exclude_user_id=None):
+        """SELECT of the active user ids a department channel reaches"""
+        from models.user import User
+        
+        stmt = db.select(User.id).where(User.is_active == True)
+        if department != COMPANY_CHANNEL:
+            stmt = stmt.where(User.department == department)
+        if exclude_user_id is not None:
+            stmt = stmt.where(User.id != exclude_user_id)
+        return stmt
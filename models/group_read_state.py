@@ -0,0 +1,108 @@
+from app import db
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+class GroupReadState(db.Model):
+    """Per-member read cursor for a group conversation"""
+    __tablename__ = 'group_read_state'
+
+    group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    last_read_message_id = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<GroupReadState Group {self.group_id} User {self.user_id} -> {self.last_read_message_id}>'
+
+    @staticmethod
+    def mark_read(user_id, group_id, message_id):
+        """Move a member's cursor forward to message_id (never backwards)"""
+        from utils import conversation_cache
+
+        table = GroupReadState.__table__
+        stmt = sqlite_insert(table).values(
+            group_id=group_id,
+            user_id=user_id,
+            last_read_message_id=message_id,
+            updated_at=datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['group_id', 'user_id'],
+            set_={
+                'last_read_message_id': db.func.max(
+                    table.c.last_read_message_id, stmt.excluded.last_read_message_id
+                ),
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        db.session.execute(stmt)
+        conversation_cache.conversation_read(user_id, 'group', group_id)
+
+    @staticmethod
+    def get_unread_counts(user_id):
+        """Get {group_id: unread_count} for every group the user belongs to"""
+        from models.message import Message
+        from models.group import Group, group_members
+
+        cursor = db.func.coalesce(GroupReadState.last_read_message_id, 0)
+        rows = db.session.query(
+            group_members.c.group_id, db.func.count(Message.id)
+        ).select_from(group_members).join(
+            Group, Group.id == group_members.c.group_id
+        ).outerjoin(
+            GroupReadState,
+            (GroupReadState.group_id == group_members.c.group_id) &
+            (GroupReadState.user_id == group_members.c.user_id)
+        ).join(
+            Message,
+            (Message.group_id == group_members.c.group_id) & (Message.id > cursor)
+        ).filter(
+            group_members.c.user_id == user_id,
+            Group.is_active == True
+        ).group_by(group_members.c.group_id).all()
+
+        return {group_id: count for group_id, count in rows}
+
+    @staticmethod
+    def get_unread_counts_for_groups(user_id, group_ids):
+        """Get {group_id: unread_count} for groups joined by rule rather than group_members"""
+        from models.message import Message
+        from models.group import Group
+
+        if not group_ids:
+            return {}
+
+        cursor = db.func.coalesce(GroupReadState.last_read_message_id, 0)
+        rows = db.session.query(
+            Message.group_id, db.func.count(Message.id)
+        ).join(
+            Group, Group.id == Message.group_id
+        ).outerjoin(
+            GroupReadState,
+            (GroupReadState.group_id == Message.group_id) & (GroupReadState.user_id == user_id)
+        ).filter(
+            Message.group_id.in_(group_ids),
+            Group.is_active == True,
+            Message.id > cursor
+        ).group_by(Message.group_id).all()
+
+        return {group_id: count for group_id, count in rows}
+
+    @staticmethod
+    def get_unread_count(user_id, group_id):
+        """Count unread messages in one group with a range scan on (group_id, id)"""
+        from models.message import Message
+
+        last_read = db.session.query(GroupReadState.last_read_message_id).filter_by(
+            group_id=group_id, user_id=user_id
+        ).scalar() or 0
+
+        return db.session.query(db.func.count(Message.id)).filter(
+            Message.group_id == group_id,
+            Message.id > last_read
+        ).scalar()
+
+    @staticmethod
+    def delete_group(group_id):
+        """Drop all cursors for a deleted group"""
+        GroupReadState.query.filter_by(group_id=group_id).delete(synchronize_session=False)
@@ -1,5 +1,8 @@
 from app import db
 from datetime import datetime
+from sqlalchemy.orm import aliased, joinedload, undefer
+from models.conversation_watermark import ConversationWatermark
+from utils.message_compression import CompressedText
 
 class Message(db.Model):
     """Message model for user-to-user and group messaging"""
@@ -9,16 +12,36 @@ class Message(db.Model):
     sender_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     recipient_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)  # Null for group messages
     group_id = db.Column(db.Integer, db.ForeignKey('groups.id'), nullable=True)  # For group messages
-    content = db.Column(db.Text, nullable=False)
+    content = db.Column(CompressedText, nullable=False)  # Long bodies may be stored compressed
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     is_read = db.Column(db.Boolean, default=False, nullable=False)
     message_type = db.Column(db.String(20), default='text', nullable=False)  # text, image, file
     chat_type = db.Column(db.String(20), default='direct', nullable=False)  # direct, group
+    attachment_id = db.Column(db.Integer, db.ForeignKey('attachments.id'), nullable=True)  # For image/file messages
     
     # Relationships
     sender = db.relationship('User', foreign_keys=[sender_id], backref='sent_messages')
     recipient = db.relationship('User', foreign_keys=[recipient_id], backref='received_messages')
     group = db.relationship('Group', backref='messages')
+    attachment = db.relationship('Attachment')
+    
+    # The recipient's read watermark for this conversation; a direct message
+    # is read once the watermark reaches its id (is_read is the legacy flag)
+    read_watermark = db.column_property(
+        db.select(ConversationWatermark.read_message_id).where(
+            (ConversationWatermark.user_id == recipient_id) &
+            (ConversationWatermark.other_user_id == sender_id)
+        ).correlate_except(ConversationWatermark).scalar_subquery(),
+        deferred=True
+    )
+    
+    __table_args__ = (
+        # Group history and unread cursors scan by (group_id, id)
+        db.Index('ix_messages_group_id_id', 'group_id', 'id'),
+        # Direct conversation lookups and deletes, from either side
+        db.Index('ix_messages_sender_recipient', 'sender_id', 'recipient_id'),
+        db.Index('ix_messages_recipient_sender', 'recipient_id', 'sender_id'),
+    )
     
     def __repr__(self):
         if self.chat_type == 'group':
@@ -35,7 +58,7 @@ class Message(db.Model):
             'sender_name': self.sender.username,
             'content': self.content,
             'timestamp': self.timestamp.isoformat(),
-            'is_read': self.is_read,
+            'is_read': self.has_been_read,
             'message_type': self.message_type,
             'chat_type': self.chat_type
         }
@@ -47,124 +70,443 @@ class Message(db.Model):
             data['group_id'] = self.group_id
             data['group_name'] = self.group.name if self.group else None
         
+        if self.attachment_id:
+            data['attachment'] = self.attachment.to_dict()
+        
+        return data
+    
+    @property
+    def has_been_read(self):
+        """Read by the recipient, per their watermark or the legacy flag"""
+        if self.is_read:
+            return True
+        return self.chat_type == 'direct' and (self.read_watermark or 0) >= self.id
+    
+    @staticmethod
+    def read_filter():
+        """SQL condition for messages the recipient has read (see has_been_read)"""
+        return Message.is_read | (
+            (Message.chat_type == 'direct') &
+            (db.func.coalesce(Message.read_watermark, 0) >= Message.id)
+        )
+    
+    @staticmethod
+    def with_relations(query):
+        """Eager-load everything to_dict touches so serializing a page is one query"""
+        return query.options(
+            joinedload(Message.sender),
+            joinedload(Message.recipient),
+            joinedload(Message.group),
+            joinedload(Message.attachment),
+            undefer(Message.read_watermark)
+        )
+    
+    @staticmethod
+    def serialized_select():
+        """Column-only SELECT of the fields to_dict returns, with names joined in"""
+        from models.user import User
+        from models.group import Group
+        from models.attachment import Attachment
+        
+        sender = aliased(User)
+        recipient = aliased(User)
+        
+        return db.select(
+            Message.id,
+            Message.sender_id,
+            sender.username.label('sender_name'),
+            Message.content,
+            Message.timestamp,
+            Message.is_read,
+            Message.message_type,
+            Message.chat_type,
+            Message.recipient_id,
+            recipient.username.label('recipient_name'),
+            Message.group_id,
+            Group.name.label('group_name'),
+            Message.read_watermark.label('read_watermark'),
+            Message.attachment_id,
+            Attachment.filename.label('attachment_filename'),
+            Attachment.content_type.label('attachment_content_type'),
+            Attachment.size.label('attachment_size'),
+            Attachment.thumbnail_ready.label('attachment_thumbnail_ready')
+        ).select_from(Message).outerjoin(
+            sender, sender.id == Message.sender_id
+        ).outerjoin(
+            recipient, recipient.id == Message.recipient_id
+        ).outerjoin(
+            Group, Group.id == Message.group_id
+        ).outerjoin(
+            Attachment, Attachment.id == Message.attachment_id
+        )
+    
+    @staticmethod
+    def row_to_dict(row):
+        """Serialize a serialized_select() row like to_dict, without building ORM objects"""
+        data = {
+            'id': row.id,
+            'sender_id': row.sender_id,
+            'sender_name': row.sender_name,
+            'content': row.content,
+            'timestamp': row.timestamp.isoformat(),
+            'is_read': Message.row_is_read(row),
+            'message_type': row.message_type,
+            'chat_type': row.chat_type
+        }
+        
+        if row.chat_type == 'direct':
+            data['recipient_id'] = row.recipient_id
+            data['recipient_name'] = row.recipient_name
+        elif row.chat_type == 'group':
+            data['group_id'] = row.group_id
+            data['group_name'] = row.group_name
+        
+        if row.attachment_id:
+            from models.attachment import Attachment
+            data['attachment'] = Attachment.serialize(
+                row.attachment_id, row.attachment_filename, row.attachment_content_type,
+                row.attachment_size, row.attachment_thumbnail_ready
+            )
+        
         return data
     
+    @staticmethod
+    def row_is_read(row):
+        """has_been_read for a serialized_select() row"""
+        return bool(row.is_read or (row.chat_type == 'direct' and (row.read_watermark or 0) >= row.id))
+    
+    @staticmethod
+    def conversation_filter(user1_id, user2_id):
+        """Filter for direct messages between two users"""
+        return (
+            (((Message.sender_id == user1_id) & (Message.recipient_id == user2_id)) |
+             ((Message.sender_id == user2_id) & (Message.recipient_id == user1_id))) &
+            (Message.chat_type == 'direct')
+        )
+    
     @staticmethod
     def get_conversation(user1_id, user2_id, limit=50):
         """Get conversation between two users"""
-        return Message.query.filter(
-            ((Message.sender_id == user1_id) & (Message.recipient_id == user2_id)) |
-            ((Message.sender_id == user2_id) & (Message.recipient_id == user1_id))
-        ).filter(Message.chat_type == 'direct').order_by(Message.timestamp.asc()).limit(limit).all()
+        return Message.with_relations(Message.query).filter(
+            Message.conversation_filter(user1_id, user2_id)
+        ).order_by(Message.timestamp.asc()).limit(limit).all()
+    
+    @staticmethod
+    def get_conversation_dicts(user1_id, user2_id, limit=50):
+        """Get a conversation page as dictionaries with a single query"""
+        stmt = Message.serialized_select().where(
+            Message.conversation_filter(user1_id, user2_id)
+        ).order_by(Message.timestamp.asc()).limit(limit)
+        return [Message.row_to_dict(row) for row in db.session.execute(stmt)]
+    
+    @staticmethod
+    def get_conversation_history(user1_id, user2_id, before_id=None, limit=50):
+        """Get a newest-first conversation page older than before_id
+        
+        Unread and latest messages stay hot while older ones around them are
+        archived, so every page merges candidates from both stores.
+        """
+        from utils.message_archive import read_archived_conversation
+        
+        stmt = Message.serialized_select().where(
+            Message.conversation_filter(user1_id, user2_id)
+        )
+        if before_id:
+            stmt = stmt.where(Message.id < before_id)
+        stmt = stmt.order_by(Message.id.desc()).limit(limit)
+        page = [Message.row_to_dict(row) for row in db.session.execute(stmt)]
+        
+        archived = read_archived_conversation(user1_id, user2_id, before_id, limit)
+        return Message.merge_pages(page, archived, limit)
+    
+    @staticmethod
+    def merge_pages(hot, archived, limit):
+        """Newest limit messages of a hot page and an archived page, both newest first"""
+        if not archived:
+            return hot
+        return sorted(hot + archived, key=lambda message: message['id'], reverse=True)[:limit]
     
     @staticmethod
     def get_unread_count(user_id):
-        """Get count of unread messages for a user"""
-        return Message.query.filter_by(recipient_id=user_id, is_read=False).count()
+        """Get count of unread direct messages for a user"""
+        from models.unread_counter import UnreadCounter
+        return UnreadCounter.get_totals(user_id)['direct']
     
     @staticmethod
     def mark_conversation_read(user1_id, user2_id):
-        """Mark all messages in a conversation as read"""
-        Message.query.filter(
-            (Message.sender_id == user2_id) & 
-            (Message.recipient_id == user1_id) & 
-            (Message.is_read == False)
-        ).update({'is_read': True})
+        """Mark all messages user2 sent user1 as read by moving user1's read watermark"""
+        from models.unread_counter import UnreadCounter
+        from utils import conversation_cache
+        
+        latest_id = db.session.query(db.func.max(Message.id)).filter(
+            (Message.sender_id == user2_id) &
+            (Message.recipient_id == user1_id) &
+            (Message.chat_type == 'direct')
+        ).scalar()
+        if latest_id:
+            ConversationWatermark.mark_read(user1_id, user2_id, latest_id)
+        UnreadCounter.reset(user1_id, 'direct', user2_id)
+        conversation_cache.conversation_read(user1_id, 'direct', user2_id)
+        db.session.commit()
+    
+    @staticmethod
+    def attachment_fields(attachment):
+        """message_type and attachment reference for a new message"""
+        if attachment is None:
+            return {'message_type': 'text'}
+        return {
+            'message_type': 'image' if attachment.is_image else 'file',
+            'attachment_id': attachment.id
+        }
+    
+    @staticmethod
+    def add_direct_message(sender_id, recipient_id, content, fields=None):
+        """Stage a direct message and its unread counter update without committing"""
+        from models.unread_counter import UnreadCounter
+        from utils import conversation_cache
+        
+        message = Message(
+            sender_id=sender_id,
+            recipient_id=recipient_id,
+            content=content,
+            timestamp=datetime.utcnow(),
+            chat_type='direct',
+            **(fields or {'message_type': 'text'})
+        )
+        db.session.add(message)
+        UnreadCounter.increment(recipient_id, 'direct', sender_id)
+        conversation_cache.message_sent(message)
+        return message
+    
+    @staticmethod
+    def send_direct_message(sender_id, recipient_id, content, attachment=None):
+        """Send a direct message to another user, optionally carrying an attachment"""
+        message = Message.add_direct_message(
+            sender_id, recipient_id, content, Message.attachment_fields(attachment)
+        )
         db.session.commit()
+        return message
     
     @staticmethod
     def get_group_messages(group_id, limit=50):
         """Get messages for a group"""
-        return Message.query.filter_by(
+        return Message.with_relations(Message.query).filter_by(
             group_id=group_id, 
             chat_type='group'
         ).order_by(Message.timestamp.desc()).limit(limit).all()
     
     @staticmethod
-    def send_group_message(sender_id, group_id, content):
-        """Send a message to a group"""
+    def get_group_message_dicts(group_id, limit=50):
+        """Get a group message page (newest first) as dictionaries with a single query"""
+        stmt = Message.serialized_select().where(
+            (Message.group_id == group_id) & (Message.chat_type == 'group')
+        ).order_by(Message.timestamp.desc()).limit(limit)
+        return [Message.row_to_dict(row) for row in db.session.execute(stmt)]
+    
+    @staticmethod
+    def get_group_history(group_id, before_id=None, limit=50):
+        """Get a newest-first group page older than before_id, merged with the archive"""
+        from utils.message_archive import read_archived_group
+        
+        stmt = Message.serialized_select().where(
+            (Message.group_id == group_id) & (Message.chat_type == 'group')
+        )
+        if before_id:
+            stmt = stmt.where(Message.id < before_id)
+        stmt = stmt.order_by(Message.id.desc()).limit(limit)
+        page = [Message.row_to_dict(row) for row in db.session.execute(stmt)]
+        
+        return Message.merge_pages(page, read_archived_group(group_id, before_id, limit), limit)
+    
+    @staticmethod
+    def get_latest_group_messages(group_ids):
+        """Get {group_id: latest message row} for several groups with one aggregate query"""
+        if not group_ids:
+            return {}
+        
+        latest = db.session.query(
+            db.func.max(Message.id).label('last_message_id')
+        ).filter(
+            Message.group_id.in_(group_ids)
+        ).group_by(Message.group_id).subquery()
+        
+        rows = db.session.query(
+            Message.group_id, Message.content, Message.timestamp
+        ).join(latest, Message.id == latest.c.last_message_id).all()
+        
+        return {row.group_id: row for row in rows}
+    
+    @staticmethod
+    def add_group_message(sender_id, group_id, content, fields=None):
+        """Stage a group message and the sender's read cursor without committing"""
+        from models.group_read_state import GroupReadState
+        from utils import conversation_cache
+        
         message = Message(
             sender_id=sender_id,
             group_id=group_id,
             content=content,
             chat_type='group',
-            message_type='text'
+            **(fields or {'message_type': 'text'})
         )
         db.session.add(message)
+        db.session.flush()
+        
+        # Sending implies the sender has read the group up to their own message
+        GroupReadState.mark_read(sender_id, group_id, message.id)
+        conversation_cache.message_sent(message)
+        return message
+    
+    @staticmethod
+    def send_group_message(sender_id, group_id, content, attachment=None):
+        """Send a message to a group, optionally carrying an attachment"""
+        message = Message.add_group_message(
+            sender_id, group_id, content, Message.attachment_fields(attachment)
+        )
         db.session.commit()
         return message
     
+    @staticmethod
+    def get_direct_conversation_summaries(user_id):
+        """Get the latest message per direct conversation with one aggregate query"""
+        from models.user import User
+        
+        other_user_id = db.case(
+            (Message.sender_id == user_id, Message.recipient_id),
+            else_=Message.sender_id
+        )
+        latest = db.session.query(
+            other_user_id.label('other_user_id'),
+            db.func.max(Message.id).label('last_message_id')
+        ).filter(
+            ((Message.sender_id == user_id) | (Message.recipient_id == user_id)) &
+            (Message.chat_type == 'direct') &
+            (Message.recipient_id.isnot(None))
+        ).group_by(other_user_id).subquery()
+        
+        rows = db.session.query(
+            latest.c.other_user_id,
+            User.username,
+            Message.content,
+            Message.timestamp
+        ).join(
+            Message, Message.id == latest.c.last_message_id
+        ).join(
+            User, User.id == latest.c.other_user_id
+        ).order_by(Message.id.desc()).all()
+        
+        return [{
+            'other_user_id': row.other_user_id,
+            'name': row.username,
+            'last_message': row.content,
+            'timestamp': row.timestamp
+        } for row in rows]
+    
+    @staticmethod
+    def group_conversation(group, unread_count):
+        """Conversation list entry for a group"""
+        from models.group import group_members
+        
+        last_message = Message.query.filter_by(
+            group_id=group.id, 
+            chat_type='group'
+        ).order_by(Message.timestamp.desc()).first()
+        
+        # Get member count safely
+        member_count = db.session.query(group_members).filter(
+            group_members.c.group_id == group.id
+        ).count()
+        
+        return {
+            'type': 'group',
+            'id': group.id,
+            'name': group.name,
+            'last_message': last_message.content if last_message else 'No messages yet',
+            'timestamp': last_message.timestamp if last_message else group.created_at,
+            'member_count': member_count,
+            'unread_count': unread_count
+        }
+    
+    @staticmethod
+    def get_conversation_summary(user_id, chat_type, conversation_id):
+        """One entry of get_user_conversations, or None if the user no longer has it"""
+        from models.user import User
+        from models.group import Group, group_members
+        from models.unread_counter import UnreadCounter
+        from models.group_read_state import GroupReadState
+        
+        if chat_type == 'group':
+            group = db.session.query(Group).join(group_members).filter(
+                group_members.c.user_id == user_id,
+                Group.id == conversation_id,
+                Group.is_active == True
+            ).first()
+            if not group:
+                return None
+            return Message.group_conversation(group, GroupReadState.get_unread_count(user_id, group.id))
+        
+        last_message = db.session.query(Message.content, Message.timestamp).filter(
+            (((Message.sender_id == user_id) & (Message.recipient_id == conversation_id)) |
+             ((Message.sender_id == conversation_id) & (Message.recipient_id == user_id))) &
+            (Message.chat_type == 'direct')
+        ).order_by(Message.id.desc()).first()
+        name = db.session.query(User.username).filter_by(id=conversation_id).scalar()
+        if not last_message or name is None:
+            return None
+        
+        return {
+            'type': 'direct',
+            'id': conversation_id,
+            'name': name,
+            'last_message': last_message.content,
+            'timestamp': last_message.timestamp,
+            'unread_count': UnreadCounter.get_count(user_id, 'direct', conversation_id)
+        }
+    
     @staticmethod
     def get_user_conversations(user_id):
         """Get all conversations (direct and group) for a user"""
         conversations = []
         
         try:
-            from models.user import User
+            # Latest message per conversation partner, aggregated in SQL
+            summaries = Message.get_direct_conversation_summaries(user_id)
             
-            # Get direct conversations - find all users who have exchanged messages with current user
-            direct_messages = db.session.query(Message).filter(
-                ((Message.sender_id == user_id) | (Message.recipient_id == user_id)) &
-                (Message.chat_type == 'direct')
-            ).order_by(Message.timestamp.desc()).all()
+            # Unread counts for every direct conversation in one read
+            from models.unread_counter import UnreadCounter
+            unread_counts = UnreadCounter.get_counts(user_id, 'direct')
             
             # Process direct conversations
-            processed_users = set()
-            for msg in direct_messages:
-                other_user_id = msg.recipient_id if msg.sender_id == user_id else msg.sender_id
-                if other_user_id and other_user_id not in processed_users:
-                    processed_users.add(other_user_id)
-                    other_user = User.query.get(other_user_id)
-                    if other_user:
-                        # Get unread count
-                        unread_count = Message.query.filter(
-                            (Message.sender_id == other_user_id) & 
-                            (Message.recipient_id == user_id) & 
-                            (Message.is_read == False) &
-                            (Message.chat_type == 'direct')
-                        ).count()
-                        
-                        conversations.append({
-                            'type': 'direct',
-                            'id': other_user_id,
-                            'name': other_user.username,
-                            'last_message': msg.content,
-                            'timestamp': msg.timestamp,
-                            'unread_count': unread_count
-                        })
+            for summary in summaries:
+                conversations.append({
+                    'type': 'direct',
+                    'id': summary['other_user_id'],
+                    'name': summary['name'],
+                    'last_message': summary['last_message'],
+                    'timestamp': summary['timestamp'],
+                    'unread_count': unread_counts.get(summary['other_user_id'], 0)
+                })
         except Exception as e:
             print(f"Error loading direct conversations: {e}")
         
         # Process group conversations
         try:
             from models.group import Group, group_members
+            from models.group_read_state import GroupReadState
+            
+            group_unread_counts = GroupReadState.get_unread_counts(user_id)
             
             # Get groups where user is a member using the association table
             user_groups = db.session.query(Group).join(group_members).filter(
-                group_members.c.user_id == user_id
+                group_members.c.user_id == user_id,
+                Group.is_active == True
             ).all()
             
             for group in user_groups:
                 try:
-                    last_message = Message.query.filter_by(
-                        group_id=group.id, 
-                        chat_type='group'
-                    ).order_by(Message.timestamp.desc()).first()
-                    
-                    # Get member count safely
-                    member_count = db.session.query(group_members).filter(
-                        group_members.c.group_id == group.id
-                    ).count()
-                    
-                    conversations.append({
-                        'type': 'group',
-                        'id': group.id,
-                        'name': group.name,
-                        'last_message': last_message.content if last_message else 'No messages yet',
-                        'timestamp': last_message.timestamp if last_message else group.created_at,
-                        'member_count': member_count,
-                        'unread_count': 0  # TODO: Implement group unread count
-                    })
+                    conversations.append(
+                        Message.group_conversation(group, group_unread_counts.get(group.id, 0))
+                    )
                 except Exception as group_error:
                     print(f"Error processing group {group.id}: {group_error}")
                     continue
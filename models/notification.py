@@ -38,4 +38,22 @@ class Notification(db.Model):
             'created_at': self.created_at.isoformat(),
             'read_at': self.read_at.isoformat() if self.read_at else None,
             'actions': self.actions
-        }
\ No newline at end of file
+        }
+    
+    @staticmethod
+    def create_for_users(user_ids_select, title, message, type='info', icon='info-circle'):
+        """Insert one notification per user id from a SELECT with a single INSERT ... SELECT"""
+        user_ids = user_ids_select.subquery()
+        columns = ['user_id', 'title', 'message', 'type', 'icon', 'is_read', 'created_at']
+        rows = db.select(
+            user_ids.c[0],
+            db.literal(title),
+            db.literal(message),
+            db.literal(type),
+            db.literal(icon),
+            db.literal(False),
+            db.literal(datetime.utcnow())
+        )
+        result = db.session.execute(Notification.__table__.insert().from_select(columns, rows))
+        db.session.commit()
+        return result.rowcount
@@ -0,0 +1,88 @@
+from app import db
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+# Byte stored per bucket; rows start zeroed, so offline costs nothing to record
+STATUS_CODES = {'offline': 0, 'break': 1, 'online': 2}
+CODE_STATUSES = {code: status for status, code in STATUS_CODES.items()}
+
+class PresenceDay(db.Model):
+    """One employee's sampled status over one (UTC) day
+
+    samples holds one byte per fixed-interval bucket (see STATUS_CODES), so
+    a day at five-minute buckets is 288 bytes. A row only exists for days
+    the user was online or on break at least once; missing rows and zero
+    bytes mean offline (or that nothing was sampled then). The primary key
+    starts with the day, so a date range is a single index range scan.
+    """
+    __tablename__ = 'presence_days'
+
+    day = db.Column(db.Date, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    department = db.Column(db.String(50), nullable=False)  # Department at the latest sample
+    samples = db.Column(db.LargeBinary, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<PresenceDay {self.day} User {self.user_id}>'
+
+    def get_statuses(self):
+        """Status name per bucket"""
+        return [CODE_STATUSES.get(code, 'offline') for code in self.samples]
+
+    @staticmethod
+    def record(day, bucket, members, buckets_per_day):
+        """Set bucket of day for {user_id: (department, status)} with one read and one upsert per chunk
+
+        Runs in the caller's transaction; offline members need not be passed.
+        """
+        table = PresenceDay.__table__
+        now = datetime.utcnow()
+        user_ids = list(members)
+
+        for start in range(0, len(user_ids), 500):
+            chunk = user_ids[start:start + 500]
+            existing = dict(db.session.execute(
+                db.select(table.c.user_id, table.c.samples).where(
+                    (table.c.day == day) & table.c.user_id.in_(chunk)
+                )
+            ).all())
+
+            rows = []
+            for user_id in chunk:
+                department, status = members[user_id]
+                samples = bytearray(existing.get(user_id) or b'')
+                if len(samples) < buckets_per_day:
+                    samples.extend(bytes(buckets_per_day - len(samples)))
+                samples[bucket] = STATUS_CODES.get(status, 0)
+                rows.append({
+                    'day': day,
+                    'user_id': user_id,
+                    'department': department,
+                    'samples': bytes(samples),
+                    'updated_at': now
+                })
+
+            stmt = sqlite_insert(table)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['day', 'user_id'],
+                set_={
+                    'department': stmt.excluded.department,
+                    'samples': stmt.excluded.samples,
+                    'updated_at': stmt.excluded.updated_at
+                }
+            )
+            db.session.execute(stmt, rows)
+
+    @staticmethod
+    def get_range(start_day, end_day, department=None, user_id=None):
+        """(day, user_id, department, samples) rows for a date range, oldest day first"""
+        table = PresenceDay.__table__
+        query = db.select(table.c.day, table.c.user_id, table.c.department, table.c.samples).where(
+            (table.c.day >= start_day) & (table.c.day <= end_day)
+        )
+        if department:
+            query = query.where(table.c.department == department)
+        if user_id is not None:
+            query = query.where(table.c.user_id == user_id)
+        return db.session.execute(query.order_by(table.c.day)).all()
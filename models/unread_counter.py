@@ -0,0 +1,144 @@
+from app import db
+from datetime import datetime
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+class UnreadCounter(db.Model):
+    """Denormalized unread message counter per (user, conversation)
+    
+    Group conversations track unread state with GroupReadState cursors instead.
+    """
+    __tablename__ = 'unread_counters'
+
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    chat_type = db.Column(db.String(20), primary_key=True)  # direct, group
+    conversation_id = db.Column(db.Integer, primary_key=True)  # Other user id for direct, group id for group
+    count = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f'<UnreadCounter User {self.user_id} {self.chat_type}:{self.conversation_id} = {self.count}>'
+
+    @staticmethod
+    def increment(user_id, chat_type, conversation_id, amount=1):
+        """Add to a user's unread counter (runs in the caller's transaction)"""
+        stmt = sqlite_insert(UnreadCounter.__table__).values(
+            user_id=user_id,
+            chat_type=chat_type,
+            conversation_id=conversation_id,
+            count=amount,
+            updated_at=datetime.utcnow()
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['user_id', 'chat_type', 'conversation_id'],
+            set_={
+                'count': UnreadCounter.__table__.c.count + amount,
+                'updated_at': stmt.excluded.updated_at
+            }
+        )
+        db.session.execute(stmt)
+
+    @staticmethod
+    def decrement(user_id, chat_type, conversation_id, amount=1):
+        """Remove unread messages from a counter without going below zero"""
+        UnreadCounter.query.filter_by(
+            user_id=user_id,
+            chat_type=chat_type,
+            conversation_id=conversation_id
+        ).update({
+            'count': db.case(
+                (UnreadCounter.count > amount, UnreadCounter.count - amount),
+                else_=0
+            ),
+            'updated_at': datetime.utcnow()
+        }, synchronize_session=False)
+
+    @staticmethod
+    def reset(user_id, chat_type, conversation_id):
+        """Reset a conversation counter to zero"""
+        UnreadCounter.query.filter_by(
+            user_id=user_id,
+            chat_type=chat_type,
+            conversation_id=conversation_id
+        ).update({'count': 0, 'updated_at': datetime.utcnow()}, synchronize_session=False)
+
+    @staticmethod
+    def delete_conversation(chat_type, conversation_id, user_id=None):
+        """Drop counters for a deleted conversation"""
+        if chat_type == 'direct':
+            # Direct conversations have one counter on each side
+            UnreadCounter.query.filter(
+                (UnreadCounter.chat_type == 'direct') & (
+                    ((UnreadCounter.user_id == user_id) & (UnreadCounter.conversation_id == conversation_id)) |
+                    ((UnreadCounter.user_id == conversation_id) & (UnreadCounter.conversation_id == user_id))
+                )
+            ).delete(synchronize_session=False)
+        else:
+            UnreadCounter.query.filter_by(
+                chat_type=chat_type,
+                conversation_id=conversation_id
+            ).delete(synchronize_session=False)
+
+    @staticmethod
+    def get_count(user_id, chat_type, conversation_id):
+        """Get one conversation's unread count with a primary-key read"""
+        count = db.session.query(UnreadCounter.count).filter_by(
+            user_id=user_id,
+            chat_type=chat_type,
+            conversation_id=conversation_id
+        ).scalar()
+        return count or 0
+
+    @staticmethod
+    def get_counts(user_id, chat_type):
+        """Get {conversation_id: count} for a user's conversations of one type"""
+        rows = db.session.query(
+            UnreadCounter.conversation_id, UnreadCounter.count
+        ).filter(
+            UnreadCounter.user_id == user_id,
+            UnreadCounter.chat_type == chat_type,
+            UnreadCounter.count > 0
+        ).all()
+        return {conversation_id: count for conversation_id, count in rows}
+
+    @staticmethod
+    def get_totals(user_id):
+        """Get unread totals by chat type for a user with one primary-key range read"""
+        rows = db.session.query(
+            UnreadCounter.chat_type, db.func.sum(UnreadCounter.count)
+        ).filter(
+            UnreadCounter.user_id == user_id
+        ).group_by(UnreadCounter.chat_type).all()
+
+        totals = {'direct': 0}
+        for chat_type, count in rows:
+            totals[chat_type] = int(count or 0)
+        return totals
+
+    @staticmethod
+    def rebuild():
+        """Rebuild all counters from the messages table"""
+        from models.message import Message
+        from utils import conversation_cache
+
+        table = UnreadCounter.__table__
+        now = datetime.utcnow()
+        columns = ['user_id', 'chat_type', 'conversation_id', 'count', 'updated_at']
+
+        db.session.execute(table.delete())
+
+        direct_counts = db.select(
+            Message.recipient_id,
+            db.literal('direct'),
+            Message.sender_id,
+            db.func.count(Message.id),
+            db.literal(now)
+        ).where(
+            (Message.chat_type == 'direct') &
+            (Message.recipient_id.isnot(None)) &
+            ~Message.read_filter()
+        ).group_by(Message.recipient_id, Message.sender_id)
+        db.session.execute(table.insert().from_select(columns, direct_counts))
+
+        conversation_cache.clear()
+        db.session.commit()
+        return UnreadCounter.query.count()
@@ -1,7 +1,8 @@
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
-from datetime import datetime, timedelta
+from collections import namedtuple
+from datetime import datetime
 
 # Import db from app module
 try:
@@ -21,6 +22,8 @@ try:
 except ImportError:
     Log = None
 
+OnlineUser = namedtuple('OnlineUser', 'id username last_activity status')
+
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -47,6 +50,11 @@ class User(UserMixin, db.Model):
     logs = db.relationship('Log', backref='user', lazy=True, cascade='all, delete-orphan')
     notifications = db.relationship('Notification', backref='user', lazy=True, cascade='all, delete-orphan')
     
+    __table_args__ = (
+        # Online users and status counts are range scans on last activity
+        db.Index('ix_users_last_activity', 'last_activity'),
+    )
+    
     def set_password(self, password):
         """Hash and set password"""
         if password:
@@ -76,10 +84,18 @@ class User(UserMixin, db.Model):
             db.session.commit()
     
     def update_activity(self):
-        """Update last activity timestamp"""
+        """Record activity in the presence registry (flushed to last_activity in batches)"""
         if db is not None:
-            self.last_activity = datetime.utcnow()
-            db.session.commit()
+            from utils import presence
+            presence.touch(self.id)
+    
+    def get_last_seen(self):
+        """Latest activity known to the presence registry or the database"""
+        from utils import presence
+        last_seen, _ = presence.lookup(self.id)
+        if last_seen and (not self.last_activity or last_seen > self.last_activity):
+            return last_seen
+        return self.last_activity
     
     def get_online_duration_today(self):
         """Calculate total online duration for today"""
@@ -115,10 +131,8 @@ class User(UserMixin, db.Model):
 
     @property
     def is_online(self):
-        """Check if user is online (active in last 5 minutes)"""
-        if self.last_activity:
-            return datetime.utcnow() - self.last_activity < timedelta(minutes=5)
-        return False
+        """Check if user is online (active within PRESENCE_OFFLINE_AFTER and not logged out)"""
+        return self.get_current_status() != 'offline'
     
     @is_online.setter
     def is_online(self, value):
@@ -131,28 +145,108 @@ class User(UserMixin, db.Model):
     def set_status(self, status):
         """Set user status (online, break, offline)"""
         if db is not None:
+            from utils import presence
+            
             self.current_status = status
             if status == 'break':
                 self.break_start_time = datetime.utcnow()
             elif status == 'online':
                 self.break_start_time = None
             db.session.commit()
+            presence.set_status(self.id, status)
     
     def get_current_status(self):
-        """Get current user status with intelligent detection"""
-        if not self.is_online:
-            return 'offline'
+        """Get current user status (online, break, offline)
+
+        Users the presence registry knows are a lookup of the status its
+        sweeper maintains; others are derived from the stored columns with
+        the same thresholds.
+        """
+        from utils import presence
+        
+        status = presence.current_status(self.id)
+        if status is not None:
+            return status
+        
+        break_after, offline_after = presence.get_thresholds()
+        return presence.derive_status(self.get_last_seen(), self.current_status, datetime.utcnow(),
+                                      break_after, offline_after)
+    
+    @classmethod
+    def status_expression(cls, now=None, overrides=None):
+        """SQL CASE giving each row's online/break/offline status (see presence.derive_status)
+
+        overrides ({user_id: status}) replaces the derived status of those
+        users, e.g. with the presence registry's view of unflushed heartbeats.
+        """
+        from utils import presence
+        
+        now = now or datetime.utcnow()
+        break_after, offline_after = presence.get_thresholds()
+        status = db.case(
+            (db.or_(
+                cls.current_status == 'offline',
+                cls.last_activity.is_(None),
+                cls.last_activity <= now - offline_after
+            ), 'offline'),
+            (db.or_(
+                cls.current_status == 'break',
+                cls.last_activity <= now - break_after
+            ), 'break'),
+            else_='online'
+        )
+        if overrides:
+            status = db.case(overrides, value=cls.id, else_=status)
+        return status
+    
+    @classmethod
+    def get_status_counts(cls, include_admins=True):
+        """{'total', 'online', 'break', 'offline'} from one GROUP BY over status_expression
+
+        Users with heartbeats the presence registry hasn't flushed yet are
+        counted with the registry's status instead; nothing is written.
+        """
+        from utils import presence
+        
+        overrides = {user_id: status for user_id, (_, status) in presence.unflushed().items()}
+        status = cls.status_expression(overrides=overrides)
+        rows = db.session.query(status, db.func.count(cls.id)).filter(
+            *(() if include_admins else (cls.is_admin == False,))
+        ).group_by(status).all()
+        
+        counts = {'online': 0, 'break': 0, 'offline': 0}
+        counts.update(rows)
+        return {'total': sum(counts.values()), **counts}
+    
+    @classmethod
+    def get_online_users(cls):
+        """Users active within the offline threshold, newest first, as (id, username, last_activity, status)
+
+        Candidates are a range scan on last_activity plus the users with
+        unflushed heartbeats, whose status and last_activity come from the
+        presence registry.
+        """
+        from utils import presence
         
-        # If manually set to break
-        if self.current_status == 'break':
-            return 'break'
+        now = datetime.utcnow()
+        _, offline_after = presence.get_thresholds()
+        pending = presence.unflushed()
+        status = cls.status_expression(now, {user_id: status for user_id, (_, status) in pending.items()})
         
-        # Auto-detect break (inactive for 15+ minutes but still online)
-        if self.last_activity and datetime.utcnow() - self.last_activity > timedelta(minutes=15):
-            return 'break'
+        candidates = (cls.last_activity > now - offline_after) & (cls.current_status != 'offline')
+        if pending:
+            candidates = candidates | cls.id.in_(pending)
+        rows = db.session.query(
+            cls.id, cls.username, cls.last_activity, status.label('status')
+        ).filter(candidates, status != 'offline').all()
         
-        # Default to online if online and active
-        return 'online'
+        active = [
+            OnlineUser(row.id, row.username, max(filter(None, (row.last_activity, pending.get(row.id, (None,))[0]))),
+                       row.status)
+            for row in rows
+        ]
+        active.sort(key=lambda user: user.last_activity, reverse=True)
+        return active
     
     def __repr__(self):
         return f'<User {self.username}>'
@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+"""
+Rebuild the full-text message search index from the messages table
+
+The index and its triggers read message bodies through the message_text()
+SQL function, which the app registers on its own connections. Run this
+through the app (as below), not from the sqlite3 CLI.
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app
+from utils.message_search import ensure_search_index, rebuild_search_index
+
+def rebuild_message_search():
+    """Recreate the FTS5 table/triggers if needed and re-index every message"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            if not ensure_search_index():
+                return False
+            
+            indexed = rebuild_search_index()
+            print(f"✅ Indexed {indexed} messages for search")
+        except Exception as e:
+            print(f"❌ Error rebuilding message search index: {e}")
+            return False
+    
+    return True
+
+if __name__ == "__main__":
+    print("🔍 Rebuilding Message Search Index")
+    print("=" * 50)
+    
+    success = rebuild_message_search()
+    
+    if success:
+        print("\n✅ Message search index rebuilt successfully!")
+    else:
+        print("\n❌ Message search rebuild failed!")
+        print("Please check the error messages above.")
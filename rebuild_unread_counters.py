@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Reconciliation script to rebuild unread message counters from the messages table
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import create_app, db
+from models.unread_counter import UnreadCounter
+
+def rebuild_unread_counters():
+    """Recompute every (user, conversation) unread counter"""
+    app = create_app()
+    
+    with app.app_context():
+        try:
+            counter_rows = UnreadCounter.rebuild()
+            print(f"✅ Rebuilt {counter_rows} unread counters from messages")
+        except Exception as e:
+            db.session.rollback()
+            print(f"❌ Error rebuilding unread counters: {e}")
+            return False
+    
+    return True
+
+if __name__ == "__main__":
+    print("🔄 Rebuilding Unread Counters")
+    print("=" * 50)
+    
+    success = rebuild_unread_counters()
+    
+    if success:
+        print("\n✅ Unread counters are in sync with messages!")
+    else:
+        print("\n❌ Unread counter rebuild failed!")
+        print("Please check the error messages above.")
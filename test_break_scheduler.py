@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Test script for the break scheduler
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+from app import db
+from conftest import make_app, login, StatementRecorder
+
+def test_break_scheduler():
+    """Timed breaks are answered from memory and ended server-side"""
+    from models.user import User
+    from models.log import Log
+    from utils import break_scheduler, presence
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing Break Scheduler")
+        print("=" * 40)
+
+        users = []
+        for i in range(2):
+            user = User(username=f'breaker{i}', email=f'breaker{i}@example.com', current_status='online')
+            user.set_password(f'breaker{i}123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [user.id for user in users]
+
+        statements = StatementRecorder(db.engine)
+
+    clients = []
+    for user_id in user_ids:
+        client = app.test_client()
+        login(client, user_id)
+        clients.append(client)
+
+    for client in clients:
+        response = client.post('/dashboard/api/start-break', json={'duration': 15, 'reason': 'Coffee'})
+        assert response.get_json()['success']
+
+    with app.app_context():
+        scheduler = break_scheduler.get_scheduler()
+        assert scheduler.get_stats()['active'] == 2
+        deadline = scheduler.next_deadline()
+        assert deadline is not None
+
+    statements.clear()
+    data = clients[0].get('/dashboard/api/break-status').get_json()
+    assert data['isOnBreak']
+    assert data['plannedDuration'] == 15
+    assert data['reason'] == 'Coffee'
+    assert 0 < data['remainingSeconds'] <= 15 * 60
+    assert data['breakEndTime'] is not None
+    assert not [s for s in statements if 'FROM users' in s and 'break_start_time' in s and 'WHERE users.id' not in s]
+    print("✅ Break status is served from memory with the end time")
+
+    assert clients[1].post('/dashboard/api/end-break').get_json()['success']
+    assert not clients[1].post('/dashboard/api/end-break').get_json()['success']
+    print("✅ A manual end is applied once")
+
+    with app.app_context():
+        scheduler = break_scheduler.get_scheduler()
+        assert scheduler.run_due(deadline - timedelta(seconds=1)) == []
+        assert scheduler.run_due(deadline + timedelta(seconds=1)) == [user_ids[0]]
+        assert scheduler.run_due(deadline + timedelta(seconds=2)) == []
+
+        user = db.session.get(User, user_ids[0])
+        assert user.status == 'online'
+        assert user.current_status == 'online'
+        assert user.break_start_time is None
+        assert user.break_duration is None
+        # No activity is invented for an automatic end: presence derives the status
+        assert user.last_activity is None
+        assert presence.current_status(user_ids[0]) == 'offline'
+        assert db.session.get(User, user_ids[1]).last_activity is not None
+
+        logs = Log.query.filter_by(action='end_break').order_by(Log.id).all()
+        assert [log.user_id for log in logs] == [user_ids[1], user_ids[0]]
+        assert logs[0].details['auto_ended'] is False
+        assert logs[1].details['auto_ended'] is True
+        assert logs[1].details['actual_duration'] == 15
+
+        stats = scheduler.get_stats()
+        assert stats['auto_ended'] == 1
+        assert stats['ended'] == 2
+        assert stats['active'] == 0
+        print("✅ Breaks past their deadline are ended with an auto_ended log")
+
+    data = clients[0].get('/dashboard/api/break-status').get_json()
+    assert not data['isOnBreak']
+    assert not clients[0].post('/dashboard/api/end-break').get_json()['success']
+    print("✅ An auto-ended break can't be ended again")
+
+    with app.app_context():
+        # A break that is no longer running leaves the caller's pending work alone
+        db.session.add(Log(user_id=user_ids[0], action='pending'))
+        assert not break_scheduler.end_break(user_ids[0], deadline, deadline, auto_ended=True)
+        db.session.commit()
+        assert Log.query.filter_by(action='pending').count() == 1
+        assert break_scheduler.get_stats()['auto_ended'] == 1
+        print("✅ A lost race rolls back only its own savepoint")
+
+        # Breaks started and ended by another worker show up here too
+        table = User.__table__
+        started_at = datetime.utcnow()
+        db.session.execute(table.update().where(table.c.id == user_ids[1]).values(
+            status='break', break_start_time=started_at, break_duration=5
+        ))
+        db.session.commit()
+        active = break_scheduler.get_break(user_ids[1])
+        assert active is not None and active['start'] == started_at
+
+        db.session.execute(table.update().where(table.c.id == user_ids[1]).values(
+            status='online', break_start_time=None, break_duration=None
+        ))
+        db.session.commit()
+        assert break_scheduler.get_break(user_ids[1], db.session.get(User, user_ids[1])) is None
+        print("✅ Breaks started or ended on another worker are picked up from the users row")
+
+    with app.app_context():
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_break_scheduler()
+    print("\n✅ Break scheduler test completed!")
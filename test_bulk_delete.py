@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Test script for chunked conversation, group and user deletion
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app
+
+def test_bulk_delete():
+    """Deletes run in chunks and report accurate counts"""
+    from models.user import User
+    from models.group import Group
+    from models.message import Message
+    from utils import bulk_delete
+    from utils.background_jobs import submit_job, get_job
+
+    app = make_app(BULK_DELETE_CHUNK_SIZE=7)
+
+    with app.app_context():
+        print("🧪 Testing Bulk Deletion")
+        print("=" * 40)
+
+        users = []
+        for name in ['alice', 'bob', 'carol']:
+            user = User(username=name, email=f'{name}@example.com')
+            user.set_password(f'{name}123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.flush()
+        alice, bob, carol = users
+
+        group = Group(name='Team', created_by=alice.id)
+        db.session.add(group)
+        db.session.flush()
+        group.add_member(alice)
+        group.add_member(bob)
+        db.session.commit()
+
+        for i in range(20):
+            Message.send_direct_message(alice.id, bob.id, f'Hi Bob {i}')
+            Message.send_group_message(bob.id, group.id, f'Hi team {i}')
+        Message.send_direct_message(alice.id, carol.id, 'Hi Carol')
+
+        # Callable outside a request context, e.g. from jobs and scripts
+        assert not bulk_delete.should_run_in_background(20)
+        assert bulk_delete.should_run_in_background(20, force=True)
+
+        deleted = bulk_delete.delete_conversation(bob.id, alice.id)
+        assert deleted == {'messages': 20}
+        assert Message.query.filter_by(chat_type='direct').count() == 1
+        print("✅ Conversation deleted in chunks")
+
+        deleted = bulk_delete.delete_group(group.id)
+        assert deleted == {'messages': 20, 'members': 2, 'groups': 1}
+        assert Group.query.count() == 0
+        print("✅ Group deleted with messages and memberships")
+
+        job_id = submit_job('delete_user', bulk_delete.delete_user_data, carol.id)
+        for _ in range(100):
+            job = get_job(job_id)
+            if job['status'] in ('completed', 'failed'):
+                break
+            time.sleep(0.05)
+
+        assert job['status'] == 'completed'
+        assert job['result']['messages'] == 1
+        assert job['result']['users'] == 1
+        assert User.query.count() == 2
+        print("✅ User deleted by a background job")
+
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_bulk_delete()
+    print("\n✅ Bulk delete test completed!")
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Test script for the per-user conversation list cache
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app, login, StatementRecorder
+
+def test_conversation_cache():
+    """Conversation lists are served from memory and patched by message events"""
+    from models.user import User
+    from models.group import Group
+    from models.message import Message
+    from utils import bulk_delete, conversation_cache
+
+    app = make_app(CONVERSATION_CACHE_SIZE=2)
+
+    with app.app_context():
+        print("🧪 Testing Conversation Cache")
+        print("=" * 40)
+
+        users = []
+        for name in ['alice', 'bob', 'carol', 'dave']:
+            user = User(username=name, email=f'{name}@example.com')
+            user.set_password(f'{name}123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.flush()
+        group = Group(name='Team', created_by=users[0].id)
+        db.session.add(group)
+        db.session.flush()
+        group.add_member(users[0])
+        group.add_member(users[1])
+        db.session.commit()
+        alice, bob, carol, dave, group_id = users[0].id, users[1].id, users[2].id, users[3].id, group.id
+
+        Message.send_direct_message(alice, bob, 'Hi Bob')
+        Message.send_group_message(alice, group_id, 'Hi team')
+
+        def fresh(user_id):
+            return Message.get_user_conversations(user_id)
+
+        first = conversation_cache.get_user_conversations(bob)
+        assert first == fresh(bob)
+
+        with StatementRecorder(db.engine) as statements:
+            assert conversation_cache.get_user_conversations(bob) == first
+        assert statements == []
+        print("✅ A cached list is served without touching the database")
+
+        Message.send_direct_message(alice, bob, 'Second')
+        Message.send_group_message(alice, group_id, 'Team again')
+        cached = conversation_cache.get_user_conversations(bob)
+        assert cached == fresh(bob)
+        assert cached[0]['last_message'] == 'Team again' and cached[0]['unread_count'] == 2
+        assert cached[1]['last_message'] == 'Second' and cached[1]['unread_count'] == 2
+
+        Message.mark_conversation_read(bob, alice)
+        assert conversation_cache.get_user_conversations(bob) == fresh(bob)
+        print("✅ Sends and mark-read update the cached list in place")
+
+        try:
+            Message.add_direct_message(alice, bob, 'Rolled back')
+            db.session.flush()
+            raise RuntimeError('abort')
+        except RuntimeError:
+            db.session.rollback()
+        assert conversation_cache.get_user_conversations(bob) == fresh(bob)
+        print("✅ Rolled back sends never reach the cache")
+
+        Message.send_direct_message(carol, bob, 'New conversation')
+        message = Message.query.filter_by(content='Second').first()
+        conversation_cache.message_deleted(message)
+        db.session.delete(message)
+        db.session.commit()
+        assert conversation_cache.get_user_conversations(bob) == fresh(bob)
+        assert conversation_cache.get_user_conversations(alice) == fresh(alice)
+        print("✅ New conversations and deleted last messages are reloaded individually")
+
+        bulk_delete.delete_conversation(bob, carol)
+        assert conversation_cache.get_user_conversations(bob) == fresh(bob)
+        bulk_delete.delete_group(group_id)
+        assert conversation_cache.get_user_conversations(bob) == fresh(bob)
+        assert conversation_cache.get_user_conversations(alice) == fresh(alice)
+        print("✅ Deleted conversations and groups leave the cache")
+
+        conversation_cache.get_user_conversations(carol)
+        conversation_cache.get_user_conversations(dave)
+        stats = conversation_cache.get_stats()
+        assert stats['users'] == 2 and stats['evictions'] >= 1
+        assert stats['hits'] > 0 and 0 < stats['hit_rate'] < 1
+        print(f"✅ LRU bounded to 2 users, hit rate {stats['hit_rate']}")
+
+        admin = User(username='admin', email='admin@example.com', is_admin=True)
+        admin.set_password('admin123')
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+
+    client = app.test_client()
+    login(client, bob)
+    data = client.get('/api/conversations?type=all').get_json()
+    assert data['success'] and data['conversations'][0]['name'] == 'alice'
+    login(client, admin_id)
+    data = client.get('/admin/api/cache-stats').get_json()
+    assert data['conversation_cache']['hits'] > 0
+    print("✅ /api/conversations reads through the cache")
+
+    with app.app_context():
+        conversation_cache.get_user_conversations(admin_id)
+    login(client, bob)
+    data = client.post('/dashboard/send_admin_message', json={'subject': 'Hi', 'content': 'Help'}).get_json()
+    assert data['success']
+    with app.app_context():
+        cached = conversation_cache.get_user_conversations(admin_id)
+        assert cached == fresh(admin_id)
+        assert cached[0]['unread_count'] == 1
+    print("✅ Messages to admins update the admins' cached lists")
+
+    with app.app_context():
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_conversation_cache()
+    print("\n✅ Conversation cache test completed!")
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Test script for direct message delivery/read watermarks
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app, login, StatementRecorder
+
+def test_conversation_watermarks():
+    """Reading a conversation moves one watermark instead of updating every message"""
+    from models.user import User
+    from models.message import Message
+    from models.unread_counter import UnreadCounter
+    from models.conversation_watermark import ConversationWatermark
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing Conversation Watermarks")
+        print("=" * 40)
+
+        users = []
+        for name in ['alice', 'bob']:
+            user = User(username=name, email=f'{name}@example.com')
+            user.set_password(f'{name}123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        alice, bob = users[0].id, users[1].id
+
+        for i in range(20):
+            Message.send_direct_message(alice, bob, f'Hello {i}')
+
+    client = app.test_client()
+    login(client, bob)
+
+    data = client.get('/api/notifications/unread').get_json()
+    with app.app_context():
+        latest_id = db.session.query(db.func.max(Message.id)).scalar()
+        receipt = ConversationWatermark.get_receipt(bob, alice)
+        assert receipt['delivered_message_id'] == latest_id
+        assert receipt['read_message_id'] == 0
+    print("✅ Polling for unread messages advances the delivered watermark")
+
+    with app.app_context():
+        statements = StatementRecorder(db.engine)
+        Message.mark_conversation_read(bob, alice)
+        assert not any(s.lstrip().upper().startswith('UPDATE MESSAGES') for s in statements)
+        assert Message.query.filter_by(is_read=True).count() == 0
+        assert UnreadCounter.get_counts(bob, 'direct').get(alice, 0) == 0
+        print("✅ Marking read is one upsert and leaves message rows untouched")
+
+        messages = Message.get_conversation_history(alice, bob)
+        assert all(message['is_read'] for message in messages)
+        assert all(message.has_been_read for message in Message.query.all())
+        print("✅ is_read is derived from the watermark")
+
+        Message.send_direct_message(alice, bob, 'One more')
+        UnreadCounter.rebuild()
+        assert UnreadCounter.get_counts(bob, 'direct').get(alice) == 1
+        print("✅ Counter rebuild only counts messages past the watermark")
+
+    login(client, alice)
+    data = client.get(f'/api/messages/{bob}').get_json()
+    assert data['receipt']['read_message_id'] == latest_id
+    assert data['receipt']['read_at'] is not None
+    print("✅ Sender sees the read receipt with the conversation")
+
+    login(client, bob)
+    messages = client.get('/dashboard/api/user-messages').get_json()['messages']
+    assert messages[0]['message'] == 'One more' and not messages[0]['is_read']
+    assert all(message['is_read'] for message in messages[1:])
+    print("✅ The dashboard message feed reads is_read from the watermark")
+
+    with app.app_context():
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_conversation_watermarks()
+    print("\n✅ Conversation watermark test completed!")
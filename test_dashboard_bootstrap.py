@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Test script for the dashboard bootstrap and tick endpoints
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app, login, StatementRecorder
+
+def test_dashboard_bootstrap():
+    """One response on load, then only the sections that changed"""
+    from models.user import User
+    from models.group import Group
+    from models.message import Message
+    from models.notification import Notification
+    from models.log import Log
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing Dashboard Bootstrap")
+        print("=" * 40)
+
+        users = []
+        for name, department in [('alice', 'SALES'), ('bob', 'SALES'), ('carol', 'HR')]:
+            user = User(username=name, email=f'{name}@example.com', department=department)
+            user.set_password(f'{name}123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.flush()
+        alice, bob, carol = users
+
+        group = Group(name='Team', created_by=alice.id)
+        db.session.add(group)
+        db.session.flush()
+        for user in users:
+            group.add_member(user)
+        db.session.add(Notification(user_id=bob.id, title='Welcome', message='Hello'))
+        db.session.add(Log(user_id=bob.id, action='login'))
+        db.session.commit()
+        admin = User(username='admin', email='admin@example.com', is_admin=True)
+        admin.set_password('admin123')
+        db.session.add(admin)
+        db.session.commit()
+        alice_id, bob_id = alice.id, bob.id
+
+        Message.send_direct_message(alice_id, bob_id, 'Hello Bob')
+        Message.send_group_message(alice_id, group.id, 'Hello team')
+
+        statements = StatementRecorder(db.engine)
+
+    client = app.test_client()
+    login(client, bob_id)
+    client.post('/auth/update_activity')
+
+    client.get('/dashboard/api/bootstrap')  # Warms the user cache
+    statements.clear()
+    data = client.get('/dashboard/api/bootstrap').get_json()
+    assert data['success']
+    assert data['unread'] == {'unread_direct': 1, 'unread_group': 1, 'total_unread': 2}
+    assert data['notifications'] == {'unread_count': 1}
+    assert data['break'] == {'isOnBreak': False}
+    assert len(data['activity']) == 7
+    assert data['activity'][-1]['hours'] >= 0
+    reads = [s for s in statements if s.lstrip().upper().startswith('SELECT')]
+    assert len(reads) == 3, reads
+    print("✅ Bootstrap returns every section with three reads")
+
+    # Counted like /api/dashboard/stats, admins included
+    stats = client.get('/api/dashboard/stats').get_json()['stats']
+    assert data['stats'] == {key: stats[key] for key in data['stats']}
+    assert data['stats']['total_users'] == 4
+    print("✅ Team counts match /api/dashboard/stats")
+
+    version = data['version']
+    tick = client.get(f'/dashboard/api/tick?version={version}').get_json()
+    assert tick['success']
+    assert tick['version'] == version
+    assert not set(tick) & {'break', 'unread', 'notifications', 'stats'}
+    print("✅ A tick with the current version carries no sections")
+
+    with app.app_context():
+        Message.send_direct_message(alice_id, bob_id, 'Still there?')
+    tick = client.get(f'/dashboard/api/tick?version={version}').get_json()
+    assert tick['unread']['unread_direct'] == 2
+    assert not set(tick) & {'break', 'notifications', 'stats'}
+    assert tick['version'] != version
+    version = tick['version']
+    print("✅ A tick only carries the sections that changed")
+
+    client.post('/dashboard/api/start-break', json={'duration': 10})
+    tick = client.get(f'/dashboard/api/tick?version={version}').get_json()
+    assert tick['break']['isOnBreak']
+    assert tick['break']['plannedDuration'] == 10
+    assert tick['break']['breakEndTime'] is not None
+    assert tick['stats']['break_users'] == 1
+    print("✅ Break and team status changes show up in the next tick")
+
+    tick = client.get('/dashboard/api/tick?version=stale').get_json()
+    assert {'break', 'unread', 'notifications', 'stats'} <= set(tick)
+    print("✅ An unknown version gets every section")
+
+    with app.app_context():
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_dashboard_bootstrap()
+    print("\n✅ Dashboard bootstrap test completed!")
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Test script for department channel messaging
+"""
+
+import sys
+import os
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app, login
+
+def test_department_channels():
+    """Channel sends store one message and notify members off the request thread"""
+    from models.user import User
+    from models.group import Group
+    from models.message import Message
+    from models.notification import Notification
+    from utils.background_jobs import _jobs, get_job
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing Department Channels")
+        print("=" * 40)
+
+        users = []
+        for name, department in [('alice', 'ENGINEERING'), ('bob', 'ENGINEERING'),
+                                 ('carol', 'SALES'), ('dave', 'SALES')]:
+            user = User(username=name, email=f'{name}@example.com', department=department)
+            user.set_password(f'{name}123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        alice, bob, carol, dave = [user.id for user in users]
+
+    # Requests run outside the test's app context so each gets its own current_user
+    client = app.test_client()
+    login(client, alice)
+
+    response = client.post('/dashboard/api/send-message',
+                           json={'chat_id': 'group_engineering', 'content': 'Standup in 5'})
+    assert response.get_json()['success']
+    response = client.post('/dashboard/api/send-message',
+                           json={'chat_id': 'group_general', 'content': 'Hello everyone'})
+    assert response.get_json()['success']
+
+    with app.app_context():
+        assert Message.query.count() == 2
+        assert Group.query.filter_by(group_type='department').count() == 2
+        print("✅ One message row per channel send")
+
+    response = client.post('/dashboard/api/send-message',
+                           json={'chat_id': 'group_sales', 'content': 'Not my team'})
+    assert not response.get_json()['success']
+    print("✅ Non-members cannot post in a department channel")
+
+    for job_id in list(_jobs):
+        for _ in range(100):
+            if get_job(job_id)['status'] in ('completed', 'failed'):
+                break
+            time.sleep(0.05)
+        assert get_job(job_id)['status'] == 'completed'
+
+    with app.app_context():
+        assert Notification.query.filter_by(user_id=bob).count() == 2
+        assert Notification.query.filter_by(user_id=carol).count() == 1
+        assert Notification.query.filter_by(user_id=alice).count() == 0
+        print("✅ Member notifications bulk-inserted by a background job")
+
+    login(client, carol)
+    chats = client.get('/dashboard/api/chats?type=group').get_json()['chats']
+    assert [chat['id'] for chat in chats] == ['group_general', 'group_sales']
+    assert chats[0]['unreadCount'] == 1
+    assert chats[0]['lastMessage'] == 'Hello everyone'
+
+    response = client.get('/dashboard/api/messages/group_engineering').get_json()
+    assert not response['success']
+    response = client.get('/dashboard/api/messages/group_general').get_json()
+    assert [msg['content'] for msg in response['messages']] == ['Hello everyone']
+
+    chats = client.get('/dashboard/api/chats?type=group').get_json()['chats']
+    assert chats[0]['unreadCount'] == 0
+    print("✅ Channel readers resolved by department with read cursors")
+
+    login(client, bob)
+    response = client.get('/dashboard/api/messages/group_engineering').get_json()
+    assert [msg['content'] for msg in response['messages']] == ['Standup in 5']
+    print("✅ Department members read the channel")
+
+    with app.app_context():
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_department_channels()
+    print("\n✅ Department channel test completed!")
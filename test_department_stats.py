@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Test script for the incrementally maintained department status counters
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+from app import db
+from conftest import make_app, login, StatementRecorder
+
+def test_department_stats():
+    """Counters follow status and department changes without recounting"""
+    from models.user import User
+    from utils import department_stats, presence
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing Department Stats")
+        print("=" * 40)
+
+        admin = User(username='admin', email='admin@example.com', is_admin=True)
+        admin.set_password('admin123')
+        db.session.add(admin)
+        for i, department in enumerate(['SALES', 'SALES', 'HR', 'QA']):
+            user = User(username=f'user{i}', email=f'user{i}@example.com', department=department)
+            user.set_password(f'user{i}123')
+            db.session.add(user)
+        db.session.commit()
+        admin_id = admin.id
+        user_ids = [user.id for user in User.query.filter_by(is_admin=False).order_by(User.id)]
+
+        stats = department_stats.get_department_stats()
+        assert stats['SALES'] == {'online': 0, 'break': 0, 'offline': 2, 'total': 2}
+        assert stats['QA']['total'] == 1 and stats['MARKETING']['total'] == 0
+        assert sum(dept['total'] for dept in stats.values()) == 4
+        print("✅ Counters start from the users table, admins excluded")
+
+        statements = StatementRecorder(db.engine)
+
+    clients = []
+    for user_id in user_ids:
+        client = app.test_client()
+        login(client, user_id)
+        clients.append(client)
+
+    clients[0].post('/auth/update_activity')
+    clients[1].post('/auth/update_activity')
+    clients[1].post('/dashboard/api/start-break', json={'duration': 10})
+    clients[2].post('/auth/update_activity')
+
+    admin_client = app.test_client()
+    login(admin_client, admin_id)
+    admin_client.post('/admin/assign-department', json={'user_id': user_ids[2], 'department': 'SALES'})
+
+    data = admin_client.get('/admin/api/department-stats').get_json()
+    assert data['departments']['SALES'] == {'online': 2, 'break': 1, 'offline': 0, 'total': 3}
+    assert data['departments']['HR']['total'] == 0
+    print("✅ Heartbeats, breaks and department changes move employees between buckets")
+
+    clients[1].post('/dashboard/api/end-break')
+    clients[0].get('/auth/logout')
+    with app.app_context():
+        statements.clear()
+        stats = department_stats.get_department_stats()
+        assert stats['SALES'] == {'online': 2, 'break': 0, 'offline': 1, 'total': 3}
+        user_reads = [s for s in statements if 'FROM users' in s]
+        assert len(user_reads) == 1 and ' IN ' in user_reads[0]
+        print("✅ Committed status changes reload only the users involved")
+
+        statements.clear()
+        swept = presence.get_registry().sweep(datetime.utcnow() + timedelta(minutes=6))
+        assert len(swept) == 2
+        stats = department_stats.get_department_stats()
+        assert stats['SALES'] == {'online': 0, 'break': 0, 'offline': 3, 'total': 3}
+        assert not any('FROM users' in s for s in statements)
+        print("✅ Sweeper transitions update the counters without querying users")
+
+        tracker = department_stats.get_tracker()
+        tracker.counts['QA']['online'] += 5
+        assert department_stats.reconcile() == 1
+        assert department_stats.get_department_stats()['QA'] == {'online': 0, 'break': 0, 'offline': 1, 'total': 1}
+        assert tracker.get_stats()['drift'] == 1
+        print("✅ Reconciliation corrects drift")
+
+    with app.app_context():
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_department_stats()
+    print("\n✅ Department stats test completed!")
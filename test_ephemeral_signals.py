@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Test script for ephemeral typing/viewing signals
+"""
+
+import sys
+import os
+import json
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app, login, read_event, StatementRecorder
+
+def test_ephemeral_signals():
+    """Signals reach the recipient's stream, expire by TTL and never write to the database"""
+    from models.user import User
+    from models.group import Group
+    from utils import ephemeral_signals
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing Ephemeral Signals")
+        print("=" * 40)
+
+        users = []
+        for name in ['alice', 'bob', 'carol']:
+            user = User(username=name, email=f'{name}@example.com')
+            user.set_password(f'{name}123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.flush()
+        group = Group(name='Team', created_by=users[0].id)
+        db.session.add(group)
+        db.session.flush()
+        group.add_member(users[0])
+        group.add_member(users[1])
+        db.session.commit()
+        alice, bob, carol, group_id = users[0].id, users[1].id, users[2].id, group.id
+        engine = db.engine
+
+    bob_client = app.test_client()
+    login(bob_client, bob)
+    response = bob_client.get('/api/signals/stream', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    stream = response.response
+    assert read_event(stream).startswith('retry:')
+
+    alice_client = app.test_client()
+    login(alice_client, alice)
+
+    with StatementRecorder(engine) as statements:
+        for _ in range(3):
+            result = alice_client.post('/api/signals', json={'type': 'typing', 'chat_type': 'direct', 'chat_id': bob})
+            assert result.get_json()['success']
+        result = alice_client.post('/api/signals', json={'type': 'viewing', 'chat_type': 'group', 'chat_id': group_id})
+        assert result.get_json()['success']
+    writes = [s for s in statements if not s.lstrip().upper().startswith('SELECT')]
+    assert writes == []
+    print("✅ Publishing signals never writes to the database")
+
+    message = read_event(stream)
+    assert message.startswith('event: signal')
+    data = json.loads(message.split('data: ', 1)[1])
+    assert data == {'type': 'typing', 'user_id': alice, 'username': 'alice',
+                    'chat_type': 'direct', 'chat_id': bob, 'active': True}
+    data = json.loads(read_event(stream).split('data: ', 1)[1])
+    assert data['type'] == 'viewing' and data['chat_id'] == group_id
+    print("✅ Repeated pings refresh the TTL; the stream gets start events once")
+
+    with app.app_context():
+        assert len(ephemeral_signals.get_active_signals(bob)) == 2
+        assert ephemeral_signals.get_active_signals(carol) == []
+
+    result = alice_client.post('/api/signals', json={'type': 'typing', 'chat_type': 'direct', 'chat_id': bob,
+                                                     'active': False})
+    data = json.loads(read_event(stream).split('data: ', 1)[1])
+    assert data['type'] == 'typing' and data['active'] is False
+
+    original_ttl = ephemeral_signals.SIGNAL_TTLS['viewing']
+    ephemeral_signals.SIGNAL_TTLS['viewing'] = 0.1
+    try:
+        alice_client.post('/api/signals', json={'type': 'viewing', 'chat_type': 'group', 'chat_id': group_id})
+        time.sleep(0.2)
+        data = json.loads(read_event(stream).split('data: ', 1)[1])
+        assert data['type'] == 'viewing' and data['active'] is False
+    finally:
+        ephemeral_signals.SIGNAL_TTLS['viewing'] = original_ttl
+    print("✅ Signals stop explicitly or when their TTL runs out")
+
+    carol_client = app.test_client()
+    login(carol_client, carol)
+    result = carol_client.post('/api/signals', json={'type': 'typing', 'chat_type': 'group', 'chat_id': group_id})
+    assert result.status_code == 404
+    print("✅ Only group members can signal in a group")
+
+    # Signals are held per app, like the other in-memory registries
+    alice_client.post('/api/signals', json={'type': 'typing', 'chat_type': 'direct', 'chat_id': bob})
+    with make_app().app_context():
+        assert ephemeral_signals.get_active_signals(bob) == []
+        assert ephemeral_signals.subscribed_user_ids() == set()
+    print("✅ Each app has its own signal registry")
+
+    response.close()
+
+    with app.app_context():
+        assert len(ephemeral_signals.get_active_signals(bob)) == 1
+        assert bob not in ephemeral_signals.subscribed_user_ids()
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_ephemeral_signals()
+    print("\n✅ Ephemeral signal test completed!")
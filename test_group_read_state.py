@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script for per-member group read cursors
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app
+
+def test_group_read_state():
+    """Each member has an independent unread count for a group"""
+    from models.user import User
+    from models.group import Group
+    from models.message import Message
+    from models.group_read_state import GroupReadState
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing Group Read Cursors")
+        print("=" * 40)
+
+        users = []
+        for name in ['alice', 'bob', 'carol']:
+            user = User(username=name, email=f'{name}@example.com')
+            user.set_password(f'{name}123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.flush()
+        alice, bob, carol = users
+
+        group = Group(name='Team', created_by=alice.id)
+        db.session.add(group)
+        db.session.flush()
+        for user in users:
+            group.add_member(user)
+        db.session.commit()
+
+        Message.send_group_message(alice.id, group.id, 'First')
+        last = Message.send_group_message(alice.id, group.id, 'Second')
+
+        assert GroupReadState.get_unread_counts(alice.id) == {}
+        assert GroupReadState.get_unread_counts(bob.id) == {group.id: 2}
+        assert GroupReadState.get_unread_count(carol.id, group.id) == 2
+        print("✅ Sender's own messages are not unread")
+
+        # Bob reading the group must not clear Carol's unread messages
+        GroupReadState.mark_read(bob.id, group.id, last.id)
+        db.session.commit()
+        assert GroupReadState.get_unread_count(bob.id, group.id) == 0
+        assert GroupReadState.get_unread_count(carol.id, group.id) == 2
+        print("✅ Read cursors are independent per member")
+
+        # Cursors never move backwards
+        GroupReadState.mark_read(bob.id, group.id, 1)
+        db.session.commit()
+        assert GroupReadState.get_unread_count(bob.id, group.id) == 0
+
+        conversations = Message.get_user_conversations(carol.id)
+        assert conversations[0]['unread_count'] == 2
+        print("✅ Conversation list reports group unread counts")
+
+        # Deactivated groups no longer count towards unread badges
+        group.is_active = False
+        db.session.commit()
+        assert GroupReadState.get_unread_counts(carol.id) == {}
+        assert GroupReadState.get_unread_counts_for_groups(carol.id, [group.id]) == {}
+        print("✅ Inactive groups are excluded from unread counts")
+
+        db.drop_all()
+
+def test_migrate_group_read_state():
+    """The migration starts existing members at their group's newest message"""
+    from models.user import User
+    from models.group import Group
+    from models.message import Message
+    from models.group_read_state import GroupReadState
+    from migrate_group_read_state import migrate_group_read_state
+
+    app = make_app()
+
+    with app.app_context():
+        users = []
+        for name in ['alice', 'bob']:
+            user = User(username=name, email=f'{name}@example.com')
+            user.set_password(f'{name}123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.flush()
+
+        group = Group(name='Team', created_by=users[0].id)
+        db.session.add(group)
+        db.session.flush()
+        for user in users:
+            group.add_member(user)
+        db.session.commit()
+        alice, bob, group_id = users[0].id, users[1].id, group.id
+
+        for i in range(3):
+            Message.send_group_message(alice, group_id, f'Before upgrade {i}')
+
+        # Before the upgrade there are no cursors at all
+        GroupReadState.query.delete()
+        db.session.commit()
+        assert GroupReadState.get_unread_count(bob, group_id) == 3
+
+    assert migrate_group_read_state(app)
+
+    with app.app_context():
+        assert GroupReadState.get_unread_count(bob, group_id) == 0
+        assert GroupReadState.get_unread_count(alice, group_id) == 0
+        print("✅ Migration seeds cursors for existing group history")
+
+        Message.send_group_message(alice, group_id, 'After upgrade')
+        assert GroupReadState.get_unread_count(bob, group_id) == 1
+
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_group_read_state()
+    test_migrate_group_read_state()
+    print("\n✅ Group read state test completed!")
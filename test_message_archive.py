@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script for archiving old messages into monthly cold storage
+"""
+
+import sys
+import os
+import shutil
+import sqlite3
+import tempfile
+from datetime import datetime, timedelta
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app, login
+
+def test_message_archive():
+    """Old messages move to monthly files and history pages continue into them"""
+    from models.user import User
+    from models.group import Group
+    from models.message import Message
+    from utils import bulk_delete
+    from utils.message_archive import archive_messages, list_archive_files
+
+    storage = tempfile.mkdtemp(prefix='message_archive_test_')
+
+    app = make_app(
+        MESSAGE_ARCHIVE_FOLDER=storage,
+        MESSAGE_ARCHIVE_BATCH_SIZE=7,
+    )
+
+    try:
+        with app.app_context():
+            print("🧪 Testing Message Archive")
+            print("=" * 40)
+
+            users = []
+            for name in ['alice', 'bob', 'carol']:
+                user = User(username=name, email=f'{name}@example.com')
+                user.set_password(f'{name}123')
+                users.append(user)
+            db.session.add_all(users)
+            db.session.flush()
+            group = Group(name='Team', created_by=users[0].id)
+            db.session.add(group)
+            db.session.flush()
+            group.add_member(users[0])
+            group.add_member(users[1])
+            db.session.commit()
+            alice, bob, carol, group_id = users[0].id, users[1].id, users[2].id, group.id
+
+            # 30 old messages spread over two months, then 10 recent ones
+            old = datetime(2020, 1, 20)
+            # Unread, so it stays hot below archived messages of the same conversation
+            db.session.add(Message(sender_id=bob, recipient_id=alice, content='Old unread',
+                                   timestamp=old - timedelta(days=1), is_read=False, chat_type='direct'))
+            for i in range(30):
+                db.session.add(Message(sender_id=alice, recipient_id=bob, content=f'Old {i}',
+                                       timestamp=old + timedelta(days=i), is_read=True, chat_type='direct'))
+                db.session.add(Message(sender_id=bob, group_id=group_id, content=f'Old team {i}',
+                                       timestamp=old + timedelta(days=i), chat_type='group'))
+            db.session.add(Message(sender_id=carol, recipient_id=alice, content='Unread but old',
+                                   timestamp=old, is_read=False, chat_type='direct'))
+            db.session.add(Message(sender_id=carol, recipient_id=bob, content='Only message',
+                                   timestamp=old, is_read=True, chat_type='direct'))
+            db.session.commit()
+            for i in range(10):
+                Message.send_direct_message(alice, bob, f'New {i}')
+
+            result = archive_messages(older_than_days=365)
+            # 'Old team 29' is the group's latest message, so it stays hot
+            assert result['archived'] == 59
+            assert result['months'] == ['2020-01', '2020-02']
+            assert len(list_archive_files()) == 2
+            assert [m.content for m in Message.query.filter(Message.content.like('Old%'))] == ['Old unread', 'Old team 29']
+            print("✅ Old messages moved into per-month archive files")
+
+            assert Message.query.filter_by(content='Unread but old').count() == 1
+            assert Message.query.filter_by(content='Old unread').count() == 1
+            assert Message.query.filter_by(content='Only message').count() == 1
+            print("✅ Unread messages and each conversation's latest message stay hot")
+
+            conn = sqlite3.connect(list_archive_files()[0])
+            raw = conn.execute('SELECT content FROM archived_messages LIMIT 1').fetchone()[0]
+            conn.close()
+            assert isinstance(raw, bytes) and not raw.startswith(b'Old')
+            print("✅ Archived bodies are compressed")
+
+            assert archive_messages(older_than_days=365)['archived'] == 0
+
+        client = app.test_client()
+        login(client, alice)
+        contents, before = [], None
+        while True:
+            url = f'/api/messages/{bob}?limit=8' + (f'&before={before}' if before else '')
+            data = client.get(url).get_json()
+            contents += [message['content'] for message in data['messages']]
+            before = data['next_before']
+            if not before:
+                break
+        assert contents == ([f'New {i}' for i in range(9, -1, -1)] + [f'Old {i}' for i in range(29, -1, -1)] +
+                            ['Old unread'])
+        print("✅ Conversation history pages merge hot and archived messages in order")
+
+        data = client.get(f'/api/groups/{group_id}/messages?limit=50').get_json()
+        assert len(data['messages']) == 30
+        assert data['messages'][0]['content'] == 'Old team 0'
+        assert data['messages'][-1]['content'] == 'Old team 29'
+        print("✅ Group history reads from the archive")
+
+        with app.app_context():
+            deleted = bulk_delete.delete_conversation(alice, bob)
+            assert deleted == {'messages': 41}
+            deleted = bulk_delete.delete_group(group_id)
+            assert deleted['messages'] == 30
+            assert Message.get_conversation_history(alice, bob) == []
+            print("✅ Deletes also remove archived messages")
+
+            db.drop_all()
+    finally:
+        shutil.rmtree(storage, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_message_archive()
+    print("\n✅ Message archive test completed!")
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Test script for message attachments
+"""
+
+import sys
+import os
+import io
+import shutil
+import tempfile
+import time
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app, login
+
+def wait_for_jobs():
+    """Wait until every background job has finished"""
+    from utils.background_jobs import _jobs, get_job
+
+    for job_id in list(_jobs):
+        for _ in range(100):
+            if get_job(job_id)['status'] in ('completed', 'failed'):
+                break
+            time.sleep(0.05)
+        assert get_job(job_id)['status'] == 'completed', get_job(job_id)
+
+def test_message_attachments():
+    """Uploads are streamed, deduplicated and served with range and conditional GET"""
+    from PIL import Image
+    from models.user import User
+    from models.message import Message
+
+    storage = tempfile.mkdtemp(prefix='attachments_test_')
+
+    app = make_app(
+        ATTACHMENT_FOLDER=storage,
+        ATTACHMENT_MAX_SIZE=1024 * 1024,
+        ATTACHMENT_CHUNK_SIZE=1024,
+    )
+
+    try:
+        with app.app_context():
+            print("🧪 Testing Message Attachments")
+            print("=" * 40)
+
+            users = []
+            for name in ['alice', 'bob', 'carol']:
+                user = User(username=name, email=f'{name}@example.com')
+                user.set_password(f'{name}123')
+                users.append(user)
+            db.session.add_all(users)
+            db.session.commit()
+            alice, bob, carol = [user.id for user in users]
+
+        client = app.test_client()
+        login(client, alice)
+
+        payload = bytes(range(256)) * 40
+        first = client.post('/api/attachments', data=payload,
+                            headers={'X-Filename': 'report.bin', 'Content-Type': 'application/octet-stream'})
+        assert first.status_code == 201
+        second = client.post('/api/attachments?filename=copy.bin', data=payload,
+                             content_type='application/octet-stream')
+        assert second.get_json()['deduplicated']
+        blobs = [name for _, _, files in os.walk(os.path.join(storage, 'blobs')) for name in files]
+        assert len(blobs) == 1
+        assert os.listdir(os.path.join(storage, 'tmp')) == []
+        print("✅ Identical uploads share one blob")
+
+        too_big = client.post('/api/attachments?filename=big.bin', data=b'x' * (1024 * 1024 + 1),
+                              content_type='application/octet-stream')
+        assert too_big.status_code == 413
+        print("✅ Oversized uploads are rejected")
+
+        image = io.BytesIO()
+        Image.new('RGB', (800, 600), 'red').save(image, 'PNG')
+        response = client.post('/api/attachments', content_type='multipart/form-data',
+                               data={'file': (io.BytesIO(image.getvalue()), 'photo.png')})
+        image_id = response.get_json()['attachment']['id']
+        wait_for_jobs()
+        with app.app_context():
+            from models.attachment import Attachment
+            assert Attachment.query.get(image_id).thumbnail_ready
+        print("✅ Thumbnails generated by a background job")
+
+        file_id = first.get_json()['attachment']['id']
+        response = client.post('/api/messages/send', json={'recipient_id': bob, 'attachment_id': file_id})
+        data = response.get_json()['message_data']
+        assert data['message_type'] == 'file' and data['content'] == 'report.bin'
+        response = client.post('/api/messages/send', json={'recipient_id': bob, 'attachment_id': image_id,
+                                                           'content': 'Look'})
+        assert response.get_json()['message_data']['message_type'] == 'image'
+
+        with app.app_context():
+            page = Message.get_conversation_dicts(alice, bob)
+            assert page[0]['attachment']['url'] == f'/api/attachments/{file_id}'
+            assert page[1]['attachment']['thumbnail_url'] == f'/api/attachments/{image_id}/thumbnail'
+            orm_page = [message.to_dict() for message in Message.get_conversation(alice, bob)]
+            assert orm_page == page
+        print("✅ Messages carry only an attachment reference")
+
+        login(client, bob)
+        response = client.get(f'/api/attachments/{file_id}')
+        assert response.status_code == 200 and response.data == payload
+        etag = response.headers['ETag']
+
+        response = client.get(f'/api/attachments/{file_id}', headers={'Range': 'bytes=100-199'})
+        assert response.status_code == 206
+        assert response.data == payload[100:200]
+        assert response.headers['Content-Range'] == f'bytes 100-199/{len(payload)}'
+
+        response = client.get(f'/api/attachments/{file_id}', headers={'If-None-Match': etag})
+        assert response.status_code == 304
+        assert client.get(f'/api/attachments/{image_id}/thumbnail').status_code == 200
+        print("✅ Range requests and conditional GET work")
+
+        response = client.get(f'/api/attachments/{image_id}')
+        assert response.mimetype == 'image/png'
+        assert response.headers['Content-Disposition'].startswith('inline')
+        assert response.headers['X-Content-Type-Options'] == 'nosniff'
+
+        # The client's label is not trusted: script posing as an image downloads as a plain file
+        login(client, alice)
+        for name, body, label in [('x.svg', b'<svg onload="alert(1)"/>', 'image/svg+xml'),
+                                  ('x.png', b'<script>alert(1)</script>', 'image/png')]:
+            response = client.post('/api/attachments', content_type='multipart/form-data',
+                                   data={'file': (io.BytesIO(body), name, label)})
+            attachment = response.get_json()['attachment']
+            assert attachment['content_type'] == 'application/octet-stream'
+            response = client.get(attachment['url'])
+            assert response.headers['Content-Disposition'].startswith('attachment')
+            assert response.headers['X-Content-Type-Options'] == 'nosniff'
+        response = client.post('/api/attachments?filename=photo.bin', data=image.getvalue(),
+                               content_type='application/octet-stream')
+        assert response.get_json()['attachment']['content_type'] == 'image/png'
+        wait_for_jobs()
+        print("✅ Only sniffed raster images are served inline")
+
+        login(client, carol)
+        assert client.get(f'/api/attachments/{file_id}').status_code == 404
+        response = client.post('/api/messages/send', json={'recipient_id': alice, 'attachment_id': file_id})
+        assert response.status_code == 404
+        print("✅ Attachments are private to the conversation")
+
+        with app.app_context():
+            db.drop_all()
+    finally:
+        shutil.rmtree(storage, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_message_attachments()
+    print("\n✅ Message attachment test completed!")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Test script for compressed message bodies and compact message responses
+"""
+
+import sys
+import os
+import gzip
+import json
+import sqlite3
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app, login
+
+def test_message_compression():
+    """Long bodies are stored compressed, read back as text and still searchable"""
+    from models.user import User
+    from models.message import Message
+    from utils.message_compression import compress_existing_messages, register_sql_functions
+    from utils.message_search import search_messages
+
+    app = make_app(
+        MESSAGE_COMPRESSION='zlib',
+        MESSAGE_COMPRESSION_THRESHOLD=200,
+    )
+    long_text = 'Quarterly report draft: ' + ' '.join(['revenue forecast'] * 100)
+
+    with app.app_context():
+        print("🧪 Testing Message Compression")
+        print("=" * 40)
+
+        users = []
+        for name in ['alice', 'bob']:
+            user = User(username=name, email=f'{name}@example.com')
+            user.set_password(f'{name}123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        alice, bob = users[0].id, users[1].id
+
+        Message.send_direct_message(alice, bob, 'Short hello')
+        long_message = Message.send_direct_message(alice, bob, long_text)
+        long_id = long_message.id
+
+        stored = dict(db.session.execute(db.text(
+            'SELECT id, typeof(content) FROM messages'
+        )).all())
+        assert stored[long_id] == 'blob'
+        assert list(stored.values()).count('text') == 1
+        size = db.session.execute(db.text(
+            'SELECT length(content) FROM messages WHERE id = :id'
+        ), {'id': long_id}).scalar()
+        assert size < len(long_text) / 5
+        print(f"✅ Long body stored compressed ({len(long_text)} -> {size} bytes)")
+
+        db.session.expire_all()
+        assert Message.query.get(long_id).to_dict()['content'] == long_text
+        assert Message.get_conversation_history(alice, bob)[0]['content'] == long_text
+        assert Message.query.filter_by(content='Short hello').count() == 1
+        print("✅ Reads decompress transparently")
+
+        results, _ = search_messages(bob, 'quarterly forecast')
+        assert [result['id'] for result in results] == [long_id]
+        assert '<mark>' in results[0]['highlight']
+        print("✅ Compressed messages stay searchable")
+
+        # Plain sqlite3 connections (e.g. the raw-SQL scripts) can register message_text() too
+        stored_blob = db.session.execute(db.text(
+            'SELECT content FROM messages WHERE id = :id'
+        ), {'id': long_id}).scalar()
+        conn = sqlite3.connect(':memory:')
+        register_sql_functions(conn)
+        assert conn.execute('SELECT message_text(?)', (stored_blob,)).fetchone()[0] == long_text
+        conn.close()
+        print("✅ message_text() can be registered on plain sqlite3 connections")
+
+        # Turning compression off and back on rewrites existing bodies in place
+        app.config['MESSAGE_COMPRESSION'] = None
+        rewritten, saved = compress_existing_messages()
+        assert rewritten == 1 and saved < 0
+        app.config['MESSAGE_COMPRESSION'] = 'zlib'
+        rewritten, saved = compress_existing_messages()
+        assert rewritten == 1 and saved > 0
+        assert compress_existing_messages() == (0, 0)
+        assert [result['id'] for result in search_messages(bob, 'quarterly')[0]] == [long_id]
+        print("✅ Existing messages can be compressed and decompressed in place")
+
+    client = app.test_client()
+    login(client, bob)
+    for i in range(30):
+        with app.app_context():
+            Message.send_direct_message(alice, bob, f'Message number {i} with some text')
+
+    plain = client.get(f'/api/messages/{alice}')
+    assert 'Content-Encoding' not in plain.headers
+    data = plain.get_json()
+
+    compact = client.get(f'/api/messages/{alice}?format=columnar').get_json()
+    assert compact['format'] == 'columnar'
+    columns = compact['messages']['columns']
+    assert columns['id'] == [message['id'] for message in data['messages']]
+    assert columns['content'] == [message['content'] for message in data['messages']]
+    assert 'sender_name' not in columns and compact['messages']['users'][str(alice)] == 'alice'
+    assert all(isinstance(timestamp, int) for timestamp in columns['timestamp'])
+    assert len(json.dumps(compact)) < len(json.dumps(data))
+    print(f"✅ Columnar format ({len(json.dumps(data))} -> {len(json.dumps(compact))} bytes)")
+
+    encoded = client.get(f'/api/messages/{alice}', headers={'Accept-Encoding': 'gzip'})
+    assert encoded.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in encoded.headers['Vary']
+    assert [m['id'] for m in json.loads(gzip.decompress(encoded.data))['messages']] == columns['id']
+    # Small responses aren't worth encoding
+    conversations = client.get('/api/conversations?type=all&format=columnar',
+                               headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in conversations.headers
+    assert conversations.get_json()['conversations']['columns']['name'] == ['alice']
+    print(f"✅ gzip responses ({len(plain.data)} -> {len(encoded.data)} bytes)")
+
+    with app.app_context():
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_message_compression()
+    print("\n✅ Message compression test completed!")
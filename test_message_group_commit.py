@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Test script for group-committed message sends
+"""
+
+import sys
+import os
+import shutil
+import tempfile
+import threading
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app, login
+
+def test_message_group_commit():
+    """Concurrent sends share transactions and each request gets its own id"""
+    from models.user import User
+    from models.group import Group
+    from models.message import Message
+    from models.unread_counter import UnreadCounter
+    from utils import message_writer
+
+    temp_dir = tempfile.mkdtemp(prefix='group_commit_test_')
+
+    app = make_app(
+        SQLALCHEMY_DATABASE_URI=f"sqlite:///{os.path.join(temp_dir, 'test.db')}",
+        MESSAGE_GROUP_COMMIT=True,
+        MESSAGE_GROUP_COMMIT_INTERVAL_MS=100,
+    )
+
+    try:
+        with app.app_context():
+            print("🧪 Testing Message Group Commit")
+            print("=" * 40)
+
+            users = []
+            for name in ['alice', 'bob']:
+                user = User(username=name, email=f'{name}@example.com')
+                user.set_password(f'{name}123')
+                users.append(user)
+            db.session.add_all(users)
+            db.session.flush()
+            group = Group(name='Team', created_by=users[0].id)
+            db.session.add(group)
+            db.session.flush()
+            group.add_member(users[0])
+            group.add_member(users[1])
+            db.session.commit()
+            alice, bob, group_id = users[0].id, users[1].id, group.id
+
+        responses = []
+        lock = threading.Lock()
+
+        def send(i):
+            client = app.test_client()
+            login(client, alice)
+            if i % 2:
+                response = client.post('/api/messages/send', json={'recipient_id': bob, 'content': f'Hi {i}'})
+            else:
+                response = client.post('/api/groups/send', json={'group_id': group_id, 'content': f'Team {i}'})
+            with lock:
+                responses.append(response.get_json())
+
+        threads = [threading.Thread(target=send, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert all(response['success'] for response in responses), responses
+        ids = [response['message_data']['id'] for response in responses]
+        assert len(set(ids)) == 20
+
+        with app.app_context():
+            stats = app.extensions['message_writer'].stats
+            assert stats['messages'] == 20
+            assert stats['batches'] < 20
+            stored = {message.id: message.content for message in Message.query.all()}
+            for response in responses:
+                assert stored[response['message_data']['id']] == response['message_data']['content']
+            assert UnreadCounter.get_counts(bob, 'direct') == {alice: 10}
+            print(f"✅ 20 concurrent sends committed in {stats['batches']} transactions")
+
+            def failing_stage():
+                raise ValueError('bad send')
+
+            writer = message_writer.get_writer()
+            good = writer.submit(Message.add_direct_message, alice, bob, 'Still delivered', None)
+            bad = writer.submit(failing_stage)
+            assert good.result(timeout=5).content == 'Still delivered'
+            try:
+                bad.result(timeout=5)
+                assert False, 'failing send should raise'
+            except ValueError:
+                pass
+            assert UnreadCounter.get_counts(bob, 'direct') == {alice: 11}
+            print("✅ A failing send does not fail the rest of its batch")
+
+            # A send that times out while queued is withdrawn, never written later
+            started, release = threading.Event(), threading.Event()
+
+            def slow_stage():
+                started.set()
+                release.wait(5)
+                return Message.add_direct_message(alice, bob, 'Slow', None)
+
+            slow = writer.submit(slow_stage)
+            assert started.wait(5)
+            app.config['MESSAGE_GROUP_COMMIT_TIMEOUT'] = 0.2
+            try:
+                message_writer.send_direct_message(alice, bob, 'Too late')
+                assert False, 'queued send should time out'
+            except message_writer.MessageNotSent:
+                pass
+            finally:
+                app.config['MESSAGE_GROUP_COMMIT_TIMEOUT'] = 10
+                release.set()
+            assert slow.result(timeout=5).content == 'Slow'
+            writer.submit(Message.add_direct_message, alice, bob, 'After', None).result(timeout=5)
+            assert writer.stats['expired'] == 1
+            assert Message.query.filter_by(content='Too late').count() == 0
+            print("✅ A timed-out send is withdrawn instead of committed late")
+
+            db.drop_all()
+            db.session.remove()
+            db.engine.dispose()
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+if __name__ == "__main__":
+    test_message_group_commit()
+    print("\n✅ Message group commit test completed!")
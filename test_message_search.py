@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Test script for full-text message search
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app
+
+def test_message_search():
+    """Search is ranked, highlighted, kept in sync and limited to visible messages"""
+    from models.user import User
+    from models.group import Group
+    from models.message import Message
+    from utils.message_search import search_messages, rebuild_search_index
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing Message Search")
+        print("=" * 40)
+
+        users = []
+        for name in ['alice', 'bob', 'carol']:
+            user = User(username=name, email=f'{name}@example.com')
+            user.set_password(f'{name}123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.flush()
+        alice, bob, carol = users
+
+        group = Group(name='Team', created_by=alice.id)
+        db.session.add(group)
+        db.session.flush()
+        group.add_member(alice)
+        group.add_member(bob)
+        db.session.commit()
+
+        Message.send_direct_message(alice.id, bob.id, 'The quarterly report is ready')
+        Message.send_direct_message(alice.id, carol.id, 'Secret report for Carol only')
+        Message.send_group_message(bob.id, group.id, 'Report <b>review</b> at noon, report report')
+
+        results, has_more = search_messages(bob.id, 'report')
+        assert not has_more
+        assert len(results) == 2
+        assert {r['chat_type'] for r in results} == {'direct', 'group'}
+        assert results[0]['chat_type'] == 'group'  # More occurrences rank first
+        print("✅ Search only returns messages the user can see")
+
+        assert '<mark>Report</mark>' in results[0]['highlight']
+        assert '&lt;b&gt;review&lt;/b&gt;' in results[0]['highlight']
+        print("✅ Highlights are HTML-escaped")
+
+        results, _ = search_messages(carol.id, 'rep')
+        assert [r['sender_name'] for r in results] == ['alice']
+        assert search_messages(carol.id, 'quarterly')[0] == []
+        print("✅ Prefix matching on the last term")
+
+        results, has_more = search_messages(bob.id, 'report', page=1, per_page=1)
+        assert len(results) == 1 and has_more
+        print("✅ Results are paginated")
+
+        Message.query.filter_by(chat_type='group').delete(synchronize_session=False)
+        db.session.commit()
+        assert len(search_messages(bob.id, 'report')[0]) == 1
+        print("✅ Deletes are removed from the index")
+
+        assert rebuild_search_index() == 2
+        assert search_messages(bob.id, '"unbalanced')[0] == []
+        print("✅ Rebuild and query sanitizing work")
+
+        db.drop_all()
+        db.session.execute(db.text('DROP TABLE IF EXISTS messages_fts'))
+        db.session.commit()
+
+if __name__ == "__main__":
+    test_message_search()
+    print("\n✅ Message search test completed!")
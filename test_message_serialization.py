@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Test script for eager-loaded message and group serialization
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app, StatementRecorder
+
+PAGE_SIZE = 50
+
+def test_message_serialization():
+    """Serializing a page costs a fixed number of statements"""
+    from models.user import User
+    from models.group import Group
+    from models.message import Message
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing Message Serialization")
+        print("=" * 40)
+
+        users = []
+        for i in range(10):
+            user = User(username=f'user{i}', email=f'user{i}@example.com')
+            user.set_password('password123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.flush()
+
+        group = Group(name='Team', created_by=users[0].id)
+        db.session.add(group)
+        db.session.flush()
+        for user in users:
+            group.add_member(user)
+        db.session.commit()
+
+        alice_id, bob_id, group_id = users[0].id, users[1].id, group.id
+        user_ids = [user.id for user in users]
+        for i in range(PAGE_SIZE):
+            Message.send_direct_message(alice_id, bob_id, f'Direct {i}')
+            Message.send_group_message(user_ids[i % len(user_ids)], group_id, f'Group {i}')
+
+        # Start from an empty identity map so lazy loads would hit the database
+        db.session.expunge_all()
+
+        with StatementRecorder(db.engine) as statements:
+            page = Message.get_conversation_dicts(alice_id, bob_id, limit=PAGE_SIZE)
+        assert len(page) == PAGE_SIZE
+        assert len(statements) == 1
+        assert page[0]['sender_name'] == 'user0' and page[0]['recipient_name'] == 'user1'
+        print(f"✅ Direct page of {PAGE_SIZE} serialized with {len(statements)} statement")
+
+        with StatementRecorder(db.engine) as statements:
+            page = Message.get_group_message_dicts(group_id, limit=PAGE_SIZE)
+        assert len(page) == PAGE_SIZE
+        assert len(statements) == 1
+        assert page[0]['group_name'] == 'Team'
+        print(f"✅ Group page of {PAGE_SIZE} serialized with {len(statements)} statement")
+
+        db.session.expunge_all()
+        with StatementRecorder(db.engine) as statements:
+            orm_page = [msg.to_dict() for msg in Message.get_group_messages(group_id, limit=PAGE_SIZE)]
+        assert len(statements) == 1
+        assert orm_page == page
+        print("✅ Eager-loaded to_dict matches the row serializer with 1 statement")
+
+        db.session.expunge_all()
+        with StatementRecorder(db.engine) as statements:
+            group_data = Group.get_with_members(group_id).to_dict()
+        assert group_data['member_count'] == len(users)
+        assert len(statements) == 2
+        print(f"✅ Group.to_dict with {len(users)} members used {len(statements)} statements")
+
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_message_serialization()
+    print("\n✅ Message serialization test completed!")
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""
+Test script for the online-users API and status counts
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+from app import db
+from conftest import make_app, login, StatementRecorder
+
+def test_online_users():
+    """Online users come from a last_activity range, counts from one query"""
+    from models.user import User
+
+    app = make_app()
+    now = datetime.utcnow()
+
+    with app.app_context():
+        print("🧪 Testing Online Users")
+        print("=" * 40)
+
+        admin = User(username='admin', email='admin@example.com', is_admin=True,
+                     current_status='online', last_activity=now)
+        admin.set_password('admin123')
+        db.session.add(admin)
+        employees = [
+            ('active', 'online', now - timedelta(minutes=1)),
+            ('resting', 'break', now - timedelta(minutes=2)),
+            ('idle', 'online', now - timedelta(hours=3)),
+            ('gone', 'offline', now),
+            ('never', 'offline', None)
+        ]
+        for name, current_status, last_activity in employees:
+            user = User(username=name, email=f'{name}@example.com',
+                        current_status=current_status, last_activity=last_activity)
+            user.set_password(f'{name}123')
+            db.session.add(user)
+        db.session.commit()
+        admin_id = admin.id
+
+        plan = db.session.execute(db.text(
+            "EXPLAIN QUERY PLAN SELECT id FROM users WHERE last_activity > '2024-01-01'"
+        )).all()
+        assert 'ix_users_last_activity' in plan[0][-1]
+        print("✅ The last_activity range query uses its index")
+
+        statements = StatementRecorder(db.engine)
+
+    client = app.test_client()
+    login(client, admin_id)
+
+    data = client.get('/admin/api/online-users').get_json()
+    assert [user['username'] for user in data['users']] == ['admin', 'active', 'resting']
+    assert {user['username']: user['status'] for user in data['users']}['resting'] == 'break'
+    assert all(user['last_active'] for user in data['users'])
+    assert data['stats'] == {'total': 6, 'online': 2, 'break': 1, 'offline': 3}
+    print("✅ Online users and status counts are derived from activity")
+
+    statements.clear()
+    stats = client.get('/api/dashboard/stats').get_json()['stats']
+    assert stats['online_users'] == 2 and stats['break_users'] == 1
+    assert stats['offline_users'] == 3 and stats['total_users'] == 6
+    counts = [s for s in statements if 'count(' in s.lower()]
+    assert len(counts) == 1
+    print("✅ Dashboard stats come from one aggregate query")
+
+    with app.app_context():
+        from utils import presence
+        idle = User.query.filter_by(username='idle').one()
+        presence.touch(idle.id)
+        statements.clear()
+        assert User.get_status_counts() == {'total': 6, 'online': 3, 'break': 1, 'offline': 2}
+        assert len(statements) == 1 and 'GROUP BY' in statements[0]
+        assert [user.username for user in User.get_online_users()][0] == 'idle'
+        assert not any(s.lstrip().upper().startswith('UPDATE') for s in statements)
+        print("✅ Unflushed heartbeats correct the aggregate per user")
+
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_online_users()
+    print("\n✅ Online users test completed!")
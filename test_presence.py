@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Test script for the in-memory presence registry
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+from app import db
+from conftest import make_app, login, StatementRecorder
+
+def test_presence():
+    """Heartbeats stay in memory and are written in one batched UPDATE"""
+    from models.user import User
+    from utils import presence
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing Presence Registry")
+        print("=" * 40)
+
+        users = []
+        for i in range(5):
+            user = User(username=f'user{i}', email=f'user{i}@example.com', current_status='online')
+            user.set_password(f'user{i}123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        user_ids = [user.id for user in users]
+
+        statements = StatementRecorder(db.engine)
+
+    clients = []
+    for user_id in user_ids:
+        client = app.test_client()
+        login(client, user_id)
+        clients.append(client)
+
+    for _ in range(3):
+        for client in clients:
+            assert client.post('/auth/update_activity').get_json()['success']
+    assert not any(s.lstrip().upper().startswith('UPDATE') for s in statements)
+    print("✅ Heartbeats don't write to the database")
+
+    with app.app_context():
+        user = db.session.get(User, user_ids[0])
+        assert user.last_activity is None
+        assert user.is_online
+        assert user.get_current_status() == 'online'
+        print("✅ is_online and get_current_status read the registry")
+
+        statements.clear()
+        assert User.get_status_counts()['online'] == len(user_ids)
+        assert len(User.get_online_users()) == len(user_ids)
+        assert all(user.last_activity for user in User.get_online_users())
+        assert not any(s.lstrip().upper().startswith('UPDATE') for s in statements)
+        print("✅ Status counts and online users see unflushed heartbeats without writing")
+
+        statements.clear()
+        assert presence.flush() == len(user_ids)
+        updates = [s for s in statements if s.lstrip().upper().startswith('UPDATE')]
+        assert len(updates) == 1
+        assert presence.flush() == 0
+        db.session.expire_all()
+        assert all(user.last_activity is not None for user in User.query.all())
+        print("✅ Flush writes every pending heartbeat in one UPDATE")
+
+        registry = presence.get_registry()
+        transitions = []
+        presence.on_transition(transitions.extend)
+        deadline = registry.next_deadline()
+        assert deadline is not None
+        assert registry.sweep(deadline - timedelta(seconds=1)) == []
+
+        later = datetime.utcnow() + timedelta(minutes=6)
+        swept = registry.sweep(later)
+        assert sorted(swept) == [(user_id, 'online', 'offline') for user_id in user_ids]
+        assert transitions == swept
+        assert registry.next_deadline() is None
+        assert all(registry.current(user_id) == 'offline' for user_id in user_ids)
+        assert not db.session.get(User, user_ids[1]).is_online
+        print("✅ The sweeper moves idle users offline when their deadline passes")
+
+        statements.clear()
+        assert presence.flush() == len(user_ids)
+        db.session.expire_all()
+        assert all(user.current_status == 'offline' for user in User.query.all())
+        print("✅ Offline transitions are persisted with the next flush")
+
+        assert presence.touch(user_ids[1]) is False
+        assert registry.current(user_ids[1]) == 'online'
+        assert transitions[-1] == (user_ids[1], 'offline', 'online')
+        assert presence.flush() == 1
+        db.session.expire_all()
+        assert db.session.get(User, user_ids[1]).current_status == 'offline'
+        print("✅ A heartbeat brings an idle user back online")
+
+    clients[0].get('/auth/logout')
+    with app.app_context():
+        user = db.session.get(User, user_ids[0])
+        assert not user.is_online
+        assert user.get_current_status() == 'offline'
+    print("✅ Logging out is reflected immediately")
+
+    clients[2].post('/api/user/status', json={'status': 'break'})
+    with app.app_context():
+        user = db.session.get(User, user_ids[2])
+        assert user.current_status == 'break'
+        assert user.get_current_status() == 'break'
+    print("✅ Explicit status changes are written and mirrored")
+
+    with app.app_context():
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_presence()
+    print("\n✅ Presence registry test completed!")
@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script for the presence history time series
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from datetime import datetime, timedelta
+from app import db
+from conftest import make_app, login, StatementRecorder
+
+def test_presence_history():
+    """Samples become per-day byte rows that the heatmap aggregates"""
+    from models.user import User
+    from models.presence_history import PresenceDay
+    from utils import presence, presence_history
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing Presence History")
+        print("=" * 40)
+
+        users = []
+        for name, department in [('alice', 'SALES'), ('bob', 'SALES'), ('carol', 'HR'), ('dave', 'HR')]:
+            user = User(username=name, email=f'{name}@example.com', department=department)
+            user.set_password(f'{name}123')
+            users.append(user)
+        admin = User(username='boss', email='boss@example.com', is_admin=True)
+        admin.set_password('boss123')
+        db.session.add_all(users + [admin])
+        db.session.commit()
+        alice, bob, carol, dave = [user.id for user in users]
+        admin_id = admin.id
+
+        for user_id in (alice, bob, carol, admin_id):
+            presence.touch(user_id)
+        presence.set_status(bob, 'break')
+
+        today = datetime.utcnow().date()
+        nine = datetime.combine(today, datetime.min.time()) + timedelta(hours=9)
+        sampler = presence_history.get_sampler()
+        assert sampler.buckets_per_day == 288
+        assert sampler.bucket_of(nine) == (today, 108)
+
+        assert presence_history.sample(nine) == 3
+        assert presence_history.sample(nine + timedelta(minutes=2)) == 0
+        assert sampler.get_stats()['skipped'] == 1
+        print("✅ Online and on-break employees are sampled once per bucket")
+
+        presence.set_status(carol, 'offline')
+        assert presence_history.sample(nine + timedelta(minutes=5)) == 2
+
+        rows = {row.user_id: row for row in PresenceDay.query.all()}
+        assert set(rows) == {alice, bob, carol}
+        assert all(len(row.samples) == 288 for row in rows.values())
+        assert rows[alice].get_statuses()[108:110] == ['online', 'online']
+        assert rows[bob].get_statuses()[108:110] == ['break', 'break']
+        assert rows[carol].get_statuses()[107:110] == ['offline', 'online', 'offline']
+        assert rows[carol].department == 'HR'
+        print("✅ Each employee gets one compact row per day")
+
+        statements = StatementRecorder(db.engine)
+
+    client = app.test_client()
+    login(client, admin_id)
+
+    statements.clear()
+    data = client.get(f'/admin/api/presence-heatmap?start={today}&end={today}').get_json()
+    assert data['success']
+    assert data['interval'] == 300
+    assert data['days'] == [today.isoformat()]
+    assert set(data['departments']) == {'SALES', 'HR'}
+    sales, hr = data['departments']['SALES'], data['departments']['HR']
+    assert sales['online'][0][108:110] == [1, 1]
+    assert sales['break'][0][108:110] == [1, 1]
+    assert hr['online'][0][107:111] == [0, 1, 0, 0]
+    assert sum(hr['break'][0]) == 0
+    assert not any('logs' in s for s in statements)
+    print("✅ The heatmap counts occupancy per department and bucket without reading logs")
+
+    yesterday = today - timedelta(days=1)
+    data = client.get(f'/admin/api/presence-heatmap?start={yesterday}&end={today}&department=HR').get_json()
+    assert data['days'] == [yesterday.isoformat(), today.isoformat()]
+    assert list(data['departments']) == ['HR']
+    assert data['departments']['HR']['online'][0] == [0] * 288
+
+    data = client.get(f'/admin/api/presence-heatmap?user_id={bob}').get_json()
+    assert data['samples'][0][108:110] == [data['codes']['break']] * 2
+    print("✅ Date ranges, department filters and per-user history")
+
+    assert client.get('/admin/api/presence-heatmap?start=2020-01-01').status_code == 400
+    assert client.get('/admin/api/presence-heatmap?end=nonsense').status_code == 400
+    print("✅ Invalid ranges are rejected")
+
+    with app.app_context():
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_presence_history()
+    print("\n✅ Presence history test completed!")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test script for the versioned employee status feed
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import json
+from datetime import datetime
+from app import db
+from conftest import make_app, login, read_event
+
+def test_status_feed():
+    """Pollers get the full list once, then only users whose status changed"""
+    from models.user import User
+    from utils import status_snapshot
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing Status Feed")
+        print("=" * 40)
+
+        admin = User(username='admin', email='admin@example.com', is_admin=True)
+        admin.set_password('admin123')
+        db.session.add(admin)
+        for i in range(10):
+            user = User(username=f'user{i}', email=f'user{i}@example.com', department='SALES',
+                        current_status='online', last_activity=datetime.utcnow())
+            user.set_password(f'user{i}123')
+            db.session.add(user)
+        db.session.commit()
+        admin_id = admin.id
+        user_ids = [user.id for user in User.query.filter_by(is_admin=False).order_by(User.id)]
+
+    client = app.test_client()
+    login(client, admin_id)
+
+    first = client.get('/admin/api/user-status/feed').get_json()
+    assert first['full'] and len(first['users']) == 10
+    assert first['stats']['online'] == 10
+    seq, epoch = first['seq'], first['epoch']
+    print("✅ First load gets the full list and a sequence number")
+
+    data = client.get(f'/admin/api/user-status/feed?since={seq}&epoch={epoch}').get_json()
+    assert not data['full'] and data['users'] == [] and data['seq'] == seq
+    print("✅ Nothing changed, nothing is sent")
+
+    with app.app_context():
+        db.session.get(User, user_ids[3]).current_status = 'break'
+        db.session.get(User, user_ids[5]).current_status = 'offline'
+        db.session.delete(db.session.get(User, user_ids[9]))
+        db.session.commit()
+        status_snapshot.invalidate()
+
+    data = client.get(f'/admin/api/user-status/feed?since={seq}&epoch={epoch}').get_json()
+    assert not data['full']
+    assert {user['id']: user['status'] for user in data['users']} == {user_ids[3]: 'break', user_ids[5]: 'offline'}
+    assert data['removed'] == [user_ids[9]]
+    assert data['seq'] == seq + 3
+    assert data['stats'] == {'total': 9, 'online': 7, 'break': 1, 'offline': 1}
+    print("✅ Deltas carry only changed and removed users")
+
+    data = client.get(f'/admin/api/user-status/feed?since={seq}&epoch=other').get_json()
+    assert data['full'] and len(data['users']) == 9
+    data = client.get(f'/admin/api/user-status/feed?since={seq + 100}&epoch={epoch}').get_json()
+    assert data['full']
+
+    with app.app_context():
+        feed = app.extensions['status_feed']
+        feed.history = 2
+        db.session.get(User, user_ids[0]).current_status = 'break'
+        db.session.commit()
+        status_snapshot.invalidate()
+    data = client.get(f'/admin/api/user-status/feed?since={seq}&epoch={epoch}').get_json()
+    assert data['full'] and len(data['users']) == 9
+    print("✅ Unknown epochs and sequence gaps fall back to a full list")
+
+    response = client.get(f'/admin/api/user-status/stream?since={seq}&epoch={epoch}', buffered=False)
+    assert response.mimetype == 'text/event-stream'
+    stream = response.response
+    assert read_event(stream).startswith('retry:')
+    message = read_event(stream)
+    assert message.startswith(f'id: {epoch}:')
+    data = json.loads(message.split('data: ', 1)[1])
+    assert data['full']
+    response.close()
+    print("✅ The stream pushes the same deltas")
+
+    assert client.get('/admin/dashboard').status_code == 200
+
+    with app.app_context():
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_status_feed()
+    print("\n✅ Status feed test completed!")
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script for the cached admin status snapshot
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import threading
+import time
+from datetime import datetime, timedelta
+from app import db
+from conftest import make_app, login, StatementRecorder
+
+def test_status_snapshot():
+    """Statuses and department stats come from one query, shared while fresh"""
+    from models.user import User
+    from utils import status_snapshot
+
+    app = make_app()
+    now = datetime.utcnow()
+
+    with app.app_context():
+        print("🧪 Testing Admin Status Snapshot")
+        print("=" * 40)
+
+        admin = User(username='admin', email='admin@example.com', is_admin=True)
+        admin.set_password('admin123')
+        db.session.add(admin)
+
+        employees = [
+            ('eng_online', 'ENGINEERING', 'online', now),
+            ('eng_break', 'ENGINEERING', 'break', now),
+            ('eng_idle', 'ENGINEERING', 'online', now - timedelta(minutes=30)),
+            ('sales_out', 'SALES', 'offline', now),
+            ('hr_online', 'HR', 'online', now - timedelta(minutes=1)),
+            ('general', 'GENERAL', 'online', now)
+        ]
+        for name, department, current_status, last_activity in employees:
+            user = User(username=name, email=f'{name}@example.com', department=department,
+                        current_status=current_status, last_activity=last_activity)
+            user.set_password(f'{name}123')
+            db.session.add(user)
+        db.session.commit()
+        admin_id = admin.id
+
+        statements = StatementRecorder(db.engine)
+
+    client = app.test_client()
+    login(client, admin_id)
+
+    data = client.get('/admin/api/user-status').get_json()
+    statuses = {user['username']: user['status'] for user in data['users']}
+    assert statuses == {
+        'eng_online': 'online', 'eng_break': 'break', 'eng_idle': 'offline',
+        'sales_out': 'offline', 'hr_online': 'online', 'general': 'online'
+    }
+    assert data['stats'] == {'total': 6, 'online': 3, 'break': 1, 'offline': 2}
+    assert data['departments']['ENGINEERING'] == {'total': 3, 'online': 1, 'break': 1, 'offline': 1}
+    assert data['departments']['SALES'] == {'total': 1, 'online': 0, 'break': 0, 'offline': 1}
+    assert data['departments']['MARKETING']['total'] == 0
+    user_selects = [s for s in statements if 'FROM users' in s and 'CASE' in s]
+    assert len(user_selects) == 1
+    print("✅ Statuses and department stats come from one CASE query")
+
+    statements.clear()
+    assert client.get('/admin/api/user-status').get_json()['timestamp'] == data['timestamp']
+    response = client.get('/admin/dashboard')
+    assert response.status_code == 200
+    assert not any('CASE' in s for s in statements)
+    print("✅ The dashboard and API share the cached snapshot")
+
+    with app.app_context():
+        cache = status_snapshot.get_cache()
+        cache.invalidate()
+        builds = []
+
+        def slow_build():
+            time.sleep(0.2)
+            builds.append(1)
+            return {'built': len(builds)}
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(slow_build))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert len(builds) == 1
+        assert all(result is results[0] for result in results)
+        print("✅ Concurrent pollers wait for a single rebuild")
+
+        cache.invalidate()
+
+    client.post('/admin/assign-department', json={'user_id': admin_id + 6, 'department': 'FINANCE'})
+    data = client.get('/admin/api/user-status').get_json()
+    assert data['departments']['FINANCE']['total'] == 1
+    print("✅ Department changes invalidate the snapshot")
+
+    with app.app_context():
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_status_snapshot()
+    print("\n✅ Status snapshot test completed!")
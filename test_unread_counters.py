@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test script for denormalized unread message counters
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app
+
+def create_test_data():
+    """Create two users"""
+    from models.user import User
+
+    alice = User(username='alice', email='alice@example.com')
+    alice.set_password('alice123')
+    bob = User(username='bob', email='bob@example.com')
+    bob.set_password('bob123')
+    db.session.add_all([alice, bob])
+    db.session.commit()
+
+    return alice, bob
+
+def test_unread_counters():
+    """Counters follow sends, mark-read and reconciliation"""
+    from models.message import Message
+    from models.unread_counter import UnreadCounter
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing Unread Counters")
+        print("=" * 40)
+
+        alice, bob = create_test_data()
+
+        Message.send_direct_message(alice.id, bob.id, 'Hello Bob')
+        Message.send_direct_message(alice.id, bob.id, 'Are you there?')
+
+        assert UnreadCounter.get_totals(bob.id) == {'direct': 2}
+        assert UnreadCounter.get_totals(alice.id) == {'direct': 0}
+        assert UnreadCounter.get_counts(bob.id, 'direct') == {alice.id: 2}
+        assert Message.get_unread_count(bob.id) == 2
+        print("✅ Counters incremented on send")
+
+        Message.mark_conversation_read(bob.id, alice.id)
+        assert UnreadCounter.get_totals(bob.id)['direct'] == 0
+        print("✅ Counter reset on mark read")
+
+        # Drift the counters and let reconciliation repair them
+        UnreadCounter.increment(bob.id, 'direct', alice.id, amount=5)
+        db.session.commit()
+        UnreadCounter.rebuild()
+        assert UnreadCounter.get_totals(bob.id) == {'direct': 0}
+        print("✅ Reconciliation rebuilt counters from messages")
+
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_unread_counters()
+    print("\n✅ Unread counter test completed!")
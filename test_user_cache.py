@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Test script for the user loader cache
+"""
+
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import db
+from conftest import make_app, login, StatementRecorder
+
+def test_user_cache():
+    """Polls reuse the loaded user until it changes or expires"""
+    from models.user import User
+    from utils import bulk_delete, user_cache
+
+    app = make_app()
+
+    with app.app_context():
+        print("🧪 Testing User Loader Cache")
+        print("=" * 40)
+
+        user = User(username='cached', email='cached@example.com', department='SALES')
+        user.set_password('cached123')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+        statements = StatementRecorder(db.engine)
+
+    def user_loads():
+        return [s for s in statements if 'FROM users' in s and 'WHERE users.id = ?' in s]
+
+    client = app.test_client()
+    login(client, user_id)
+
+    for _ in range(5):
+        assert client.get('/dashboard/api/break-status').get_json()['success']
+    assert len(user_loads()) == 1
+    with app.app_context():
+        stats = user_cache.get_stats()
+        assert stats['hits'] == 4
+        assert stats['misses'] == 1
+        assert stats['hit_rate'] == 0.8
+    print("✅ Repeated polls load the user once")
+
+    # Changes made through current_user are flushed as usual and evict the entry
+    assert client.post('/dashboard/api/start-break', json={'duration': 10}).get_json()['success']
+    with app.app_context():
+        assert db.session.get(User, user_id).break_duration == 10
+    assert client.get('/dashboard/api/break-status').get_json()['isOnBreak']
+    assert client.post('/dashboard/api/end-break').get_json()['success']
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        assert user.break_start_time is None
+        assert user.status == 'online'
+    print("✅ current_user stays writable and never serves stale break fields")
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        user.department = 'HR'
+        db.session.commit()
+
+    statements.clear()
+    client.get('/dashboard/api/break-status')
+    assert len(user_loads()) == 1
+    with app.app_context():
+        assert user_cache.get_cache().get(user_id).department == 'HR'
+    print("✅ Profile changes evict the cached user")
+
+    with app.app_context():
+        cache = user_cache.get_cache()
+        cache.users[user_id] = (0, cache.users[user_id][1])
+    statements.clear()
+    client.get('/dashboard/api/break-status')
+    assert len(user_loads()) == 1
+    print("✅ Expired entries are reloaded")
+
+    with app.app_context():
+        bulk_delete.delete_user_data(user_id)
+        assert user_cache.get_cache().get(user_id) is None
+    assert client.get('/dashboard/api/break-status').status_code == 302
+    print("✅ Deleted users are logged out straight away")
+
+    with app.app_context():
+        db.drop_all()
+
+if __name__ == "__main__":
+    test_user_cache()
+    print("\n✅ User loader cache test completed!")
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Content-addressed attachment storage: streamed uploads, shared blobs and background thumbnails
+"""
+
+import hashlib
+import mimetypes
+import os
+import uuid
+from flask import current_app
+from app import db
+
+THUMBNAIL_SIZE = (320, 320)
+
+# Leading bytes of the raster formats served inline (WebP is checked separately)
+IMAGE_SIGNATURES = (
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif'),
+)
+
+class AttachmentTooLarge(ValueError):
+    """Upload exceeded ATTACHMENT_MAX_SIZE"""
+
+def get_storage_root():
+    """Attachment directory, outside static/ so every download is permission-checked"""
+    root = current_app.config.get('ATTACHMENT_FOLDER') or os.path.join(current_app.instance_path, 'attachments')
+    return os.path.abspath(root)
+
+def blob_path(sha256):
+    """Path of the blob holding the bytes for a content hash"""
+    return os.path.join(get_storage_root(), 'blobs', sha256[:2], sha256)
+
+def thumbnail_path(sha256):
+    """Path of the JPEG thumbnail for an image blob"""
+    return os.path.join(get_storage_root(), 'thumbnails', sha256[:2], f'{sha256}.jpg')
+
+def stream_to_temp_file(stream, max_size=None, chunk_size=None):
+    """Copy a stream to a temp file chunk by chunk while hashing it
+
+    Never holds more than one chunk in memory. Returns (temp_path, sha256, size);
+    raises AttachmentTooLarge (after removing the temp file) past max_size.
+    """
+    max_size = max_size or current_app.config.get('ATTACHMENT_MAX_SIZE') or current_app.config.get('MAX_CONTENT_LENGTH')
+    chunk_size = chunk_size or current_app.config.get('ATTACHMENT_CHUNK_SIZE', 64 * 1024)
+
+    temp_dir = os.path.join(get_storage_root(), 'tmp')
+    os.makedirs(temp_dir, exist_ok=True)
+    temp_path = os.path.join(temp_dir, uuid.uuid4().hex)
+
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, 'wb') as temp_file:
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if max_size and size > max_size:
+                    raise AttachmentTooLarge(f'Attachment exceeds {max_size} bytes')
+                digest.update(chunk)
+                temp_file.write(chunk)
+    except Exception:
+        os.remove(temp_path)
+        raise
+
+    return temp_path, digest.hexdigest(), size
+
+def detect_content_type(path, filename, claimed_type):
+    """Content type to store for a blob, judged by its bytes rather than the client's label
+
+    Raster images are recognised by their signature. Anything else keeps the
+    claimed (or filename-guessed) type unless that claims to be an image, so a
+    mislabelled or SVG upload can never be stored as one.
+    """
+    with open(path, 'rb') as blob:
+        head = blob.read(16)
+    for magic, content_type in IMAGE_SIGNATURES:
+        if head.startswith(magic):
+            return content_type
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+
+    if not claimed_type or claimed_type == 'application/octet-stream':
+        claimed_type = mimetypes.guess_type(filename)[0]
+    if not claimed_type or claimed_type.startswith('image/'):
+        return 'application/octet-stream'
+    return claimed_type.lower()
+
+def store_upload(stream, filename, content_type, user_id):
+    """Stream an upload into blob storage and record an Attachment for it
+
+    Identical content is stored once: if a blob with the same hash exists the
+    temp file is discarded and the new Attachment points at the existing blob.
+    """
+    from models.attachment import Attachment
+
+    temp_path, sha256, size = stream_to_temp_file(stream)
+
+    path = blob_path(sha256)
+    if os.path.exists(path):
+        os.remove(temp_path)
+    else:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(temp_path, path)
+
+    content_type = detect_content_type(path, filename, content_type)
+
+    # Thumbnails are per blob, so a duplicate image reuses the existing one
+    existing = Attachment.query.filter_by(sha256=sha256).first()
+
+    attachment = Attachment(
+        sha256=sha256,
+        filename=filename,
+        content_type=content_type,
+        size=size,
+        uploaded_by=user_id,
+        thumbnail_ready=bool(existing and existing.thumbnail_ready)
+    )
+    db.session.add(attachment)
+    db.session.commit()
+
+    if attachment.is_image and not attachment.thumbnail_ready:
+        from utils.background_jobs import submit_job
+        submit_job('attachment_thumbnail', generate_thumbnail, sha256, user_id=user_id)
+
+    return attachment, existing is not None
+
+def generate_thumbnail(sha256):
+    """Render the thumbnail for an image blob and flag every attachment sharing it"""
+    from PIL import Image
+    from models.attachment import Attachment
+
+    path = thumbnail_path(sha256)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with Image.open(blob_path(sha256)) as image:
+            image.thumbnail(THUMBNAIL_SIZE)
+            temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+            image.convert('RGB').save(temp_path, 'JPEG', quality=80)
+            os.replace(temp_path, path)
+
+    updated = Attachment.query.filter_by(sha256=sha256).update(
+        {'thumbnail_ready': True}, synchronize_session=False
+    )
+    db.session.commit()
+    return {'sha256': sha256, 'attachments': updated}
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Lightweight background job runner for work that should not block a request
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from flask import current_app
+
+# Global executor, created lazily on first submit
+_executor = None
+_executor_lock = threading.Lock()
+
+# Job registry: job_id -> job info dict
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+# Finished jobs are kept this long so clients can poll for the result
+JOB_RETENTION_SECONDS = 3600
+
+def _get_executor():
+    """Create the shared thread pool on first use"""
+    global _executor
+
+    if _executor is not None:
+        return _executor
+
+    with _executor_lock:
+        if _executor is None:
+            max_workers = current_app.config.get('BACKGROUND_JOB_WORKERS', 2)
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='background-job')
+        return _executor
+
+def _prune_finished_jobs():
+    """Forget finished jobs older than the retention window"""
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    with _jobs_lock:
+        expired = [job_id for job_id, job in _jobs.items()
+                   if job['finished_at'] is not None and job['finished_ts'] < cutoff]
+        for job_id in expired:
+            del _jobs[job_id]
+
+def _run_job(app, job_id, func, args, kwargs):
+    """Run a job inside an app context and record its outcome"""
+    from app import db
+
+    with _jobs_lock:
+        _jobs[job_id]['status'] = 'running'
+        _jobs[job_id]['started_at'] = datetime.utcnow().isoformat()
+
+    with app.app_context():
+        try:
+            result = func(*args, **kwargs)
+            status, error = 'completed', None
+        except Exception as e:
+            db.session.rollback()
+            print(f"Background job {job_id} failed: {e}")
+            result, status, error = None, 'failed', str(e)
+        finally:
+            db.session.remove()
+
+    with _jobs_lock:
+        _jobs[job_id].update({
+            'status': status,
+            'result': result,
+            'error': error,
+            'finished_at': datetime.utcnow().isoformat(),
+            'finished_ts': time.time()
+        })
+
+def submit_job(name, func, *args, user_id=None, **kwargs):
+    """Run func(*args, **kwargs) on a worker thread; returns the job id"""
+    _prune_finished_jobs()
+
+    app = current_app._get_current_object()
+    job_id = uuid.uuid4().hex
+
+    with _jobs_lock:
+        _jobs[job_id] = {
+            'id': job_id,
+            'name': name,
+            'user_id': user_id,
+            'status': 'queued',
+            'result': None,
+            'error': None,
+            'created_at': datetime.utcnow().isoformat(),
+            'started_at': None,
+            'finished_at': None,
+            'finished_ts': None
+        }
+
+    _get_executor().submit(_run_job, app, job_id, func, args, kwargs)
+    return job_id
+
+def get_job(job_id):
+    """Get a copy of a job's status, or None if unknown"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+        if job is None:
+            return None
+        job = dict(job)
+
+    job.pop('finished_ts', None)
+    return job
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Break lifecycle: active breaks kept in memory and ended when their time is up
+
+start-break stores the break on the user row as before, and also registers
+it here: a dict of active breaks for /dashboard/api/break-status to answer
+from without touching the database, and a heap of break-end deadlines. A
+background thread sleeps until the earliest deadline and ends that break
+like /dashboard/api/end-break would: the user is set back online, an
+end_break Log row is written (with auto_ended), the presence registry is
+told (which updates the admin feed and department counters) and the user's
+open signal stream gets a break_ended event.
+
+An automatic end doesn't touch last_activity: the user may have left their
+desk, so presence derives their status from the last real activity.
+
+Ending is conditional on the stored break_start_time, so a break ended by
+hand, or by another worker's scheduler, is never ended twice. Active breaks
+are loaded from the users table when the scheduler is created. The table
+is per process, so get_break reconciles it with the user's row: the one the
+request already loaded (current_user) when the caller passes it, otherwise
+the row is read whenever the table has no break for the user, since they
+may have started one on another worker.
+"""
+
+import heapq
+import threading
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+from utils import presence
+from utils.extensions import app_singleton
+
+class BreakScheduler:
+    """Active breaks by user plus a heap of (ends_at, user_id, started_at)"""
+
+    def __init__(self, app):
+        self.app = app
+        self.auto_end = app.config.get('BREAK_AUTO_END', True)
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.breaks = {}  # user_id -> {'start', 'duration', 'reason', 'ends_at'}
+        self.deadlines = []
+        self.stats = {'started': 0, 'ended': 0, 'auto_ended': 0}
+        self.thread = None
+
+    def load(self):
+        """Register the breaks already running according to the users table"""
+        from models.user import User
+
+        rows = db.session.query(
+            User.id, User.break_start_time, User.break_duration, User.break_reason
+        ).filter(User.break_start_time.isnot(None), User.status == 'break').all()
+        for row in rows:
+            self.started(row.id, row.break_start_time, row.break_duration, row.break_reason)
+
+    def started(self, user_id, start, duration, reason=None):
+        """Track a break that was written to the database"""
+        ends_at = start + timedelta(minutes=duration) if duration else None
+        with self.lock:
+            known = self.breaks.get(user_id)
+            if known is not None and known['start'] == start:
+                return
+            self.breaks[user_id] = {'start': start, 'duration': duration, 'reason': reason, 'ends_at': ends_at}
+            self.stats['started'] += 1
+            if ends_at is not None and self.auto_end:
+                if not self.deadlines or ends_at < self.deadlines[0][0]:
+                    self.wakeup.set()
+                heapq.heappush(self.deadlines, (ends_at, user_id, start))
+        if ends_at is not None and self.auto_end:
+            self._ensure_thread()
+
+    def ended(self, user_id, auto_ended=False):
+        """Forget a break that was ended; its heap entry is skipped when it comes up"""
+        with self.lock:
+            if self.breaks.pop(user_id, None) is not None:
+                self.stats['ended'] += 1
+            if auto_ended:
+                self.stats['auto_ended'] += 1
+
+    def reconcile(self, user_id, row):
+        """Follow a break started or ended on another worker, given the user's row"""
+        if row is not None and row.break_start_time is not None and row.status == 'break':
+            self.started(user_id, row.break_start_time, row.break_duration, row.break_reason)
+        elif user_id in self.breaks:
+            self.ended(user_id)
+
+    def refresh(self, user_id):
+        """Reconcile with the user's row read from the users table"""
+        from models.user import User
+
+        row = db.session.query(
+            User.break_start_time, User.break_duration, User.break_reason, User.status
+        ).filter(User.id == user_id).first()
+        self.reconcile(user_id, row)
+
+    def get(self, user_id, now=None):
+        """The user's active break with seconds remaining (None without a limit), or None"""
+        now = now or datetime.utcnow()
+        if self.deadlines and self.deadlines[0][0] <= now:
+            self.run_due(now)
+        with self.lock:
+            active = self.breaks.get(user_id)
+            if active is None:
+                return None
+            active = dict(active)
+        if active['ends_at'] is not None:
+            active['remaining'] = max(0, int((active['ends_at'] - now).total_seconds()))
+        else:
+            active['remaining'] = None
+        return active
+
+    def run_due(self, now=None):
+        """End every break whose time is up; returns the user ids ended"""
+        now = now or datetime.utcnow()
+        due = []
+        with self.lock:
+            while self.deadlines and self.deadlines[0][0] <= now:
+                ends_at, user_id, start = heapq.heappop(self.deadlines)
+                active = self.breaks.get(user_id)
+                if active is not None and active['start'] == start:
+                    due.append((user_id, start, ends_at))
+
+        ended = []
+        for user_id, start, ends_at in due:
+            if end_break(user_id, start, ends_at, auto_ended=True):
+                ended.append(user_id)
+            else:
+                self.ended(user_id)  # Ended elsewhere meanwhile
+        return ended
+
+    def next_deadline(self):
+        with self.lock:
+            return self.deadlines[0][0] if self.deadlines else None
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['active'] = len(self.breaks)
+        return stats
+
+    def _ensure_thread(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='break-scheduler', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            deadline = self.next_deadline()
+            timeout = None if deadline is None else max((deadline - datetime.utcnow()).total_seconds(), 0)
+            self.wakeup.wait(timeout)
+            self.wakeup.clear()
+
+            with self.app.app_context():
+                try:
+                    self.run_due()
+                except Exception as e:
+                    print(f"Break auto-end failed: {e}")
+                finally:
+                    db.session.remove()
+
+def _create_scheduler(app):
+    scheduler = BreakScheduler(app)
+    scheduler.load()
+    return scheduler
+
+def get_scheduler():
+    """The break scheduler for the current app, loaded from the users table on first use"""
+    return app_singleton('break_scheduler', _create_scheduler)
+
+def end_break(user_id, started_at, ended_at, auto_ended=False, ip_address=None, user_agent=None):
+    """End a break if it is still the one started at started_at; returns whether it was ended
+
+    Sets the user back online, clears the break fields and writes the
+    end_break Log row in one transaction, then tells the scheduler,
+    presence and the user's open signal stream. A manual end counts as
+    activity at ended_at; an automatic one leaves last_activity alone.
+    """
+    from models.user import User
+    from models.log import Log
+    from utils import ephemeral_signals, user_cache
+
+    user = db.session.get(User, user_id)
+    if user is None or user.break_start_time != started_at:
+        return False
+
+    actual_duration = (ended_at - started_at).total_seconds() / 60
+    log = Log(
+        user_id=user_id,
+        action='end_break',
+        ip_address=ip_address,
+        user_agent=user_agent,
+        details={
+            'start_time': started_at.isoformat(),
+            'end_time': ended_at.isoformat(),
+            'planned_duration': user.break_duration or 0,
+            'actual_duration': round(actual_duration, 2),
+            'reason': user.break_reason or '',
+            'auto_ended': auto_ended
+        }
+    )
+    values = {
+        'status': 'online', 'current_status': 'online',
+        'break_start_time': None, 'break_duration': None, 'break_reason': None
+    }
+    if not auto_ended:
+        values['last_activity'] = ended_at
+
+    # Only the worker whose UPDATE still sees this break ends it; the
+    # savepoint undoes the log row without touching the caller's pending work
+    table = User.__table__
+    savepoint = db.session.begin_nested()
+    db.session.add(log)
+    result = db.session.execute(
+        table.update().where(table.c.id == user_id, table.c.break_start_time == started_at).values(**values)
+    )
+    if result.rowcount != 1:
+        savepoint.rollback()
+        return False
+    savepoint.commit()
+    user_cache.invalidate(user_id)
+    db.session.commit()
+    db.session.expire(user)
+
+    scheduler = current_app.extensions.get('break_scheduler')
+    if scheduler is not None:
+        scheduler.ended(user_id, auto_ended)
+    presence.set_status(user_id, 'online', None if auto_ended else ended_at)
+    ephemeral_signals.push([user_id], {
+        'type': 'break_ended',
+        'user_id': user_id,
+        'auto_ended': auto_ended,
+        'actual_duration': round(actual_duration, 2)
+    })
+    return True
+
+def get_break(user_id, user=None):
+    """The user's active break (see BreakScheduler.get), reconciled with their users row
+
+    Pass the already loaded user (e.g. current_user) to reconcile without a
+    query; otherwise the row is read only when the table has no break.
+    """
+    scheduler = get_scheduler()
+    if user is not None:
+        scheduler.reconcile(user_id, user)
+    elif user_id not in scheduler.breaks:
+        scheduler.refresh(user_id)
+    return scheduler.get(user_id)
+
+def get_stats():
+    """Started/ended counters of the scheduler"""
+    return get_scheduler().get_stats()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Set-based, chunked deletion of conversations, groups and user data
+"""
+
+from flask import current_app
+from app import db
+
+def get_chunk_size():
+    """Rows deleted per statement/transaction"""
+    return current_app.config.get('BULK_DELETE_CHUNK_SIZE', 1000)
+
+def should_run_in_background(row_count, force=False):
+    """Large deletes (or force, e.g. from ?background=true) run as a background job"""
+    if force:
+        return True
+    return row_count >= current_app.config.get('BULK_DELETE_BACKGROUND_THRESHOLD', 10000)
+
+def delete_in_chunks(model, *criteria, chunk_size=None):
+    """Delete rows matching criteria with DELETE ... WHERE id IN (...) batches
+
+    Each chunk commits on its own so a very large delete never holds the
+    SQLite write lock for long or loads rows into the session.
+    Returns the number of rows deleted.
+    """
+    chunk_size = chunk_size or get_chunk_size()
+    total_deleted = 0
+
+    while True:
+        ids = [row[0] for row in db.session.query(model.id).filter(*criteria).limit(chunk_size).all()]
+        if not ids:
+            break
+
+        total_deleted += model.query.filter(model.id.in_(ids)).delete(synchronize_session=False)
+        db.session.commit()
+
+        if len(ids) < chunk_size:
+            break
+
+    return total_deleted
+
+def conversation_criteria(user_id, other_user_id):
+    """Filter for all direct messages between two users"""
+    from models.message import Message
+
+    return (
+        ((Message.sender_id == user_id) & (Message.recipient_id == other_user_id)) |
+        ((Message.sender_id == other_user_id) & (Message.recipient_id == user_id))
+    )
+
+def count_conversation_messages(user_id, other_user_id):
+    """Count direct messages between two users"""
+    from models.message import Message
+
+    return db.session.query(db.func.count(Message.id)).filter(
+        conversation_criteria(user_id, other_user_id)
+    ).scalar()
+
+def count_group_messages(group_id):
+    """Count messages in a group"""
+    from models.message import Message
+
+    return db.session.query(db.func.count(Message.id)).filter(
+        Message.group_id == group_id
+    ).scalar()
+
+def delete_conversation(user_id, other_user_id):
+    """Delete an entire direct conversation; returns deleted row counts"""
+    from models.message import Message
+    from models.unread_counter import UnreadCounter
+    from models.conversation_watermark import ConversationWatermark
+    from utils.message_archive import delete_archived_conversation
+    from utils import conversation_cache
+
+    deleted_messages = delete_in_chunks(Message, conversation_criteria(user_id, other_user_id))
+    deleted_messages += delete_archived_conversation(user_id, other_user_id)
+
+    UnreadCounter.delete_conversation('direct', other_user_id, user_id=user_id)
+    ConversationWatermark.delete_conversation(user_id, other_user_id)
+    conversation_cache.conversation_removed(user_id, other_user_id)
+    db.session.commit()
+
+    return {'messages': deleted_messages}
+
+def delete_group(group_id):
+    """Delete a group with its messages, memberships and read cursors"""
+    from models.message import Message
+    from models.group import Group, group_members
+    from models.group_read_state import GroupReadState
+    from utils.message_archive import delete_archived_group
+    from utils import conversation_cache
+
+    deleted_messages = delete_in_chunks(Message, Message.group_id == group_id)
+    deleted_messages += delete_archived_group(group_id)
+
+    GroupReadState.delete_group(group_id)
+    deleted_members = db.session.execute(
+        group_members.delete().where(group_members.c.group_id == group_id)
+    ).rowcount
+    deleted_groups = Group.query.filter_by(id=group_id).delete(synchronize_session=False)
+    conversation_cache.group_removed(group_id)
+    db.session.commit()
+
+    return {
+        'messages': deleted_messages,
+        'members': deleted_members,
+        'groups': deleted_groups
+    }
+
+def delete_user_data(user_id):
+    """Delete a user and everything that references them; returns deleted row counts"""
+    from models.user import User
+    from models.log import Log
+    from models.notification import Notification
+    from models.message import Message
+    from models.face_encoding import FaceEncoding
+    from models.group import group_members
+    from models.unread_counter import UnreadCounter
+    from models.group_read_state import GroupReadState
+    from models.conversation_watermark import ConversationWatermark
+    from utils.message_archive import delete_archived_user
+    from utils import conversation_cache, department_stats, user_cache
+
+    counts = {
+        'logs': delete_in_chunks(Log, Log.user_id == user_id),
+        'notifications': delete_in_chunks(Notification, Notification.user_id == user_id),
+        'messages': delete_in_chunks(
+            Message, (Message.sender_id == user_id) | (Message.recipient_id == user_id)
+        ) + delete_archived_user(user_id),
+        'face_encodings': delete_in_chunks(FaceEncoding, FaceEncoding.user_id == user_id)
+    }
+
+    UnreadCounter.query.filter(
+        (UnreadCounter.user_id == user_id) |
+        ((UnreadCounter.chat_type == 'direct') & (UnreadCounter.conversation_id == user_id))
+    ).delete(synchronize_session=False)
+    GroupReadState.query.filter_by(user_id=user_id).delete(synchronize_session=False)
+    ConversationWatermark.delete_user(user_id)
+    counts['group_memberships'] = db.session.execute(
+        group_members.delete().where(group_members.c.user_id == user_id)
+    ).rowcount
+    counts['users'] = User.query.filter_by(id=user_id).delete(synchronize_session=False)
+    conversation_cache.user_removed(user_id)
+    department_stats.user_removed(user_id)
+    user_cache.invalidate(user_id)
+    db.session.commit()
+
+    return counts
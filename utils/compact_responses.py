@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Smaller message and conversation responses: columnar JSON and gzip/br encoding
+
+?format=columnar turns a list of records into one array per field, with
+sender/recipient/group names moved into id -> name tables and timestamps
+as epoch milliseconds, so long histories stop repeating keys, names and ISO
+strings on every message. Independently, @compressible encodes JSON
+responses with brotli (when the optional brotli package is installed) or
+gzip, whichever the client's Accept-Encoding prefers.
+"""
+
+import gzip
+from datetime import datetime, timezone
+from functools import wraps
+from flask import current_app, make_response, request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Name fields moved into lookup tables: field -> (table, id field)
+NAME_FIELDS = {
+    'sender_name': ('users', 'sender_id'),
+    'recipient_name': ('users', 'recipient_id'),
+    'group_name': ('groups', 'group_id')
+}
+
+TIMESTAMP_FIELDS = {'timestamp'}
+
+def wants_columnar():
+    """Whether the client asked for ?format=columnar"""
+    return request.args.get('format') == 'columnar'
+
+def _epoch_ms(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)  # Stored timestamps are naive UTC
+        return int(value.timestamp() * 1000)
+    return value
+
+def columnar(records):
+    """{'count', 'columns': {field: [values]}, 'users': {id: name}, 'groups': {id: name}}
+
+    Fields missing from a record (e.g. group_id on a direct message) are null.
+    """
+    fields = []
+    for record in records:
+        for field in record:
+            if field not in NAME_FIELDS and field not in fields:
+                fields.append(field)
+
+    columns = {}
+    for field in fields:
+        values = [record.get(field) for record in records]
+        if field in TIMESTAMP_FIELDS:
+            values = [_epoch_ms(value) for value in values]
+        columns[field] = values
+
+    result = {'count': len(records), 'columns': columns}
+    for name_field, (table, id_field) in NAME_FIELDS.items():
+        for record in records:
+            if name_field in record and record.get(id_field) is not None:
+                result.setdefault(table, {})[str(record[id_field])] = record[name_field]
+    return result
+
+def records_payload(key, records):
+    """{key: records}, or the columnar form plus 'format' when requested"""
+    if wants_columnar():
+        return {'format': 'columnar', key: columnar(records)}
+    return {key: records}
+
+def choose_encoding():
+    """Best encoding the client accepts: br (if available) or gzip, else None"""
+    accepted = request.accept_encodings
+    candidates = (['br'] if brotli else []) + ['gzip']
+    best = max(candidates, key=lambda encoding: accepted.quality(encoding))
+    return best if accepted.quality(best) > 0 else None
+
+def compress_response(response):
+    """Encode a successful JSON response past RESPONSE_COMPRESSION_MIN_SIZE"""
+    if not current_app.config.get('RESPONSE_COMPRESSION', True):
+        return response
+    if (response.direct_passthrough or not 200 <= response.status_code < 300 or
+            'Content-Encoding' in response.headers or not response.is_json):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < current_app.config.get('RESPONSE_COMPRESSION_MIN_SIZE', 1024):
+        return response
+
+    encoding = choose_encoding()
+    if encoding == 'br':
+        response.set_data(brotli.compress(data))
+    elif encoding == 'gzip':
+        response.set_data(gzip.compress(data, compresslevel=6, mtime=0))
+    else:
+        return response
+
+    response.headers['Content-Encoding'] = encoding
+    return response
+
+def compressible(view):
+    """Decorator compressing a view's JSON response"""
+    @wraps(view)
+    def decorated_function(*args, **kwargs):
+        return compress_response(make_response(view(*args, **kwargs)))
+    return decorated_function
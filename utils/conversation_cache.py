@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Per-user conversation list cache kept current by message events
+
+/api/conversations used to aggregate every conversation of the user on each
+poll. The cache keeps each user's list (last message, timestamp, unread
+count) in an LRU bounded by CONVERSATION_CACHE_SIZE users and patches it in
+place when messages are sent, read or deleted, so a poll is a dictionary
+read. A user who isn't cached falls back to the aggregate query.
+
+Events are queued on the database session and only applied once that
+session commits, so a rolled back send never shows up in anyone's list.
+Entries whose new state can't be derived from the event alone (a deleted
+last message, a brand new conversation) are marked stale and reloaded
+individually on the next read. The cache is process-local (one per app in
+app.extensions); run one worker or disable it when scaling out.
+"""
+
+import threading
+from collections import OrderedDict
+from flask import current_app
+from app import db
+from utils import session_events
+from utils.extensions import app_singleton
+
+_EVENTS_KEY = 'conversation_cache_events'
+
+class ConversationCache:
+    """LRU of user_id -> {(chat_type, conversation_id): entry, or None when stale}"""
+
+    def __init__(self, max_users):
+        self.max_users = max_users
+        self.users = OrderedDict()
+        self.loading = {}
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'refreshes': 0, 'evictions': 0, 'updates': 0}
+
+    def get(self, user_id):
+        """Copy of a cached user's entries (None for stale ones), or None on a miss"""
+        with self.lock:
+            conversations = self.users.get(user_id)
+            if conversations is None:
+                self.stats['misses'] += 1
+                return None
+            self.users.move_to_end(user_id)
+            self.stats['hits'] += 1
+            return {key: dict(entry) if entry else None for key, entry in conversations.items()}
+
+    def begin_load(self, user_id):
+        """Token for a load from the database; an event for the user meanwhile voids it"""
+        token = object()
+        with self.lock:
+            self.loading[user_id] = token
+        return token
+
+    def finish_load(self, user_id, token, conversations):
+        """Store loaded entries unless an event overtook the load; returns whether they were stored"""
+        with self.lock:
+            if self.loading.get(user_id) is not token:
+                return False
+            del self.loading[user_id]
+
+            if conversations is None:
+                return True
+            if isinstance(conversations, list):
+                self.users[user_id] = {(entry['type'], entry['id']): dict(entry) for entry in conversations}
+            elif user_id in self.users:
+                # Refreshed stale entries; None means the conversation is gone
+                self.stats['refreshes'] += len(conversations)
+                for key, entry in conversations.items():
+                    if entry is None:
+                        self.users[user_id].pop(key, None)
+                    else:
+                        self.users[user_id][key] = dict(entry)
+            else:
+                return False
+
+            self.users.move_to_end(user_id)
+            while len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+                self.stats['evictions'] += 1
+            return True
+
+    def cancel_load(self, user_id, token):
+        """Forget a load that failed"""
+        with self.lock:
+            if self.loading.get(user_id) is token:
+                del self.loading[user_id]
+
+    def _touch(self, user_id):
+        """Void loads in flight for a user; returns their cached entries, if any"""
+        self.loading.pop(user_id, None)
+        return self.users.get(user_id)
+
+    def apply(self, events):
+        """Apply committed events"""
+        with self.lock:
+            for name, args in events:
+                getattr(self, f'_on_{name}')(*args)
+                self.stats['updates'] += 1
+
+    def _on_direct_message(self, sender_id, recipient_id, content, timestamp):
+        for user_id, other_id, unread in ((sender_id, recipient_id, 0), (recipient_id, sender_id, 1)):
+            conversations = self._touch(user_id)
+            if conversations is None:
+                continue
+            entry = conversations.get(('direct', other_id))
+            if entry is None:
+                conversations[('direct', other_id)] = None
+                continue
+            entry['last_message'] = content
+            entry['timestamp'] = timestamp
+            entry['unread_count'] += unread
+
+    def _on_group_message(self, sender_id, group_id, content, timestamp):
+        self.loading.clear()
+        for user_id, conversations in self.users.items():
+            entry = conversations.get(('group', group_id))
+            if entry is None:
+                continue
+            entry['last_message'] = content
+            entry['timestamp'] = timestamp
+            entry['unread_count'] = 0 if user_id == sender_id else entry['unread_count'] + 1
+
+    def _on_read(self, user_id, chat_type, conversation_id):
+        conversations = self._touch(user_id)
+        entry = conversations.get((chat_type, conversation_id)) if conversations else None
+        if entry is not None:
+            entry['unread_count'] = 0
+
+    def _on_stale(self, user_ids, chat_type, conversation_id):
+        for user_id in user_ids:
+            conversations = self._touch(user_id)
+            if conversations is not None and (chat_type, conversation_id) in conversations:
+                conversations[(chat_type, conversation_id)] = None
+
+    def _on_conversation_removed(self, user_id, other_user_id):
+        for owner, other in ((user_id, other_user_id), (other_user_id, user_id)):
+            conversations = self._touch(owner)
+            if conversations is not None:
+                conversations.pop(('direct', other), None)
+
+    def _on_group_removed(self, group_id):
+        self.loading.clear()
+        for conversations in self.users.values():
+            conversations.pop(('group', group_id), None)
+
+    def _on_user_removed(self, user_id):
+        self.loading.clear()
+        self.users.pop(user_id, None)
+        for conversations in self.users.values():
+            conversations.pop(('direct', user_id), None)
+
+    def _on_invalidate_user(self, user_id):
+        self.loading.pop(user_id, None)
+        self.users.pop(user_id, None)
+
+    def _on_clear(self):
+        self.loading.clear()
+        self.users.clear()
+
+    def get_stats(self):
+        """Hit/miss counters and hit rate"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['users'] = len(self.users)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        return stats
+
+def get_cache():
+    """The cache for the current app, or None when CONVERSATION_CACHE_SIZE is 0"""
+    size = current_app.config.get('CONVERSATION_CACHE_SIZE', 1000)
+    if not size:
+        return None
+    return app_singleton('conversation_cache', lambda app: ConversationCache(size))
+
+def get_user_conversations(user_id):
+    """A user's conversation list from the cache, loading what is missing or stale"""
+    from models.message import Message
+
+    cache = get_cache()
+    if cache is None:
+        return Message.get_user_conversations(user_id)
+
+    cached = cache.get(user_id)
+    if cached is None:
+        token = cache.begin_load(user_id)
+        try:
+            conversations = Message.get_user_conversations(user_id)
+        except Exception:
+            cache.cancel_load(user_id, token)
+            raise
+        cache.finish_load(user_id, token, conversations)
+        return conversations
+
+    stale = [key for key, entry in cached.items() if entry is None]
+    if stale:
+        token = cache.begin_load(user_id)
+        try:
+            refreshed = {key: Message.get_conversation_summary(user_id, *key) for key in stale}
+        except Exception:
+            cache.cancel_load(user_id, token)
+            raise
+        cache.finish_load(user_id, token, refreshed)
+        cached.update(refreshed)
+
+    conversations = [entry for entry in cached.values() if entry is not None]
+    conversations.sort(key=lambda x: x['timestamp'], reverse=True)
+    return conversations
+
+def get_stats():
+    """Stats of the current app's cache, or None when it is disabled"""
+    cache = get_cache()
+    return cache.get_stats() if cache else None
+
+def _queue(name, *args):
+    """Apply an event to the cache once the current transaction commits"""
+    session_events.queue(_EVENTS_KEY, (name, args))
+
+def message_sent(message):
+    """A direct or group message was staged"""
+    if message.chat_type == 'group':
+        _queue('group_message', message.sender_id, message.group_id, message.content, message.timestamp)
+    else:
+        _queue('direct_message', message.sender_id, message.recipient_id, message.content, message.timestamp)
+
+def conversation_read(user_id, chat_type, conversation_id):
+    """A user caught up on a conversation"""
+    _queue('read', user_id, chat_type, conversation_id)
+
+def message_deleted(message):
+    """A single message was deleted; its conversation may have a new last message"""
+    if message.chat_type == 'group':
+        _queue('stale', _group_member_ids(message.group_id), 'group', message.group_id)
+    else:
+        _queue('stale', [message.recipient_id], 'direct', message.sender_id)
+        _queue('stale', [message.sender_id], 'direct', message.recipient_id)
+
+def conversation_removed(user_id, other_user_id):
+    """A direct conversation was deleted"""
+    _queue('conversation_removed', user_id, other_user_id)
+
+def group_removed(group_id):
+    """A group was deleted or deactivated"""
+    _queue('group_removed', group_id)
+
+def user_removed(user_id):
+    """A user and their conversations were deleted"""
+    _queue('user_removed', user_id)
+
+def invalidate_user(user_id):
+    """Drop a user's cached list, e.g. after they joined or left a group"""
+    _queue('invalidate_user', user_id)
+
+def clear():
+    """Drop every cached list, e.g. after counters were rebuilt"""
+    _queue('clear')
+
+def _group_member_ids(group_id):
+    from models.group import group_members
+
+    return [row[0] for row in db.session.query(group_members.c.user_id).filter(
+        group_members.c.group_id == group_id
+    )]
+
+def _apply_committed(events):
+    cache = current_app.extensions.get('conversation_cache')
+    if cache is not None:
+        cache.apply(events)
+
+session_events.on_commit(_EVENTS_KEY, _apply_committed)
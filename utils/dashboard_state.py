@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Everything the user dashboard shows, in one response
+
+The dashboard used to fetch its break status, unread message counts,
+unread notifications, team status counts and activity chart separately on
+load, then poll several of them on their own timers. /dashboard/api/bootstrap
+returns all of it at once and /dashboard/api/tick only the sections that
+changed since the version the client sends back.
+
+Break status comes from memory (the break scheduler). Team counts are
+computed like /api/dashboard/stats, admins included: one count plus the
+rows of recently active users. The three unread counts are read with one
+statement of scalar subqueries, and the activity chart (bootstrap only)
+with one more.
+A version is the CRC of each tick section's JSON, so a tick costs the
+same reads but sends nothing for the sections the client already has.
+"""
+
+import json
+import zlib
+from datetime import date, datetime, timedelta
+from app import db
+from utils import break_scheduler
+
+TICK_SECTIONS = ('break', 'unread', 'notifications', 'stats')
+
+def get_break_section(user_id, user=None):
+    """Break status like /dashboard/api/break-status, without the changing remainingSeconds"""
+    active = break_scheduler.get_break(user_id, user)
+    if active is None:
+        return {'isOnBreak': False}
+    return {
+        'isOnBreak': True,
+        'breakStartTime': active['start'].isoformat(),
+        'plannedDuration': active['duration'] or 0,
+        'reason': active['reason'] or '',
+        'breakEndTime': active['ends_at'].isoformat() if active['ends_at'] else None
+    }
+
+def get_unread_counts(user_id):
+    """(direct messages, group messages, notifications) unread, in one statement"""
+    from models.message import Message
+    from models.notification import Notification
+    from models.unread_counter import UnreadCounter
+    from models.group_read_state import GroupReadState
+    from models.group import Group, group_members
+
+    direct = db.select(db.func.coalesce(db.func.sum(UnreadCounter.count), 0)).where(
+        (UnreadCounter.user_id == user_id) & (UnreadCounter.chat_type == 'direct')
+    ).scalar_subquery()
+
+    cursor = db.func.coalesce(GroupReadState.last_read_message_id, 0)
+    group = db.select(db.func.count(Message.id)).select_from(group_members).join(
+        Group, Group.id == group_members.c.group_id
+    ).outerjoin(
+        GroupReadState,
+        (GroupReadState.group_id == group_members.c.group_id) &
+        (GroupReadState.user_id == group_members.c.user_id)
+    ).join(
+        Message,
+        (Message.group_id == group_members.c.group_id) & (Message.id > cursor)
+    ).where(
+        (group_members.c.user_id == user_id) & (Group.is_active == True)
+    ).scalar_subquery()
+
+    notifications = db.select(db.func.count(Notification.id)).where(
+        (Notification.user_id == user_id) & (Notification.is_read == False)
+    ).scalar_subquery()
+
+    row = db.session.execute(db.select(direct, group, notifications)).one()
+    return int(row[0]), int(row[1]), int(row[2])
+
+def get_stats_section():
+    """Team status counts like /api/dashboard/stats (admins included)"""
+    from models.user import User
+
+    counts = User.get_status_counts()
+    return {
+        'online_users': counts['online'],
+        'break_users': counts['break'],
+        'offline_users': counts['offline'],
+        'total_users': counts['total']
+    }
+
+def get_activity_data(user_id, days=7):
+    """[{'date', 'hours'}] of logged-in time per day, oldest first"""
+    from models.log import Log
+
+    end_date = date.today()
+    start_date = end_date - timedelta(days=days)
+
+    logs = db.session.query(Log.action, Log.timestamp).filter(
+        Log.user_id == user_id,
+        Log.action.in_(['login', 'logout']),
+        Log.timestamp >= start_date
+    ).order_by(Log.timestamp).all()
+
+    # Calculate daily work hours
+    daily_hours = {}
+    login_time = None
+
+    for action, timestamp in logs:
+        log_date = timestamp.date()
+        if log_date not in daily_hours:
+            daily_hours[log_date] = 0
+
+        if action == 'login':
+            login_time = timestamp
+        elif action == 'logout' and login_time:
+            hours = (timestamp - login_time).total_seconds() / 3600
+            daily_hours[log_date] += hours
+            login_time = None
+
+    # If still logged in today
+    if login_time and login_time.date() == date.today():
+        hours = (datetime.utcnow() - login_time).total_seconds() / 3600
+        daily_hours[date.today()] = daily_hours.get(date.today(), 0) + hours
+
+    chart_data = []
+    for i in range(days):
+        chart_date = end_date - timedelta(days=i)
+        chart_data.append({
+            'date': chart_date.strftime('%Y-%m-%d'),
+            'hours': round(daily_hours.get(chart_date, 0), 2)
+        })
+
+    chart_data.reverse()
+    return chart_data
+
+def get_sections(user_id, user=None):
+    """The tick sections for a user (user: their loaded row, see break_scheduler.get_break)"""
+    unread_direct, unread_group, unread_notifications = get_unread_counts(user_id)
+    return {
+        'break': get_break_section(user_id, user),
+        'unread': {
+            'unread_direct': unread_direct,
+            'unread_group': unread_group,
+            'total_unread': unread_direct + unread_group
+        },
+        'notifications': {'unread_count': unread_notifications},
+        'stats': get_stats_section()
+    }
+
+def _checksum(section):
+    return zlib.crc32(json.dumps(section, sort_keys=True).encode('utf-8'))
+
+def get_version(sections):
+    """Opaque version string: one checksum per tick section"""
+    return '.'.join(f'{_checksum(sections[name]):08x}' for name in TICK_SECTIONS)
+
+def changed_sections(sections, version):
+    """Names of the sections that differ from the client's version (all for an unknown one)"""
+    known = (version or '').split('.')
+    if len(known) != len(TICK_SECTIONS):
+        return list(TICK_SECTIONS)
+    current = get_version(sections).split('.')
+    return [name for name, old, new in zip(TICK_SECTIONS, known, current) if old != new]
@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+"""
+Per-department status counters maintained incrementally
+
+The admin dashboard's department panels used to be recounted from the full
+user list on every request, for a hard-coded list of departments. This
+module keeps a (department, status) -> count table plus each employee's
+current (department, status), so serving the panels costs
+O(departments) whatever the headcount:
+
+- presence transitions (login, logout, breaks, heartbeats and the idle
+  sweeper) move an employee between status buckets directly;
+- inserts, deletes and department/status updates of users mark the user
+  for a refresh once the session commits, and the next read reloads just
+  those users with one query;
+- every DEPARTMENT_STATS_RECONCILE_INTERVAL seconds a read rebuilds the
+  table from the users table and records any drift it corrected.
+
+Admins are not employees and are left out, like in the status snapshot.
+The counters are process-local, like the presence registry feeding them.
+"""
+
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+from app import db
+from utils import presence, session_events
+from utils.extensions import app_singleton
+
+DEFAULT_DEPARTMENTS = ['ENGINEERING', 'MARKETING', 'SALES', 'HR', 'FINANCE']
+DEFAULT_DEPARTMENT = 'GENERAL'  # users.department's column default
+STATUSES = ('online', 'break', 'offline')
+
+_EVENTS_KEY = 'department_stats_dirty'
+
+class DepartmentStats:
+    """(department, status) counters plus each employee's current bucket"""
+
+    def __init__(self, reconcile_interval):
+        self.reconcile_interval = reconcile_interval
+        self.lock = threading.Lock()
+        self.counts = {}  # department -> Counter of status
+        self.members = {}  # user_id -> (department, status)
+        self.dirty = set()  # Users to reload before the next read
+        self.outsiders = set()  # Admins and deleted users seen in transitions
+        self.reconciled_at = None
+        self.stats = {'transitions': 0, 'refreshes': 0, 'reconciliations': 0, 'drift': 0}
+
+    def _place(self, user_id, department, status):
+        """Move a user to a bucket (None removes them); lock held"""
+        previous = self.members.pop(user_id, None)
+        if previous is not None:
+            self.counts[previous[0]][previous[1]] -= 1
+        if department is not None:
+            self.members[user_id] = (department, status)
+            self.counts.setdefault(department, Counter())[status] += 1
+
+    def on_transitions(self, transitions):
+        """Presence listener: apply status changes of known employees"""
+        with self.lock:
+            for user_id, _, status in transitions:
+                member = self.members.get(user_id)
+                if member is None:
+                    if self.reconciled_at is not None and user_id not in self.outsiders:
+                        self.dirty.add(user_id)  # Not loaded yet (or an admin); the refresh sorts it out
+                    continue
+                if member[1] != status:
+                    self._place(user_id, member[0], status)
+                    self.stats['transitions'] += 1
+
+    def mark_dirty(self, user_ids):
+        """Reload these users before the next read"""
+        with self.lock:
+            self.dirty.update(user_ids)
+            self.outsiders.difference_update(user_ids)
+
+    def _load(self, user_ids=None):
+        """(user_id, department, status) for employees, all or some"""
+        from models.user import User
+
+        registry = presence.get_registry()
+        break_after, offline_after = presence.get_thresholds()
+        now = datetime.utcnow()
+
+        query = db.session.query(User.id, User.department, User.last_activity, User.current_status).filter(
+            User.is_admin == False
+        )
+        if user_ids is not None:
+            query = query.filter(User.id.in_(user_ids))
+
+        rows = []
+        for row in query:
+            status = registry.current(row.id) if registry else None
+            if status is None:
+                status = presence.derive_status(row.last_activity, row.current_status, now, break_after, offline_after)
+                if registry is not None and status != 'offline':
+                    # Let the sweeper time this user out like any other
+                    registry.observe(row.id, row.last_activity, row.current_status)
+            rows.append((row.id, row.department or DEFAULT_DEPARTMENT, status))
+        return rows
+
+    def refresh(self):
+        """Reload dirty users, or everything when a reconciliation is due"""
+        due = (self.reconciled_at is None or
+               time.monotonic() - self.reconciled_at >= self.reconcile_interval)
+        if due:
+            self.reconcile()
+            return
+
+        with self.lock:
+            dirty, self.dirty = self.dirty, set()
+        if not dirty:
+            return
+
+        dirty = list(dirty)
+        loaded = {}
+        for start in range(0, len(dirty), 500):
+            for user_id, department, status in self._load(dirty[start:start + 500]):
+                loaded[user_id] = (department, status)
+
+        with self.lock:
+            for user_id in dirty:
+                department, status = loaded.get(user_id, (None, None))
+                self._place(user_id, department, status)
+                if department is None:
+                    self.outsiders.add(user_id)
+            self.stats['refreshes'] += len(dirty)
+
+    def reconcile(self):
+        """Rebuild the counters from the users table; returns the number of corrected buckets"""
+        with self.lock:
+            self.dirty.clear()
+            self.outsiders.clear()
+        rows = self._load()
+
+        counts = {}
+        members = {}
+        for user_id, department, status in rows:
+            members[user_id] = (department, status)
+            counts.setdefault(department, Counter())[status] += 1
+
+        with self.lock:
+            drift = 0
+            if self.reconciled_at is not None:
+                for department in counts.keys() | self.counts.keys():
+                    for status in STATUSES:
+                        if counts.get(department, Counter())[status] != self.counts.get(department, Counter())[status]:
+                            drift += 1
+            self.counts = counts
+            self.members = members
+            self.reconciled_at = time.monotonic()
+            self.stats['reconciliations'] += 1
+            self.stats['drift'] += drift
+
+        if drift:
+            print(f"Department stats reconciliation corrected {drift} counters")
+        return drift
+
+    def get(self):
+        """{department: {'total', 'online', 'break', 'offline'}}, default departments always present"""
+        self.refresh()
+        with self.lock:
+            result = {}
+            for department in DEFAULT_DEPARTMENTS + sorted(set(self.counts) - set(DEFAULT_DEPARTMENTS)):
+                counter = self.counts.get(department, Counter())
+                result[department] = {status: counter[status] for status in STATUSES}
+                result[department]['total'] = sum(result[department].values())
+            return {department: stats for department, stats in result.items()
+                    if stats['total'] or department in DEFAULT_DEPARTMENTS}
+
+    def get_members(self):
+        """{user_id: (department, status)} for every employee"""
+        self.refresh()
+        with self.lock:
+            return dict(self.members)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats['employees'] = len(self.members)
+            stats['pending'] = len(self.dirty)
+        return stats
+
+def _create_tracker(app):
+    tracker = DepartmentStats(app.config.get('DEPARTMENT_STATS_RECONCILE_INTERVAL', 300))
+    presence.on_transition(tracker.on_transitions)
+    return tracker
+
+def get_tracker():
+    """The department counters for the current app"""
+    return app_singleton('department_stats', _create_tracker)
+
+def get_department_stats():
+    """Current per-department counts"""
+    return get_tracker().get()
+
+def get_departments():
+    """Departments to show: the defaults plus any that have employees"""
+    return list(get_department_stats())
+
+def reconcile():
+    """Rebuild the counters now"""
+    return get_tracker().reconcile()
+
+def get_stats():
+    """Transition/refresh/drift counters of the tracker"""
+    return get_tracker().get_stats()
+
+def user_removed(user_id):
+    """A user was deleted outside the ORM (see bulk_delete)"""
+    session_events.queue(_EVENTS_KEY, user_id)
+
+def _queue_user(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session_events.queue(_EVENTS_KEY, target.id, session)
+
+def _queue_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in ('department', 'current_status', 'is_admin')):
+        _queue_user(mapper, connection, target)
+
+def _mark_committed(user_ids):
+    tracker = current_app.extensions.get('department_stats')
+    if tracker is not None:
+        tracker.mark_dirty(set(user_ids))
+
+def _register_listeners():
+    from models.user import User
+
+    event.listen(User, 'after_insert', _queue_user)
+    event.listen(User, 'after_update', _queue_update)
+    event.listen(User, 'after_delete', _queue_user)
+    session_events.on_commit(_EVENTS_KEY, _mark_committed)
+
+_register_listeners()
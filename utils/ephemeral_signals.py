@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Memory-only typing and "viewing conversation" signals pushed over Server-Sent Events
+
+These events are frequent and worthless a few seconds later, so they never
+touch the database: each signal lives in the app's in-memory registry
+(app.extensions) until its TTL runs out and is fanned out to the
+recipients' open event streams.
+"""
+
+import json
+import queue
+import threading
+import time
+from utils.extensions import app_singleton
+
+SIGNAL_TTLS = {
+    'typing': 6,  # Clients re-send while the user keeps typing
+    'viewing': 30  # Clients re-send while the conversation stays open
+}
+
+SWEEP_INTERVAL = 1  # Seconds between expiry sweeps in an open stream
+KEEPALIVE_INTERVAL = 15  # Seconds between keepalive comments on an idle stream
+
+def format_event(event):
+    """Encode an event as a Server-Sent Events message"""
+    return f"event: signal\ndata: {json.dumps(event)}\n\n"
+
+def _event(kind, user_id, username, chat_type, chat_id, active):
+    return {
+        'type': kind,
+        'user_id': user_id,
+        'username': username,
+        'chat_type': chat_type,
+        'chat_id': chat_id,
+        'active': active
+    }
+
+class SignalRegistry:
+    """Live signals and the open event streams they are fanned out to"""
+
+    def __init__(self):
+        # (kind, user_id, chat_type, chat_id) -> {'expires_at': ..., 'recipients': frozenset, 'username': ...}
+        self.signals = {}
+        self.signals_lock = threading.Lock()
+        # user_id -> list of queues, one per open event stream
+        self.subscribers = {}
+        self.subscribers_lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        """Register an event stream for a user; returns its queue"""
+        events = queue.Queue()
+        with self.subscribers_lock:
+            self.subscribers.setdefault(user_id, []).append(events)
+        return events
+
+    def unsubscribe(self, user_id, events):
+        """Forget a closed event stream"""
+        with self.subscribers_lock:
+            streams = self.subscribers.get(user_id, [])
+            if events in streams:
+                streams.remove(events)
+            if not streams:
+                self.subscribers.pop(user_id, None)
+
+    def subscribed_user_ids(self):
+        """Users with at least one open stream"""
+        with self.subscribers_lock:
+            return set(self.subscribers)
+
+    def push(self, recipients, event):
+        """Put an event on every open stream of the recipients"""
+        with self.subscribers_lock:
+            streams = [events for user_id in recipients for events in self.subscribers.get(user_id, [])]
+        for events in streams:
+            events.put(event)
+
+    def publish(self, kind, user_id, username, chat_type, chat_id, recipients, active=True):
+        """Set (or clear) a signal; recipients hear about it only when it starts or stops"""
+        self.expire()
+
+        key = (kind, user_id, chat_type, chat_id)
+        with self.signals_lock:
+            existed = key in self.signals
+            if active:
+                self.signals[key] = {
+                    'expires_at': time.monotonic() + SIGNAL_TTLS[kind],
+                    'recipients': frozenset(recipients),
+                    'username': username
+                }
+            else:
+                self.signals.pop(key, None)
+
+        if active != existed:
+            self.push(recipients, _event(kind, user_id, username, chat_type, chat_id, active))
+
+    def expire(self):
+        """Drop signals past their TTL and tell recipients they stopped"""
+        now = time.monotonic()
+        with self.signals_lock:
+            expired = [(key, signal) for key, signal in self.signals.items() if signal['expires_at'] <= now]
+            for key, _ in expired:
+                del self.signals[key]
+
+        for (kind, user_id, chat_type, chat_id), signal in expired:
+            self.push(signal['recipients'], _event(kind, user_id, signal['username'], chat_type, chat_id, False))
+
+    def active_for(self, recipient_id):
+        """Signals currently addressed to a user"""
+        self.expire()
+        with self.signals_lock:
+            return [
+                _event(kind, user_id, signal['username'], chat_type, chat_id, True)
+                for (kind, user_id, chat_type, chat_id), signal in self.signals.items()
+                if recipient_id in signal['recipients']
+            ]
+
+    def open_stream(self, user_id):
+        """Subscribe a user and return (queue, generator) for their SSE response
+
+        The snapshot of signals already running is taken right away, together
+        with the subscription, so it doesn't repeat events queued meanwhile.
+        The generator only uses this registry, so it runs without an app context.
+        """
+        events = self.subscribe(user_id)
+        return events, self.event_stream(user_id, events, self.active_for(user_id))
+
+    def event_stream(self, user_id, events, initial=()):
+        """Generator for a user's SSE response; sweeps expired signals while idle"""
+        try:
+            yield "retry: 3000\n\n"
+            for event in initial:
+                yield format_event(event)
+
+            idle_since = time.monotonic()
+            while True:
+                try:
+                    event = events.get(timeout=SWEEP_INTERVAL)
+                except queue.Empty:
+                    self.expire()
+                    if time.monotonic() - idle_since >= KEEPALIVE_INTERVAL:
+                        idle_since = time.monotonic()
+                        yield ": keepalive\n\n"
+                    continue
+
+                idle_since = time.monotonic()
+                yield format_event(event)
+        finally:
+            self.unsubscribe(user_id, events)
+
+def get_registry():
+    """The signal registry for the current app"""
+    return app_singleton('ephemeral_signals', lambda app: SignalRegistry())
+
+def subscribe(user_id):
+    """Register an event stream for a user; returns its queue"""
+    return get_registry().subscribe(user_id)
+
+def unsubscribe(user_id, events):
+    """Forget a closed event stream"""
+    get_registry().unsubscribe(user_id, events)
+
+def subscribed_user_ids():
+    """Users with at least one open stream"""
+    return get_registry().subscribed_user_ids()
+
+def push(recipients, event):
+    """Send any other event (e.g. break_ended) to the recipients' open streams"""
+    get_registry().push(recipients, event)
+
+def publish(kind, user_id, username, chat_type, chat_id, recipients, active=True):
+    """Set (or clear) a signal and push it to the recipients' streams
+
+    A repeated signal only refreshes its TTL; recipients hear about it again
+    only when it starts or stops.
+    """
+    get_registry().publish(kind, user_id, username, chat_type, chat_id, recipients, active)
+
+def expire_signals():
+    """Drop signals past their TTL and tell recipients they stopped"""
+    get_registry().expire()
+
+def get_active_signals(recipient_id):
+    """Signals currently addressed to a user, for clients that just connected"""
+    return get_registry().active_for(recipient_id)
+
+def open_stream(user_id):
+    """Subscribe a user and return (queue, generator) for their SSE response"""
+    return get_registry().open_stream(user_id)
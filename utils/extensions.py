@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Per-app singletons kept in app.extensions
+
+Caches, registries and background workers live once per Flask app. They
+are created lazily by the first request that needs them; concurrent first
+requests wait for that one instead of each building its own.
+"""
+
+import threading
+from flask import current_app
+
+# Reentrant: a factory may itself look up another singleton
+_lock = threading.RLock()
+
+def app_singleton(name, factory):
+    """app.extensions[name] for the current app, built with factory(app) on first use
+
+    The instance is published only once factory returns, so nobody sees a
+    half-initialised one.
+    """
+    app = current_app._get_current_object()
+    instance = app.extensions.get(name)
+    if instance is None:
+        with _lock:
+            instance = app.extensions.get(name)
+            if instance is None:
+                instance = factory(app)
+                app.extensions[name] = instance
+    return instance
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+"""
+Cold storage for old messages: one SQLite file per month with zlib-compressed bodies
+
+The archive job moves messages older than MESSAGE_ARCHIVE_AFTER_DAYS out of
+the primary database so the hot messages table (and every conversation,
+unread and search query over it) stays small. History pagination continues
+into the archive once it runs past the hot window.
+"""
+
+import glob
+import os
+import sqlite3
+import zlib
+from datetime import datetime, timedelta
+from flask import current_app
+from app import db
+
+ARCHIVE_FILE_PATTERN = 'messages-*.db'
+
+_SCHEMA = [
+    '''CREATE TABLE IF NOT EXISTS archived_messages (
+        id INTEGER PRIMARY KEY,
+        sender_id INTEGER NOT NULL,
+        recipient_id INTEGER,
+        group_id INTEGER,
+        content BLOB NOT NULL,
+        timestamp TEXT NOT NULL,
+        is_read INTEGER NOT NULL,
+        message_type TEXT NOT NULL,
+        chat_type TEXT NOT NULL,
+        attachment_id INTEGER
+    )''',
+    'CREATE INDEX IF NOT EXISTS ix_archived_sender_recipient ON archived_messages (sender_id, recipient_id, id)',
+    'CREATE INDEX IF NOT EXISTS ix_archived_recipient_sender ON archived_messages (recipient_id, sender_id, id)',
+    'CREATE INDEX IF NOT EXISTS ix_archived_group_id ON archived_messages (group_id, id)',
+]
+
+_COLUMNS = 'id, sender_id, recipient_id, group_id, content, timestamp, is_read, message_type, chat_type, attachment_id'
+
+def get_archive_root():
+    """Directory holding the monthly archive files"""
+    root = current_app.config.get('MESSAGE_ARCHIVE_FOLDER') or os.path.join(current_app.instance_path, 'message_archive')
+    return os.path.abspath(root)
+
+def archive_path(month):
+    """Archive file for a 'YYYY-MM' month"""
+    return os.path.join(get_archive_root(), f'messages-{month}.db')
+
+def list_archive_files():
+    """Archive files, newest month first"""
+    return sorted(glob.glob(os.path.join(get_archive_root(), ARCHIVE_FILE_PATTERN)), reverse=True)
+
+def _connect(path):
+    conn = sqlite3.connect(path, timeout=30)
+    for statement in _SCHEMA:
+        conn.execute(statement)
+    return conn
+
+def _keep_hot_ids():
+    """The latest message of every conversation and group stays hot so chat lists still find it"""
+    from models.message import Message
+
+    low = db.func.min(Message.sender_id, Message.recipient_id)
+    high = db.func.max(Message.sender_id, Message.recipient_id)
+    direct = db.session.query(db.func.max(Message.id)).filter(
+        Message.chat_type == 'direct'
+    ).group_by(low, high)
+    group = db.session.query(db.func.max(Message.id)).filter(
+        Message.chat_type == 'group'
+    ).group_by(Message.group_id)
+
+    return {row[0] for row in direct.all()} | {row[0] for row in group.all()}
+
+def archive_messages(older_than_days=None, batch_size=None):
+    """Move old messages into the monthly archive files
+
+    Unread direct messages stay hot so unread counters can still be rebuilt
+    from the messages table. Each batch is committed to the archive before
+    it is deleted from the primary database, and archive inserts ignore ids
+    already present, so an interrupted run is safe to repeat.
+    """
+    from models.message import Message
+
+    if older_than_days is None:
+        older_than_days = current_app.config.get('MESSAGE_ARCHIVE_AFTER_DAYS', 180)
+    batch_size = batch_size or current_app.config.get('MESSAGE_ARCHIVE_BATCH_SIZE', 1000)
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+    os.makedirs(get_archive_root(), exist_ok=True)
+    keep = _keep_hot_ids()
+    archived = 0
+    months = set()
+    last_id = 0
+
+    while True:
+        rows = db.session.query(
+            Message.id, Message.sender_id, Message.recipient_id, Message.group_id,
+            Message.content, Message.timestamp, Message.read_filter().label('is_read'), Message.message_type,
+            Message.chat_type, Message.attachment_id
+        ).filter(
+            Message.id > last_id,
+            Message.timestamp < cutoff,
+            (Message.chat_type == 'group') | Message.read_filter()
+        ).order_by(Message.id).limit(batch_size).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        by_month = {}
+        for row in rows:
+            if row.id in keep:
+                continue
+            by_month.setdefault(row.timestamp.strftime('%Y-%m'), []).append((
+                row.id, row.sender_id, row.recipient_id, row.group_id,
+                zlib.compress(row.content.encode('utf-8')), row.timestamp.isoformat(),
+                int(row.is_read), row.message_type, row.chat_type, row.attachment_id
+            ))
+
+        ids = []
+        for month, month_rows in by_month.items():
+            conn = _connect(archive_path(month))
+            try:
+                with conn:
+                    conn.executemany(
+                        f'INSERT OR IGNORE INTO archived_messages ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                        month_rows
+                    )
+            finally:
+                conn.close()
+            ids.extend(row[0] for row in month_rows)
+            months.add(month)
+
+        if ids:
+            Message.query.filter(Message.id.in_(ids)).delete(synchronize_session=False)
+            db.session.commit()
+            archived += len(ids)
+
+        if len(rows) < batch_size:
+            break
+
+    return {'archived': archived, 'months': sorted(months)}
+
+def _read_archives(where, params, before_id, limit):
+    """Newest-first archived rows matching where, across every monthly file"""
+    if limit <= 0:
+        return []
+
+    clause = where
+    if before_id:
+        clause += ' AND id < ?'
+        params = list(params) + [before_id]
+
+    rows = []
+    for path in list_archive_files():
+        conn = sqlite3.connect(f'file:{path}?mode=ro', uri=True, timeout=30)
+        try:
+            rows.extend(conn.execute(
+                f'SELECT {_COLUMNS} FROM archived_messages WHERE {clause} ORDER BY id DESC LIMIT ?',
+                list(params) + [limit]
+            ).fetchall())
+        finally:
+            conn.close()
+
+    rows.sort(key=lambda row: row[0], reverse=True)
+    return _to_dicts(rows[:limit])
+
+def _to_dicts(rows):
+    """Serialize archived rows like Message.row_to_dict, looking names up in the primary database"""
+    from models.user import User
+    from models.group import Group
+    from models.attachment import Attachment
+
+    user_ids = {row[1] for row in rows} | {row[2] for row in rows if row[2]}
+    group_ids = {row[3] for row in rows if row[3]}
+    attachment_ids = {row[9] for row in rows if row[9]}
+
+    usernames = dict(db.session.query(User.id, User.username).filter(User.id.in_(user_ids)).all()) if user_ids else {}
+    group_names = dict(db.session.query(Group.id, Group.name).filter(Group.id.in_(group_ids)).all()) if group_ids else {}
+    attachments = {attachment.id: attachment for attachment in
+                   Attachment.query.filter(Attachment.id.in_(attachment_ids)).all()} if attachment_ids else {}
+
+    results = []
+    for (message_id, sender_id, recipient_id, group_id, content, timestamp,
+         is_read, message_type, chat_type, attachment_id) in rows:
+        data = {
+            'id': message_id,
+            'sender_id': sender_id,
+            'sender_name': usernames.get(sender_id),
+            'content': zlib.decompress(content).decode('utf-8'),
+            'timestamp': timestamp,
+            'is_read': bool(is_read),
+            'message_type': message_type,
+            'chat_type': chat_type
+        }
+
+        if chat_type == 'direct':
+            data['recipient_id'] = recipient_id
+            data['recipient_name'] = usernames.get(recipient_id)
+        elif chat_type == 'group':
+            data['group_id'] = group_id
+            data['group_name'] = group_names.get(group_id)
+
+        if attachment_id and attachment_id in attachments:
+            data['attachment'] = attachments[attachment_id].to_dict()
+
+        data['archived'] = True
+        results.append(data)
+
+    return results
+
+def read_archived_conversation(user1_id, user2_id, before_id, limit):
+    """Archived direct messages between two users, newest first"""
+    return _read_archives(
+        "chat_type = 'direct' AND ((sender_id = ? AND recipient_id = ?) OR (sender_id = ? AND recipient_id = ?))",
+        [user1_id, user2_id, user2_id, user1_id], before_id, limit
+    )
+
+def read_archived_group(group_id, before_id, limit):
+    """Archived messages of a group, newest first"""
+    return _read_archives("chat_type = 'group' AND group_id = ?", [group_id], before_id, limit)
+
+def _delete_archived(where, params):
+    """Delete matching archived messages from every monthly file; returns the row count"""
+    deleted = 0
+    for path in list_archive_files():
+        conn = sqlite3.connect(path, timeout=30)
+        try:
+            with conn:
+                deleted += conn.execute(f'DELETE FROM archived_messages WHERE {where}', params).rowcount
+        finally:
+            conn.close()
+    return deleted
+
+def delete_archived_conversation(user1_id, user2_id):
+    """Remove a direct conversation from the archive"""
+    return _delete_archived(
+        "chat_type = 'direct' AND ((sender_id = ? AND recipient_id = ?) OR (sender_id = ? AND recipient_id = ?))",
+        [user1_id, user2_id, user2_id, user1_id]
+    )
+
+def delete_archived_group(group_id):
+    """Remove a group's messages from the archive"""
+    return _delete_archived("chat_type = 'group' AND group_id = ?", [group_id])
+
+def delete_archived_user(user_id):
+    """Remove every archived message a user sent or received"""
+    return _delete_archived('sender_id = ? OR recipient_id = ?', [user_id, user_id])
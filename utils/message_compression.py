@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Optional at-rest compression of long message bodies
+
+With MESSAGE_COMPRESSION set to 'zlib' or 'zstd', message contents of at
+least MESSAGE_COMPRESSION_THRESHOLD bytes are stored as a compressed BLOB in
+the same messages.content column; shorter ones (and anything that wouldn't
+shrink) stay plain TEXT. Reads decompress transparently through the column
+type, so to_dict, the column-only serializers and every ORM query keep
+seeing text. Raw SQL sees the BLOB; the message_text() SQL function turns
+it back into text (the search index reads messages through it).
+
+message_text() is a Python function, so it exists only on connections it
+was registered on: install_sql_functions() covers every connection of the
+app's engine, and scripts that open the database with plain sqlite3 must
+call register_sql_functions(conn) before touching the messages table,
+because the search index triggers call it on every insert, update and
+delete. The sqlite3 CLI can't load it; change messages through the app or
+a script instead.
+
+zstd needs the optional zstandard package; without it 'zstd' falls back to
+zlib for writes, and reading a zstd body raises.
+"""
+
+import zlib
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.types import TypeDecorator
+from app import db
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+_warned_missing_zstd = False
+
+def get_codec():
+    """Configured codec ('zlib', 'zstd') or None when compression is off"""
+    global _warned_missing_zstd
+
+    if not has_app_context():
+        return None
+    codec = current_app.config.get('MESSAGE_COMPRESSION')
+    if codec == 'zstd' and zstandard is None:
+        if not _warned_missing_zstd:
+            print("⚠️  MESSAGE_COMPRESSION='zstd' needs the zstandard package; using zlib")
+            _warned_missing_zstd = True
+        return 'zlib'
+    return codec
+
+def compress_content(text, codec=None, threshold=None):
+    """Compressed bytes for text past the threshold, otherwise text unchanged"""
+    codec = codec or get_codec()
+    if not codec or not isinstance(text, str):
+        return text
+
+    if threshold is None:
+        threshold = current_app.config.get('MESSAGE_COMPRESSION_THRESHOLD', 1024)
+    raw = text.encode('utf-8')
+    if len(raw) < threshold:
+        return text
+
+    if codec == 'zstd':
+        compressed = zstandard.ZstdCompressor().compress(raw)
+    elif codec == 'zlib':
+        compressed = zlib.compress(raw)
+    else:
+        raise ValueError(f'Unknown MESSAGE_COMPRESSION codec {codec!r}')
+
+    return compressed if len(compressed) < len(raw) else text
+
+def decompress_content(value):
+    """Text for a stored content value, compressed or not"""
+    if not isinstance(value, (bytes, memoryview)):
+        return value
+
+    value = bytes(value)
+    if value.startswith(ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError('Message is zstd-compressed but the zstandard package is not installed')
+        return zstandard.ZstdDecompressor().decompress(value).decode('utf-8')
+    return zlib.decompress(value).decode('utf-8')
+
+def is_compressed(value):
+    """Whether a stored content value is a compressed BLOB"""
+    return isinstance(value, (bytes, memoryview))
+
+class CompressedText(TypeDecorator):
+    """Text column whose long values may be stored compressed (see module docstring)"""
+
+    impl = db.Text
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return compress_content(value)
+
+    def process_result_value(self, value, dialect):
+        return decompress_content(value)
+
+    def coerce_compared_value(self, op, value):
+        # Comparisons (==, LIKE, ...) bind their literal as plain text
+        return db.Text()
+
+def register_sql_functions(connection):
+    """Register message_text() on one sqlite3 connection"""
+    connection.create_function('message_text', 1, decompress_content, deterministic=True)
+
+def _register_functions(dbapi_connection, connection_record):
+    if hasattr(dbapi_connection, 'create_function'):
+        register_sql_functions(dbapi_connection)
+
+def install_sql_functions(engine):
+    """Register message_text() on every new connection of an engine"""
+    if engine.dialect.name == 'sqlite' and not event.contains(engine, 'connect', _register_functions):
+        event.listen(engine, 'connect', _register_functions)
+
+def compress_existing_messages(batch_size=1000):
+    """Rewrite stored messages under the current settings; returns (rewritten, bytes saved)
+
+    Long plain bodies get compressed; with compression turned off,
+    compressed bodies are written back as text.
+    """
+    codec = get_codec()
+    threshold = current_app.config.get('MESSAGE_COMPRESSION_THRESHOLD', 1024)
+    rewritten = saved = 0
+    last_id = 0
+
+    while True:
+        rows = db.session.execute(db.text('''
+            SELECT id, typeof(content) AS kind, CAST(content AS BLOB) AS stored
+            FROM messages
+            WHERE id > :last_id
+              AND (typeof(content) = 'blob' OR (:compress AND length(CAST(content AS BLOB)) >= :threshold))
+            ORDER BY id
+            LIMIT :limit
+        '''), {'last_id': last_id, 'compress': bool(codec), 'threshold': threshold, 'limit': batch_size}).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        for row in rows:
+            was_compressed = row.kind == 'blob'
+            text = decompress_content(row.stored) if was_compressed else row.stored.decode('utf-8')
+            content = compress_content(text, codec, threshold) if codec else text
+            if is_compressed(content) == was_compressed:
+                continue
+
+            # Bound as-is: the raw UPDATE doesn't run the column type again
+            db.session.execute(
+                db.text('UPDATE messages SET content = :content WHERE id = :id'),
+                {'content': content, 'id': row.id}
+            )
+            rewritten += 1
+            saved += len(row.stored) - (len(content) if is_compressed(content) else len(content.encode('utf-8')))
+        db.session.commit()
+
+        if len(rows) < batch_size:
+            break
+
+    return rewritten, saved
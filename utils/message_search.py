@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Full-text message search backed by an SQLite FTS5 index over messages.content
+
+The index reads messages through a view that applies message_text(), so
+bodies stored compressed (utils.message_compression) are indexed as text.
+The sync triggers call message_text() too: any connection that writes to
+messages needs it registered (see utils.message_compression).
+"""
+
+import html
+from datetime import datetime
+from app import db
+
+FTS_TABLE = 'messages_fts'
+FTS_SOURCE = 'messages_fts_source'
+FTS_TRIGGERS = ['messages_fts_insert', 'messages_fts_delete', 'messages_fts_update']
+
+# Private-use markers placed around matches by snippet(), swapped for <mark>
+# tags only after the surrounding text has been HTML-escaped
+_MATCH_START = '\ue000'
+_MATCH_END = '\ue001'
+
+_CREATE_STATEMENTS = [
+    f'''CREATE VIEW IF NOT EXISTS {FTS_SOURCE} AS
+        SELECT id, message_text(content) AS content FROM messages''',
+    f'''CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        content,
+        content='{FTS_SOURCE}',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )''',
+    f'''CREATE TRIGGER IF NOT EXISTS messages_fts_insert AFTER INSERT ON messages BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, message_text(new.content));
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS messages_fts_delete AFTER DELETE ON messages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, message_text(old.content));
+    END''',
+    f'''CREATE TRIGGER IF NOT EXISTS messages_fts_update AFTER UPDATE OF content ON messages BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, content) VALUES ('delete', old.id, message_text(old.content));
+        INSERT INTO {FTS_TABLE}(rowid, content) VALUES (new.id, message_text(new.content));
+    END''',
+]
+
+def is_search_available():
+    """Search needs SQLite with the FTS5 extension"""
+    return db.engine.dialect.name == 'sqlite'
+
+def ensure_search_index():
+    """Create the FTS5 table and sync triggers; index existing messages on first creation"""
+    if not is_search_available():
+        print("⚠️  Message search requires SQLite FTS5; search is disabled")
+        return False
+
+    try:
+        with db.engine.connect() as conn:
+            table_sql = conn.execute(db.text(
+                "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"
+            ), {'name': FTS_TABLE}).scalar()
+            existed = table_sql is not None
+
+            # Indexes created before compression read messages directly; rebuild them over the view
+            if existed and f"content='{FTS_SOURCE}'" not in table_sql:
+                for trigger in FTS_TRIGGERS:
+                    conn.execute(db.text(f'DROP TRIGGER IF EXISTS {trigger}'))
+                conn.execute(db.text(f'DROP TABLE {FTS_TABLE}'))
+                existed = False
+
+            for statement in _CREATE_STATEMENTS:
+                conn.execute(db.text(statement))
+
+            if not existed:
+                conn.execute(db.text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+            conn.commit()
+        return True
+    except Exception as e:
+        print(f"⚠️  Could not create message search index (FTS5 unavailable?): {e}")
+        return False
+
+def rebuild_search_index():
+    """Re-index every message from the messages table"""
+    with db.engine.connect() as conn:
+        conn.execute(db.text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+        conn.execute(db.text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('optimize')"))
+        conn.commit()
+
+        return conn.execute(db.text(f"SELECT COUNT(*) FROM {FTS_TABLE}")).scalar()
+
+def build_match_query(query):
+    """Turn free text into a safe FTS5 query: every term must match, last term as a prefix"""
+    terms = [term.replace('"', '""') for term in query.split()]
+    if not terms:
+        return None
+
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+def highlight_snippet(snippet):
+    """Escape a snippet for HTML and wrap matched terms in <mark>"""
+    escaped = html.escape(snippet or '')
+    return escaped.replace(_MATCH_START, '<mark>').replace(_MATCH_END, '</mark>')
+
+def search_messages(user_id, query, page=1, per_page=20):
+    """Ranked search over messages visible to user_id
+
+    Visible messages are direct messages the user sent or received,
+    messages in groups the user belongs to and messages in the department
+    channels open to the user. Returns (results, has_more).
+    """
+    match_query = build_match_query(query)
+    if not match_query:
+        return [], False
+
+    page = max(page, 1)
+    per_page = max(1, min(per_page, 100))
+
+    rows = db.session.execute(db.text(f'''
+        SELECT m.id, m.sender_id, sender.username AS sender_name, m.recipient_id,
+               recipient.username AS recipient_name, m.group_id, g.name AS group_name,
+               m.chat_type, m.timestamp,
+               snippet({FTS_TABLE}, 0, :match_start, :match_end, '…', 16) AS snippet,
+               bm25({FTS_TABLE}) AS score
+        FROM {FTS_TABLE}
+        JOIN messages m ON m.id = {FTS_TABLE}.rowid
+        LEFT JOIN users sender ON sender.id = m.sender_id
+        LEFT JOIN users recipient ON recipient.id = m.recipient_id
+        LEFT JOIN groups g ON g.id = m.group_id
+        WHERE {FTS_TABLE} MATCH :match_query
+          AND (
+            (m.chat_type = 'direct' AND (m.sender_id = :user_id OR m.recipient_id = :user_id))
+            OR (m.chat_type = 'group' AND m.group_id IN (
+                SELECT group_id FROM group_members WHERE user_id = :user_id
+            ))
+            OR (m.chat_type = 'group' AND m.group_id IN (
+                SELECT g2.id FROM groups g2, users me
+                WHERE g2.group_type = 'department' AND me.id = :user_id
+                  AND (me.is_admin = 1 OR g2.department = 'ALL' OR g2.department = me.department)
+            ))
+          )
+        ORDER BY rank
+        LIMIT :limit OFFSET :offset
+    '''), {
+        'match_query': match_query,
+        'match_start': _MATCH_START,
+        'match_end': _MATCH_END,
+        'user_id': user_id,
+        'limit': per_page + 1,
+        'offset': (page - 1) * per_page
+    }).mappings().all()
+
+    results = []
+    for row in rows[:per_page]:
+        timestamp = row['timestamp']
+        if isinstance(timestamp, str):
+            timestamp = datetime.fromisoformat(timestamp)
+        results.append({
+            'id': row['id'],
+            'chat_type': row['chat_type'],
+            'sender_id': row['sender_id'],
+            'sender_name': row['sender_name'],
+            'recipient_id': row['recipient_id'],
+            'recipient_name': row['recipient_name'],
+            'group_id': row['group_id'],
+            'group_name': row['group_name'],
+            'timestamp': timestamp.isoformat(),
+            'highlight': highlight_snippet(row['snippet']),
+            'score': round(-row['score'], 4)
+        })
+
+    return results, len(rows) > per_page
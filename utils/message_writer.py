@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Optional group commit for message sends
+
+With MESSAGE_GROUP_COMMIT enabled, sends are queued for a writer thread that
+inserts every message that arrived within MESSAGE_GROUP_COMMIT_INTERVAL_MS
+(or up to MESSAGE_GROUP_COMMIT_MAX_BATCH of them) in one transaction. The
+request blocks on a future until that transaction has committed, so a
+client still only sees success once its message is durable - SQLite just
+does one write transaction per batch instead of one per message.
+
+A send still queued after MESSAGE_GROUP_COMMIT_TIMEOUT is withdrawn before
+the writer reaches it, so an error always means the message was not stored
+and a retry cannot duplicate it.
+"""
+
+import queue
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from flask import current_app
+from app import db
+from utils.extensions import app_singleton
+
+# What a queued send resolves to: the columns the send endpoints report back
+SentMessage = namedtuple('SentMessage', 'id sender_id content timestamp message_type')
+
+_Pending = namedtuple('_Pending', 'stage args future')
+
+class MessageNotSent(RuntimeError):
+    """A queued send timed out before the writer took it; nothing was stored"""
+
+class MessageWriter:
+    """Single writer thread that commits queued sends in batches"""
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config.get('MESSAGE_GROUP_COMMIT_INTERVAL_MS', 5) / 1000.0
+        self.max_batch = app.config.get('MESSAGE_GROUP_COMMIT_MAX_BATCH', 100)
+        self.queue = queue.Queue()
+        self.stats = {'batches': 0, 'messages': 0, 'fallbacks': 0, 'expired': 0}
+        self.thread = threading.Thread(target=self._run, name='message-writer', daemon=True)
+        self.thread.start()
+
+    def submit(self, stage, *args):
+        """Queue stage(*args) for the next batch; returns a Future"""
+        future = Future()
+        self.queue.put(_Pending(stage, args, future))
+        return future
+
+    def _collect_batch(self):
+        """Block for one send, then take whatever else arrives within the interval"""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.interval
+
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            # Claim each send; one whose request already gave up stays unwritten
+            collected = self._collect_batch()
+            batch = [item for item in collected if item.future.set_running_or_notify_cancel()]
+            self.stats['expired'] += len(collected) - len(batch)
+            if not batch:
+                continue
+            with self.app.app_context():
+                try:
+                    self._commit_batch(batch)
+                except Exception as e:
+                    print(f"Message writer batch failed: {e}")
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+                finally:
+                    db.session.remove()
+
+    def _commit_batch(self, batch):
+        """Insert a batch in one transaction; retry one by one if it fails"""
+        try:
+            messages = [item.stage(*item.args) for item in batch]
+            db.session.flush()
+            results = [_sent(message) for message in messages]
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.stats['fallbacks'] += 1
+            # One bad send (e.g. a deleted group) must not fail the others
+            for item in batch:
+                try:
+                    message = item.stage(*item.args)
+                    db.session.flush()
+                    result = _sent(message)
+                    db.session.commit()
+                    item.future.set_result(result)
+                except Exception as e:
+                    db.session.rollback()
+                    item.future.set_exception(e)
+            return
+
+        self.stats['batches'] += 1
+        self.stats['messages'] += len(batch)
+        for item, result in zip(batch, results):
+            item.future.set_result(result)
+
+def _sent(message):
+    """Snapshot a flushed message before commit expires its attributes"""
+    return SentMessage(message.id, message.sender_id, message.content, message.timestamp, message.message_type)
+
+def is_enabled():
+    """Group commit is opt-in"""
+    return current_app.config.get('MESSAGE_GROUP_COMMIT', False)
+
+def get_writer():
+    """The writer for the current app, started on first use"""
+    return app_singleton('message_writer', MessageWriter)
+
+def _wait(future):
+    """Block the request until its batch has committed
+
+    The request's own transaction is ended first so waiting requests don't
+    hold pool connections (or SQLite read locks) the writer needs. On timeout
+    the send is withdrawn if the writer hasn't taken it yet (MessageNotSent);
+    if it has, the request waits for that batch's outcome.
+    """
+    db.session.commit()
+    try:
+        return future.result(timeout=current_app.config.get('MESSAGE_GROUP_COMMIT_TIMEOUT', 10))
+    except FutureTimeout:
+        if future.cancel():
+            raise MessageNotSent('Message was not sent, please try again')
+        return future.result()
+
+def send_direct_message(sender_id, recipient_id, content, attachment=None):
+    """Send a direct message, through the group-commit writer when enabled"""
+    from models.message import Message
+
+    if not is_enabled():
+        return Message.send_direct_message(sender_id, recipient_id, content, attachment=attachment)
+
+    return _wait(get_writer().submit(
+        Message.add_direct_message, sender_id, recipient_id, content, Message.attachment_fields(attachment)
+    ))
+
+def send_group_message(sender_id, group_id, content, attachment=None):
+    """Send a group message, through the group-commit writer when enabled"""
+    from models.message import Message
+
+    if not is_enabled():
+        return Message.send_group_message(sender_id, group_id, content, attachment=attachment)
+
+    return _wait(get_writer().submit(
+        Message.add_group_message, sender_id, group_id, content, Message.attachment_fields(attachment)
+    ))
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+In-memory presence registry: last-seen times and statuses without a write per heartbeat
+
+Every open tab sends a heartbeat, and each one used to write
+users.last_activity and commit. The registry records heartbeats in memory
+instead and a background thread writes the latest timestamp of every user
+who was seen since the last flush in one batched UPDATE every
+PRESENCE_FLUSH_INTERVAL seconds. Explicit status changes (login, logout,
+break) still go to the database right away, and are mirrored here.
+
+The same thread sweeps idle users: each known user has one deadline in a
+heap ordered by when their next idle threshold (PRESENCE_BREAK_AFTER,
+PRESENCE_OFFLINE_AFTER) runs out, and the thread wakes exactly then, moves
+the user to break/offline, tells the transition listeners and persists an
+offline transition with the next flush. User.is_online and
+User.get_current_status are then plain lookups of the registry's status.
+derive_status is the one place the thresholds are applied, also for users
+the registry doesn't know (they are read from the users table).
+
+The registry is process-local; with several workers each one flushes its
+own heartbeats, and reads fall back to the users table for users the
+worker hasn't seen.
+"""
+
+import atexit
+import heapq
+import threading
+import time
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import object_session
+from app import db
+from utils import session_events
+from utils.extensions import app_singleton
+
+_EVENTS_KEY = 'presence_status_changes'
+
+FLUSH_CHUNK_SIZE = 400  # Users per UPDATE, well under SQLite's bound-parameter limit
+
+DEFAULT_BREAK_AFTER = 15 * 60  # Seconds without activity before an online user counts as on break
+DEFAULT_OFFLINE_AFTER = 5 * 60  # Seconds without activity before a user counts as offline
+
+def derive_status(last_seen, explicit_status, now, break_after, offline_after):
+    """online/break/offline from the last activity and the status the user set
+
+    Idleness past offline_after wins over everything; a user who set
+    'break' stays on break while active. With the default thresholds
+    offline_after comes first, so idle users go straight to offline.
+    """
+    if explicit_status == 'offline' or last_seen is None or now - last_seen >= offline_after:
+        return 'offline'
+    if explicit_status == 'break' or now - last_seen >= break_after:
+        return 'break'
+    return 'online'
+
+def get_thresholds():
+    """(break_after, offline_after) as timedeltas for the current app"""
+    config = current_app.config if has_app_context() else {}
+    return (
+        timedelta(seconds=config.get('PRESENCE_BREAK_AFTER', DEFAULT_BREAK_AFTER)),
+        timedelta(seconds=config.get('PRESENCE_OFFLINE_AFTER', DEFAULT_OFFLINE_AFTER))
+    )
+
+class PresenceRegistry:
+    """Last-seen time and status per user, swept on a deadline heap and flushed in batches"""
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config.get('PRESENCE_FLUSH_INTERVAL', 30)
+        with app.app_context():
+            self.break_after, self.offline_after = get_thresholds()
+        self.lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.last_seen = {}  # user_id -> datetime (UTC)
+        self.statuses = {}  # user_id -> online/break/offline, as last set explicitly
+        self.effective = {}  # user_id -> derived status, kept current by the sweeper
+        self.deadlines = []  # Heap of (when the next threshold expires, user_id)
+        self.scheduled = set()  # Users with an entry in deadlines
+        self.dirty = {}  # user_id -> last_seen not yet written
+        self.went_offline = set()  # Idle offline transitions not yet written
+        self.listeners = []  # Called with [(user_id, old, new), ...] after transitions
+        self.stats = {'heartbeats': 0, 'flushes': 0, 'rows_flushed': 0, 'transitions': 0}
+        self.thread = None
+
+    def _refresh(self, user_id, now, transitions):
+        """Re-derive a user's status and schedule their next threshold; lock held"""
+        last_seen = self.last_seen.get(user_id)
+        status = derive_status(last_seen, self.statuses.get(user_id), now, self.break_after, self.offline_after)
+        previous = self.effective.get(user_id)
+        if status != previous:
+            self.effective[user_id] = status
+            transitions.append((user_id, previous, status))
+
+        if last_seen is None or status == 'offline' or user_id in self.scheduled:
+            return
+        upcoming = [last_seen + after for after in (self.break_after, self.offline_after) if last_seen + after > now]
+        if upcoming:
+            deadline = min(upcoming)
+            if not self.deadlines or deadline < self.deadlines[0][0]:
+                self.wakeup.set()
+            heapq.heappush(self.deadlines, (deadline, user_id))
+            self.scheduled.add(user_id)
+
+    def _notify(self, transitions):
+        if not transitions:
+            return
+        self.stats['transitions'] += len(transitions)
+        for listener in list(self.listeners):
+            try:
+                listener(transitions)
+            except Exception as e:
+                print(f"Presence listener failed: {e}")
+
+    def touch(self, user_id, when=None):
+        """Record a heartbeat; returns True if it brought the user back from offline"""
+        when = when or datetime.utcnow()
+        transitions = []
+        with self.lock:
+            if self.last_seen.get(user_id, datetime.min) < when:
+                self.last_seen[user_id] = when
+                self.dirty[user_id] = when
+            self.stats['heartbeats'] += 1
+            came_online = self.statuses.get(user_id) == 'offline'
+            if came_online:
+                self.statuses[user_id] = 'online'
+            self.went_offline.discard(user_id)
+            self._refresh(user_id, datetime.utcnow(), transitions)
+        self._notify(transitions)
+        self._ensure_thread()
+        return came_online
+
+    def set_status(self, user_id, status, when=None):
+        """Mirror an explicit status change that was written to the database"""
+        transitions = []
+        with self.lock:
+            self.statuses[user_id] = status
+            if when and self.last_seen.get(user_id, datetime.min) < when:
+                self.last_seen[user_id] = when
+            self.went_offline.discard(user_id)
+            self._refresh(user_id, datetime.utcnow(), transitions)
+        self._notify(transitions)
+
+    def mirror(self, user_id, status):
+        """Follow a committed users.current_status change of a tracked user"""
+        if user_id in self.effective:
+            self.set_status(user_id, status)
+
+    def observe(self, user_id, last_seen, status):
+        """Start tracking a user known only from the users table, without writing anything"""
+        with self.lock:
+            if user_id in self.effective:
+                return
+            if last_seen and self.last_seen.get(user_id, datetime.min) < last_seen:
+                self.last_seen[user_id] = last_seen
+            self.statuses.setdefault(user_id, status)
+            self._refresh(user_id, datetime.utcnow(), [])
+        self._ensure_thread()
+
+    def get(self, user_id):
+        """(last_seen, status) known for a user; either may be None"""
+        with self.lock:
+            return self.last_seen.get(user_id), self.statuses.get(user_id)
+
+    def current(self, user_id):
+        """Derived status of a user the registry knows, else None"""
+        if self.deadlines and self.deadlines[0][0] <= datetime.utcnow():
+            self.sweep()  # Exact even when no thread is sweeping
+        return self.effective.get(user_id)
+
+    def snapshot(self):
+        """{user_id: (last_seen, derived status)} for every user the registry knows"""
+        if self.deadlines and self.deadlines[0][0] <= datetime.utcnow():
+            self.sweep()
+        with self.lock:
+            return {user_id: (self.last_seen.get(user_id), status) for user_id, status in self.effective.items()}
+
+    def unflushed(self):
+        """{user_id: (last_seen, derived status)} for users whose latest state isn't written yet"""
+        if self.deadlines and self.deadlines[0][0] <= datetime.utcnow():
+            self.sweep()
+        with self.lock:
+            return {
+                user_id: (self.last_seen.get(user_id), self.effective[user_id])
+                for user_id in self.dirty.keys() | self.went_offline
+                if user_id in self.effective
+            }
+
+    def forget(self, user_id):
+        """Drop a deleted user"""
+        with self.lock:
+            for mapping in (self.last_seen, self.statuses, self.effective, self.dirty):
+                mapping.pop(user_id, None)
+            self.went_offline.discard(user_id)
+            # A leftover heap entry is skipped when it comes up
+
+    def sweep(self, now=None):
+        """Apply every threshold that expired by now; returns the transitions"""
+        now = now or datetime.utcnow()
+        transitions = []
+        with self.lock:
+            while self.deadlines and self.deadlines[0][0] <= now:
+                _, user_id = heapq.heappop(self.deadlines)
+                self.scheduled.discard(user_id)
+                if user_id in self.effective:
+                    self._refresh(user_id, now, transitions)
+            for user_id, _, status in transitions:
+                if status == 'offline':
+                    self.went_offline.add(user_id)
+        self._notify(transitions)
+        return transitions
+
+    def next_deadline(self):
+        """When the next threshold expires, or None"""
+        with self.lock:
+            return self.deadlines[0][0] if self.deadlines else None
+
+    def flush(self):
+        """Write pending last-seen times and offline transitions; returns users written"""
+        from models.user import User
+        from utils import user_cache
+
+        with self.lock:
+            pending, self.dirty = self.dirty, {}
+            went_offline, self.went_offline = self.went_offline, set()
+        if not pending and not went_offline:
+            return 0
+
+        table = User.__table__
+        items = list(pending.items())
+        offline_ids = list(went_offline)
+        try:
+            for start in range(0, len(items), FLUSH_CHUNK_SIZE):
+                chunk = dict(items[start:start + FLUSH_CHUNK_SIZE])
+                db.session.execute(
+                    table.update().where(table.c.id.in_(chunk)).values(
+                        last_activity=db.case(chunk, value=table.c.id)
+                    )
+                )
+            if offline_ids:
+                user_cache.invalidate(*offline_ids)
+            for start in range(0, len(offline_ids), FLUSH_CHUNK_SIZE):
+                db.session.execute(
+                    table.update().where(table.c.id.in_(offline_ids[start:start + FLUSH_CHUNK_SIZE])).values(
+                        current_status='offline'
+                    )
+                )
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            # Keep everything for the next attempt unless newer values arrived
+            with self.lock:
+                for user_id, when in pending.items():
+                    if self.dirty.get(user_id, datetime.min) < when:
+                        self.dirty[user_id] = when
+                self.went_offline.update(
+                    user_id for user_id in went_offline if self.effective.get(user_id) == 'offline'
+                )
+            raise
+
+        with self.lock:
+            self.stats['flushes'] += 1
+            self.stats['rows_flushed'] += len(pending.keys() | went_offline)
+        return len(pending.keys() | went_offline)
+
+    def _ensure_thread(self):
+        if self.thread is not None or not self.interval:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='presence-sweeper', daemon=True)
+                self.thread.start()
+                atexit.register(self._flush_in_context)
+
+    def _flush_in_context(self):
+        with self.app.app_context():
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Presence flush failed: {e}")
+            finally:
+                db.session.remove()
+
+    def _run(self):
+        next_flush = time.monotonic() + self.interval
+        while True:
+            timeout = next_flush - time.monotonic()
+            deadline = self.next_deadline()
+            if deadline is not None:
+                timeout = min(timeout, (deadline - datetime.utcnow()).total_seconds())
+            self.wakeup.wait(max(timeout, 0))
+            self.wakeup.clear()
+
+            self.sweep()
+            if time.monotonic() >= next_flush:
+                self._flush_in_context()
+                next_flush = time.monotonic() + self.interval
+
+def get_registry():
+    """The registry for the current app, or None outside an app context"""
+    if not has_app_context():
+        return None
+    return app_singleton('presence', PresenceRegistry)
+
+def touch(user_id, when=None):
+    """Record a heartbeat for a user (see PresenceRegistry.touch)"""
+    return get_registry().touch(user_id, when)
+
+def set_status(user_id, status, when=None):
+    """Mirror an explicit status change"""
+    get_registry().set_status(user_id, status, when)
+
+def lookup(user_id):
+    """(last_seen, status) from the registry; (None, None) when unknown or outside an app"""
+    registry = get_registry()
+    return registry.get(user_id) if registry else (None, None)
+
+def current_status(user_id):
+    """Derived status from the registry, or None when it doesn't know the user"""
+    registry = get_registry()
+    return registry.current(user_id) if registry else None
+
+def on_transition(listener):
+    """Call listener([(user_id, old, new), ...]) whenever statuses change"""
+    get_registry().listeners.append(listener)
+
+def flush():
+    """Write pending heartbeats now"""
+    return get_registry().flush()
+
+def tracked():
+    """{user_id: (last_seen, status)} known to the registry, for overlaying on users rows
+
+    Read paths use this instead of flushing: users.last_activity may be up to
+    one flush interval behind for the users listed here.
+    """
+    registry = get_registry()
+    return registry.snapshot() if registry else {}
+
+def unflushed():
+    """{user_id: (last_seen, status)} the users table doesn't reflect yet
+
+    Aggregates over users apply these as per-user corrections instead of
+    flushing first.
+    """
+    registry = get_registry()
+    return registry.unflushed() if registry else {}
+
+def _queue_status(mapper, connection, target):
+    session = object_session(target)
+    if session is not None and inspect(target).attrs.current_status.history.has_changes():
+        session_events.queue(_EVENTS_KEY, (target.id, target.current_status), session)
+
+def _mirror_committed(changes):
+    registry = current_app.extensions.get('presence')
+    if registry is not None:
+        # The last status written for each user wins
+        for user_id, status in dict(changes).items():
+            registry.mirror(user_id, status)
+
+def _register_listeners():
+    from models.user import User
+
+    # Status changes written through the ORM anywhere reach tracked users too
+    event.listen(User, 'after_update', _queue_status)
+    session_events.on_commit(_EVENTS_KEY, _mirror_committed)
+
+_register_listeners()
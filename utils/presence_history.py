@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Presence history: every employee's status sampled into fixed-interval buckets
+
+Until now the only record of who was online when was the login/logout rows
+in logs, which an occupancy view would have to replay. A background thread
+samples the department counters (which already hold every employee's
+current department and status in memory) at the start of each
+PRESENCE_HISTORY_INTERVAL-second bucket and sets that bucket's byte in the
+employees' PresenceDay rows: one read and one upsert per 500 employees who
+are online or on break, and nothing at all for offline ones.
+
+get_heatmap aggregates a date range into online/break counts per
+department, day and bucket from those rows alone, without touching logs.
+Days are UTC, like every other timestamp in the app. Like the presence
+registry, sampling is per process; leave PRESENCE_HISTORY_SAMPLING on in
+one worker only.
+"""
+
+import threading
+import time
+from datetime import date, datetime, timedelta
+from app import db
+from utils import department_stats
+from utils.extensions import app_singleton
+
+SECONDS_PER_DAY = 24 * 60 * 60
+MAX_RANGE_DAYS = 31  # Longest date range get_heatmap serves
+
+class PresenceSampler:
+    """Writes one bucket of presence history per interval"""
+
+    def __init__(self, app):
+        self.app = app
+        self.interval = app.config.get('PRESENCE_HISTORY_INTERVAL', 300)
+        if self.interval <= 0 or SECONDS_PER_DAY % self.interval:
+            raise ValueError('PRESENCE_HISTORY_INTERVAL must divide a day into whole buckets')
+        self.buckets_per_day = SECONDS_PER_DAY // self.interval
+        self.lock = threading.Lock()
+        self.last_bucket = None
+        self.stats = {'samples': 0, 'rows_written': 0, 'skipped': 0}
+        self.thread = None
+
+    def bucket_of(self, when):
+        """(day, bucket index) a moment falls in"""
+        seconds = when.hour * 3600 + when.minute * 60 + when.second
+        return when.date(), seconds // self.interval
+
+    def sample(self, now=None):
+        """Record everyone's current status in now's bucket, once per bucket; returns rows written"""
+        from models.presence_history import PresenceDay
+
+        now = now or datetime.utcnow()
+        day, bucket = self.bucket_of(now)
+        with self.lock:
+            if self.last_bucket == (day, bucket):
+                self.stats['skipped'] += 1
+                return 0
+            self.last_bucket = (day, bucket)
+
+        members = department_stats.get_tracker().get_members()
+        present = {user_id: member for user_id, member in members.items() if member[1] != 'offline'}
+        try:
+            if present:
+                PresenceDay.record(day, bucket, present, self.buckets_per_day)
+                db.session.commit()
+        except Exception:
+            db.session.rollback()
+            with self.lock:
+                self.last_bucket = None  # Let the next attempt retry this bucket
+            raise
+
+        with self.lock:
+            self.stats['samples'] += 1
+            self.stats['rows_written'] += len(present)
+        return len(present)
+
+    def get_stats(self):
+        with self.lock:
+            stats = dict(self.stats)
+        stats['interval'] = self.interval
+        return stats
+
+    def _ensure_thread(self):
+        if self.thread is not None:
+            return
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='presence-history', daemon=True)
+                self.thread.start()
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    self.sample()
+                except Exception as e:
+                    print(f"Presence history sample failed: {e}")
+                finally:
+                    db.session.remove()
+
+            # Sleep until the start of the next bucket
+            now = datetime.utcnow()
+            seconds = now.hour * 3600 + now.minute * 60 + now.second + now.microsecond / 1e6
+            time.sleep(self.interval - seconds % self.interval)
+
+def _create_sampler(app):
+    sampler = PresenceSampler(app)
+    if app.config.get('PRESENCE_HISTORY_SAMPLING', True):
+        sampler._ensure_thread()
+    return sampler
+
+def get_sampler():
+    """The sampler for the current app, started unless PRESENCE_HISTORY_SAMPLING is off"""
+    return app_singleton('presence_history', _create_sampler)
+
+def sample(now=None):
+    """Record the current bucket now (see PresenceSampler.sample)"""
+    return get_sampler().sample(now)
+
+def _day_range(start_day, end_day):
+    if end_day < start_day:
+        raise ValueError('end is before start')
+    if (end_day - start_day).days >= MAX_RANGE_DAYS:
+        raise ValueError(f'at most {MAX_RANGE_DAYS} days can be requested at once')
+    return [start_day + timedelta(days=offset) for offset in range((end_day - start_day).days + 1)]
+
+def _fit(samples, length):
+    """Samples padded or cut to length (the interval may have changed since they were written)"""
+    if len(samples) == length:
+        return samples
+    return bytes(samples[:length]) + bytes(max(0, length - len(samples)))
+
+def get_heatmap(start_day, end_day, department=None):
+    """Online and break counts per department, day and bucket
+
+    {'interval', 'buckets', 'days': [iso], 'departments': {department:
+    {'online': [[count per bucket] per day], 'break': [...]}}}
+    """
+    from models.presence_history import PresenceDay, STATUS_CODES
+
+    sampler = get_sampler()
+    length = sampler.buckets_per_day
+    days = _day_range(start_day, end_day)
+    day_index = {day: index for index, day in enumerate(days)}
+
+    grouped = {}  # department -> [[samples of each employee] per day]
+    for day, _, row_department, samples in PresenceDay.get_range(start_day, end_day, department):
+        per_day = grouped.setdefault(row_department, [[] for _ in days])
+        per_day[day_index[day]].append(_fit(samples, length))
+
+    empty = [0] * length
+    online, on_break = STATUS_CODES['online'], STATUS_CODES['break']
+    departments = {}
+    for name in sorted(grouped):
+        counts = {'online': [], 'break': []}
+        for rows in grouped[name]:
+            if not rows:
+                counts['online'].append(empty)
+                counts['break'].append(empty)
+                continue
+            # One tuple per bucket across employees; count() runs in C
+            columns = list(zip(*rows))
+            counts['online'].append([column.count(online) for column in columns])
+            counts['break'].append([column.count(on_break) for column in columns])
+        departments[name] = counts
+
+    return {
+        'interval': sampler.interval,
+        'buckets': length,
+        'days': [day.isoformat() for day in days],
+        'departments': departments
+    }
+
+def get_user_history(user_id, start_day, end_day):
+    """One user's status code per bucket for each day (codes as in STATUS_CODES)"""
+    from models.presence_history import PresenceDay, STATUS_CODES
+
+    sampler = get_sampler()
+    length = sampler.buckets_per_day
+    days = _day_range(start_day, end_day)
+    rows = {day: _fit(samples, length) for day, _, _, samples in PresenceDay.get_range(start_day, end_day, user_id=user_id)}
+
+    return {
+        'interval': sampler.interval,
+        'buckets': length,
+        'codes': STATUS_CODES,
+        'days': [day.isoformat() for day in days],
+        'samples': [list(rows.get(day, bytes(length))) for day in days]
+    }
+
+def parse_day(value, default=None):
+    """A YYYY-MM-DD query argument as a date (default: today, UTC)"""
+    if not value:
+        return default or datetime.utcnow().date()
+    return date.fromisoformat(value)
+
+def get_stats():
+    """Sample counters of the sampler"""
+    return get_sampler().get_stats()
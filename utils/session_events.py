@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Side effects that run only once the database transaction commits
+
+In-memory state (caches, counters, the presence registry) has to follow
+what was committed, not what was merely flushed: a rolled-back send must
+not show up in a cached conversation list. Modules queue items under their
+own key while a transaction is open and register a callback for that key;
+after the outermost transaction commits the callback gets every item queued
+under its key, in order, and a transaction that doesn't commit drops its
+items.
+"""
+
+from flask import has_app_context
+from sqlalchemy import event
+from app import db
+
+_PENDING_KEY = 'session_events_pending'
+
+_callbacks = {}  # key -> callback(items)
+
+def queue(key, item, session=None):
+    """Hold item for key's callback until the session's transaction commits
+
+    session defaults to db.session; mapper event handlers pass the
+    target's own session (object_session(target)).
+    """
+    session = db.session if session is None else session
+    session.info.setdefault(_PENDING_KEY, {}).setdefault(key, []).append(item)
+
+def on_commit(key, callback):
+    """Call callback(items) after each commit that queued items under key"""
+    _callbacks[key] = callback
+
+def _after_commit(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending or not has_app_context():
+        return
+    for key, items in pending.items():
+        callback = _callbacks.get(key)
+        if callback is None:
+            continue
+        try:
+            callback(items)
+        except Exception as e:
+            print(f"After-commit handler {key} failed: {e}")
+
+def _after_transaction_end(session, transaction):
+    # Items of a transaction that didn't commit are dropped with it
+    if transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
+
+event.listen(db.session, 'after_commit', _after_commit)
+event.listen(db.session, 'after_transaction_end', _after_transaction_end)
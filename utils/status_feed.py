@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Versioned employee status feed: clients fetch only what changed since their last poll
+
+Every status snapshot (see utils.status_snapshot) is diffed against the
+previous one, and each user whose status, department or details changed
+gets the next value of a monotonically increasing sequence. Clients keep
+the last seq they saw and ask for ?since=<seq>; they get the changed users,
+the ids of removed ones and the (small) aggregate stats. A full list is only
+sent on first load or when the client fell behind the retained changelog
+(STATUS_FEED_HISTORY changes) or comes from another process lifetime, which
+the epoch identifies.
+
+The feed is process-local, like the snapshot it is built from.
+"""
+
+import json
+import secrets
+import threading
+import time
+from collections import deque
+from app import db
+from utils.extensions import app_singleton
+
+STREAM_INTERVAL = 1  # Seconds between feed checks in an open stream
+KEEPALIVE_INTERVAL = 15  # Seconds between keepalive comments on an idle stream
+
+# Changes to these make a user show up in a delta; last_activity alone does not
+TRACKED_FIELDS = ('username', 'email', 'status', 'department', 'last_login')
+
+class StatusFeed:
+    """Latest record per user plus a bounded changelog of (seq, user_id)"""
+
+    def __init__(self, history):
+        self.epoch = secrets.token_hex(6)
+        self.seq = 0
+        self.floor = 0  # Deltas can be served to clients at seq >= floor
+        self.records = {}
+        self.changelog = deque()
+        self.history = history
+        self.summary = {}
+        self.lock = threading.Lock()
+
+    def _log(self, user_id):
+        self.seq += 1
+        self.changelog.append((self.seq, user_id))
+        while len(self.changelog) > self.history:
+            self.floor = self.changelog.popleft()[0]
+
+    def publish(self, snapshot):
+        """Diff a new snapshot against the previous one; returns the seq it ends at"""
+        with self.lock:
+            seen = set()
+            for user in snapshot['users']:
+                record = {key: value for key, value in user.items() if key != 'position'}
+                previous = self.records.get(record['id'])
+                self.records[record['id']] = record
+                seen.add(record['id'])
+                if previous is None or any(previous[f] != record[f] for f in TRACKED_FIELDS):
+                    self._log(record['id'])
+
+            for user_id in [user_id for user_id in self.records if user_id not in seen]:
+                del self.records[user_id]
+                self._log(user_id)
+
+            self.summary = {
+                'stats': snapshot['stats'],
+                'departments': snapshot['departments'],
+                'timestamp': snapshot['timestamp']
+            }
+            return self.seq
+
+    def since(self, since=None, epoch=None):
+        """Changes after seq `since`, or everything when that can't be answered"""
+        with self.lock:
+            full = (epoch != self.epoch or since is None or
+                    since > self.seq or since < self.floor)
+
+            if full:
+                users = sorted(self.records.values(), key=lambda record: record['id'])
+                removed = []
+            else:
+                changed = []
+                for seq, user_id in reversed(self.changelog):
+                    if seq <= since:
+                        break
+                    if user_id not in changed:
+                        changed.append(user_id)
+                users = [self.records[user_id] for user_id in sorted(changed) if user_id in self.records]
+                removed = [user_id for user_id in sorted(changed) if user_id not in self.records]
+
+            return dict(self.summary, epoch=self.epoch, seq=self.seq, full=full,
+                        users=users, removed=removed)
+
+def get_feed():
+    """The status feed for the current app"""
+    return app_singleton('status_feed', lambda app: StatusFeed(app.config.get('STATUS_FEED_HISTORY', 1000)))
+
+def publish(snapshot):
+    """Record a freshly built snapshot; returns (epoch, seq)"""
+    feed = get_feed()
+    return feed.epoch, feed.publish(snapshot)
+
+def get_changes(since=None, epoch=None):
+    """Delta since a client's seq, refreshing the snapshot first if it is stale"""
+    from utils import status_snapshot
+
+    status_snapshot.get_snapshot()
+    return get_feed().since(since, epoch)
+
+def format_event(delta):
+    """Encode a delta as a Server-Sent Events message"""
+    return f"id: {delta['epoch']}:{delta['seq']}\nevent: status\ndata: {json.dumps(delta)}\n\n"
+
+def event_stream(app, since=None, epoch=None):
+    """Generator pushing a delta whenever the feed moves past the client's seq"""
+    yield "retry: 3000\n\n"
+
+    idle_since = time.monotonic()
+    while True:
+        with app.app_context():
+            try:
+                delta = get_changes(since, epoch)
+            finally:
+                db.session.remove()
+
+        if delta['full'] or delta['users'] or delta['removed']:
+            since, epoch = delta['seq'], delta['epoch']
+            idle_since = time.monotonic()
+            yield format_event(delta)
+        elif time.monotonic() - idle_since >= KEEPALIVE_INTERVAL:
+            idle_since = time.monotonic()
+            yield ": keepalive\n\n"
+
+        time.sleep(STREAM_INTERVAL)
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Employee status snapshot shared by the admin dashboard and its 3D view
+
+The admin dashboard and /admin/api/user-status used to load every non-admin
+user as a full ORM object, derive each status in Python and then scan the
+list five more times per department. The snapshot selects only the columns
+the dashboard shows, lets SQL bucket each user into online/break/offline
+with a CASE expression, and builds the totals in the same single pass over
+the rows; department statistics come from the counters in
+utils.department_stats.
+
+The result is cached for ADMIN_STATUS_SNAPSHOT_TTL seconds (the dashboard
+refreshes every 15) and built by one request at a time: admins polling
+concurrently wait for that build and share it instead of each running the
+query. Each rebuild also feeds utils.status_feed, which hands pollers only
+the users that changed.
+"""
+
+import threading
+import time
+from datetime import datetime
+from app import db
+from utils import presence
+from utils.extensions import app_singleton
+
+STATUS_COLORS = {'online': 'green', 'break': 'blue', 'offline': 'red'}
+
+class StatusSnapshotCache:
+    """Latest snapshot plus the lock that makes rebuilding it single-flight"""
+
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.snapshot = None
+        self.built_at = 0
+        self.stats = {'hits': 0, 'builds': 0}
+
+    def _fresh(self):
+        return self.snapshot is not None and time.monotonic() - self.built_at < self.ttl
+
+    def get(self, build):
+        """The cached snapshot, rebuilt with build() once it is older than the TTL"""
+        if self._fresh():
+            self.stats['hits'] += 1
+            return self.snapshot
+
+        with self.lock:
+            # Whoever waited on the lock gets the snapshot the first caller built
+            if self._fresh():
+                self.stats['hits'] += 1
+                return self.snapshot
+            self.snapshot = build()
+            self.built_at = time.monotonic()
+            self.stats['builds'] += 1
+            return self.snapshot
+
+    def invalidate(self):
+        """Rebuild on the next request, e.g. after a department change"""
+        self.built_at = 0
+
+    def get_stats(self):
+        stats = dict(self.stats)
+        lookups = stats['hits'] + stats['builds']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        return stats
+
+def _create_cache(app):
+    cache = StatusSnapshotCache(app.config.get('ADMIN_STATUS_SNAPSHOT_TTL', 15))
+    # Rebuild on the next poll once someone goes idle, comes back or logs out
+    presence.on_transition(lambda transitions: cache.invalidate())
+    return cache
+
+def get_cache():
+    """The snapshot cache for the current app"""
+    return app_singleton('status_snapshot', _create_cache)
+
+def build_snapshot():
+    """Users and totals from one column-only query, department statistics from their counters"""
+    from models.user import User
+    from utils import department_stats, status_feed
+
+    # The registry has the exact status and latest heartbeat of the users it
+    # tracks, including heartbeats not flushed to users.last_activity yet
+    tracked = presence.tracked()
+
+    now = datetime.utcnow()
+    rows = db.session.query(
+        User.id, User.username, User.email, User.department,
+        User.last_activity, User.last_login, User.status_expression(now).label('status')
+    ).filter(User.is_admin == False).order_by(User.id).all()
+
+    users = []
+    stats = {'total': 0, 'online': 0, 'break': 0, 'offline': 0}
+
+    for i, row in enumerate(rows):
+        last_seen, status = tracked.get(row.id, (None, None))
+        status = status or row.status
+        last_activity = max(filter(None, (row.last_activity, last_seen)), default=None)
+
+        department = row.department or department_stats.DEFAULT_DEPARTMENT
+
+        users.append({
+            'id': row.id,
+            'username': row.username,
+            'email': row.email,
+            'status': status,
+            'status_color': STATUS_COLORS[status],
+            'department': department,
+            'last_activity': last_activity.isoformat() if last_activity else None,
+            'last_login': row.last_login.isoformat() if row.last_login else None,
+            'position': {
+                'x': (i % 4) * 250 + 100,  # Grid positioning
+                'y': (i // 4) * 200 + 100,
+                'z': 0
+            }
+        })
+
+        stats['total'] += 1
+        stats[status] += 1
+
+    snapshot = {
+        'users': users,
+        'stats': stats,
+        'departments': department_stats.get_department_stats(),
+        'timestamp': now.isoformat()
+    }
+    snapshot['epoch'], snapshot['seq'] = status_feed.publish(snapshot)
+    return snapshot
+
+def get_snapshot():
+    """The current snapshot, shared by every admin polling within the TTL"""
+    return get_cache().get(build_snapshot)
+
+def invalidate():
+    """Drop the cached snapshot"""
+    get_cache().invalidate()
+
+def get_stats():
+    """Hit/build counters of the snapshot cache"""
+    return get_cache().get_stats()
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Short-lived identity cache for Flask-Login's user loader
+
+load_user ran a primary-key SELECT of the full users row on every
+authenticated request, and the dashboard's polling timers make several of
+those per second per user. The cache keeps a detached snapshot of each
+recently seen user's columns for USER_CACHE_TTL seconds in an LRU bounded
+by USER_CACHE_SIZE users. A hit merges the snapshot into the request's
+session without loading (merge(load=False)), so current_user is an
+ordinary persistent User whose changes are flushed as usual, while the
+cached snapshot itself is never handed out or modified.
+
+Committed ORM updates and deletes of a user (profile, department,
+password, admin flag, status, breaks) evict that user, and so do the
+Core writes that bypass the ORM (ended breaks, offline transitions,
+bulk deletes) through invalidate(). Heartbeat last_activity writes don't
+evict; the presence registry answers those. Other workers' changes show
+up once the entry expires. The cache is process-local, like the presence
+registry; set USER_CACHE_TTL to 0 to disable it.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import make_transient_to_detached, object_session
+from sqlalchemy.orm.attributes import set_committed_value
+from app import db
+from utils import session_events
+from utils.extensions import app_singleton
+
+_EVENTS_KEY = 'user_cache_invalidated'
+
+class UserCache:
+    """LRU of user_id -> (expires_at, detached User snapshot)"""
+
+    def __init__(self, ttl, max_users):
+        self.ttl = ttl
+        self.max_users = max_users
+        self.users = OrderedDict()
+        self.loading = {}
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'invalidations': 0, 'evictions': 0}
+
+    def get(self, user_id):
+        """The cached snapshot, or None on a miss or when it has expired"""
+        with self.lock:
+            entry = self.users.get(user_id)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            if entry[0] <= time.monotonic():
+                del self.users[user_id]
+                self.stats['misses'] += 1
+                self.stats['expired'] += 1
+                return None
+            self.users.move_to_end(user_id)
+            self.stats['hits'] += 1
+            return entry[1]
+
+    def begin_load(self, user_id):
+        """Token for a load from the database; an invalidation meanwhile voids it"""
+        token = object()
+        with self.lock:
+            self.loading[user_id] = token
+        return token
+
+    def finish_load(self, user_id, token, snapshot):
+        """Store a loaded snapshot unless it was invalidated meanwhile"""
+        with self.lock:
+            if self.loading.get(user_id) is not token:
+                return False
+            del self.loading[user_id]
+            if snapshot is None:
+                return True
+
+            self.users[user_id] = (time.monotonic() + self.ttl, snapshot)
+            self.users.move_to_end(user_id)
+            while len(self.users) > self.max_users:
+                self.users.popitem(last=False)
+                self.stats['evictions'] += 1
+            return True
+
+    def invalidate(self, user_ids):
+        """Drop users and void their loads in flight"""
+        with self.lock:
+            for user_id in user_ids:
+                self.loading.pop(user_id, None)
+                if self.users.pop(user_id, None) is not None:
+                    self.stats['invalidations'] += 1
+
+    def clear(self):
+        with self.lock:
+            self.loading.clear()
+            self.users.clear()
+
+    def get_stats(self):
+        """Hit/miss counters and hit rate"""
+        with self.lock:
+            stats = dict(self.stats)
+            stats['users'] = len(self.users)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        return stats
+
+def get_cache():
+    """The cache for the current app, or None when USER_CACHE_TTL or USER_CACHE_SIZE is 0"""
+    ttl = current_app.config.get('USER_CACHE_TTL', 30)
+    size = current_app.config.get('USER_CACHE_SIZE', 5000)
+    if not ttl or not size:
+        return None
+    return app_singleton('user_cache', lambda app: UserCache(ttl, size))
+
+def _snapshot(user):
+    """Detached copy of a user's column values, unconnected to any session"""
+    mapper = inspect(type(user))
+    snapshot = mapper.class_manager.new_instance()
+    for attr in mapper.column_attrs:
+        set_committed_value(snapshot, attr.key, getattr(user, attr.key))
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+def load_user(user_id):
+    """The user for Flask-Login, from the cache when fresh, else by primary key"""
+    from models.user import User
+
+    cache = get_cache()
+    if cache is None:
+        return db.session.get(User, user_id)
+
+    snapshot = cache.get(user_id)
+    if snapshot is not None:
+        return db.session.merge(snapshot, load=False)
+
+    token = cache.begin_load(user_id)
+    user = db.session.get(User, user_id)
+    cache.finish_load(user_id, token, _snapshot(user) if user is not None else None)
+    return user
+
+def invalidate(*user_ids):
+    """Evict users once the current session commits (for writes that bypass the ORM)"""
+    for user_id in user_ids:
+        session_events.queue(_EVENTS_KEY, user_id)
+
+def get_stats():
+    """Hit/miss counters of the cache, or None when it is disabled"""
+    cache = get_cache()
+    return cache.get_stats() if cache else None
+
+def _queue_user(mapper, connection, target):
+    session = object_session(target)
+    if session is not None:
+        session_events.queue(_EVENTS_KEY, target.id, session)
+
+def _invalidate_committed(user_ids):
+    cache = current_app.extensions.get('user_cache')
+    if cache is not None:
+        cache.invalidate(set(user_ids))
+
+def _register_listeners():
+    from models.user import User
+
+    event.listen(User, 'after_update', _queue_user)
+    event.listen(User, 'after_delete', _queue_user)
+    session_events.on_commit(_EVENTS_KEY, _invalidate_committed)
+
+_register_listeners()